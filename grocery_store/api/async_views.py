@@ -0,0 +1,65 @@
+"""
+Асинхронные точки входа каталога только для чтения.
+
+В Django 3.2 нет асинхронного ORM, поэтому это не асинхронная выборка,
+а вынос запроса в пул потоков: представление целиком - аутентификация,
+ETag и ответ 304, кэш ответов, счетчики фасетов и сериализация - выполняет
+тот же синхронный viewset, что и /api/, одним вызовом run_db. Пока поток
+пула работает с базой, цикл событий обслуживает другие соединения,
+а ответы совпадают с синхронными вплоть до заголовков.
+
+Запрос работает с базой через соединение своего потока пула. При
+CONN_MAX_AGE = 0 оно открывается и закрывается на каждый запрос,
+при CONN_MAX_AGE > 0 остается у потока до истечения срока и достается
+следующим запросам, попавшим в этот поток.
+"""
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+from api.views import CategoryViewSet, ProductViewSet
+
+
+def run_db(func, *args, **kwargs):
+    """
+    Выполняет синхронную функцию, работающую с базой, в пуле потоков.
+
+    Потоки пула не связаны с обработкой запроса, поэтому соединения
+    закрываются по тем же правилам, что и в конце запроса (CONN_MAX_AGE).
+    """
+    def call():
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(call, thread_sensitive=False)()
+
+
+def thread_offloaded(view):
+    """
+    Превращает синхронное представление view в асинхронное: запрос
+    обрабатывается и ответ отрисовывается за один вызов run_db.
+    """
+    def handle(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+
+    async def wrapper(request, *args, **kwargs):
+        return await run_db(handle, request, *args, **kwargs)
+    return wrapper
+
+
+product_list = thread_offloaded(ProductViewSet.as_view({'get': 'list'}))
+
+product_detail = thread_offloaded(
+    ProductViewSet.as_view({'get': 'retrieve'})
+)
+
+category_list = thread_offloaded(CategoryViewSet.as_view({'get': 'list'}))
+
+shopping_cart_summary = thread_offloaded(ProductViewSet.as_view(
+    {'get': 'shopping_cart_summary'},
+    **ProductViewSet.shopping_cart_summary.kwargs,
+))
@@ -0,0 +1,120 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+
+
+class TokenCache:
+    """
+    Кэш соответствия токен -> (пользователь, токен).
+
+    Локальный уровень - LRU ограниченного размера с временем жизни записей.
+    Если задан alias, промахи локального уровня проверяются в общем кэше
+    Django, поэтому после входа пользователя база не запрашивается
+    и в остальных процессах.
+    """
+
+    def __init__(self, max_size, ttl, alias=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.alias = alias
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def shared(self):
+        return caches[self.alias] if self.alias else None
+
+    def shared_key(self, key):
+        return f'auth-token:{key}'
+
+    def get(self, key):
+        """Возвращает закэшированное значение или None."""
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] > now:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self.entries[key]
+        value = None
+        if self.shared is not None:
+            value = self.shared.get(self.shared_key(key))
+        with self.lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        self.store(key, value, shared=False)
+        return value
+
+    def set(self, key, value):
+        self.store(key, value, shared=True)
+
+    def store(self, key, value, shared):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        if shared and self.shared is not None:
+            self.shared.set(self.shared_key(key), value, self.ttl)
+
+    def delete(self, *keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+        if self.shared is not None:
+            self.shared.delete_many([self.shared_key(key) for key in keys])
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self.entries),
+                'max_size': self.max_size,
+            }
+
+
+token_cache = TokenCache(
+    settings.TOKEN_CACHE_SIZE,
+    settings.TOKEN_CACHE_TTL,
+    settings.TOKEN_CACHE_ALIAS,
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication с кэшем токенов.
+
+    Попадание в кэш не обращается к базе. Записи сбрасываются при
+    удалении токена (выход) и при сохранении пользователя (смена пароля,
+    деактивация) - только записи этого токена или этого пользователя,
+    в локальном кэше процесса и в общем кэше, см. api/signals.py.
+    Локальные кэши остальных процессов и изменения в обход сигналов
+    (QuerySet.update) устаревают не дольше TOKEN_CACHE_TTL.
+    """
+
+    def authenticate_credentials(self, key):
+        credentials = token_cache.get(key)
+        if credentials is None:
+            credentials = super().authenticate_credentials(key)
+            token_cache.set(key, credentials)
+        # Каждый запрос получает свои копии, чтобы изменения request.user
+        # не попадали в кэш.
+        user, token = credentials
+        return copy.copy(user), copy.copy(token)
@@ -0,0 +1,171 @@
+"""
+Скомпилированные сериализаторы для чтения.
+
+compile_serializer один раз разбирает поля сериализатора DRF и собирает
+из них обычную функцию row -> dict, которая дает тот же результат, что
+и to_representation сериализатора, но без обхода полей на каждой строке.
+"""
+from decimal import Decimal, getcontext
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+from api.serializers import (CategorySerializer, ProductMinifieldSerializer,
+                             ProductSerializer)
+from products.models import Category, Image
+from products.renditions import renditions_builder
+from products.taxonomy import get_taxonomy
+
+PRODUCT_VALUES = ('id', 'name', 'slug', 'sub_category_id', 'price',
+                  'measurement_unit')
+PRODUCT_CARD_VALUES = (*PRODUCT_VALUES, 'images')
+
+
+def decimal_converter(field):
+    """Как DecimalField.to_representation, но контекст округления готов."""
+    coerce_to_string = getattr(
+        field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING
+    )
+    if field.decimal_places is None or coerce_to_string and field.localize:
+        return field.to_representation
+    exponent = Decimal('.1') ** field.decimal_places
+    context = getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    rounding = field.rounding
+
+    def convert(value):
+        if not isinstance(value, Decimal):
+            value = Decimal(str(value).strip())
+        value = value.quantize(exponent, rounding=rounding, context=context)
+        if coerce_to_string:
+            return '{:f}'.format(value)
+        return value
+
+    return convert
+
+
+def get_converter(field):
+    if isinstance(field, serializers.BooleanField):
+        return bool
+    if isinstance(field, serializers.IntegerField):
+        return int
+    if isinstance(field, serializers.DecimalField):
+        return decimal_converter(field)
+    if isinstance(field, serializers.CharField):
+        return str
+    return field.to_representation
+
+
+def compile_serializer(serializer_class, methods=None, access='item'):
+    """
+    Собирает функцию serialize(row, context) для сериализатора.
+
+    access - 'item' для словарей из values(), 'attr' для объектов моделей.
+    methods - функции (row, context) для SerializerMethodField и других
+    полей, которые нельзя вычислить по одному значению строки.
+    """
+    methods = methods or {}
+    namespace = {}
+    items = []
+    for index, (name, field) in enumerate(
+        serializer_class().fields.items()
+    ):
+        if field.write_only:
+            continue
+        if name in methods:
+            namespace[f'method_{index}'] = methods[name]
+            items.append(f'{name!r}: method_{index}(row, context)')
+            continue
+        if isinstance(field, serializers.SerializerMethodField) or (
+            '.' in field.source or field.source == '*'
+        ):
+            raise ImproperlyConfigured(
+                f'{serializer_class.__name__}.{name}: нужна функция в methods.'
+            )
+        if access == 'item':
+            value = f'row[{field.source!r}]'
+        else:
+            value = f'row.{field.source}'
+        namespace[f'convert_{index}'] = get_converter(field)
+        items.append(
+            f'{name!r}: None if {value} is None else convert_{index}({value})'
+        )
+    source = (
+        'def serialize(row, context):\n'
+        '    return {' + ', '.join(items) + '}\n'
+    )
+    exec(compile(source, f'<{serializer_class.__name__}>', 'exec'), namespace)
+    return namespace['serialize']
+
+
+def load_image_data(product_ids):
+    """Представления изображений продуктов, как у ImageSerializer."""
+    renditions = renditions_builder(Image._meta.get_field('image').storage)
+    images = {}
+    for pk, product_id, name in Image.objects.filter(
+        product_id__in=product_ids
+    ).values_list('id', 'product_id', 'image'):
+        images.setdefault(product_id, []).append(
+            {'id': pk, 'image': renditions(name)}
+        )
+    return images
+
+
+serialize_product = compile_serializer(ProductSerializer, {
+    'images': lambda row, context: context['images'].get(row['id'], []),
+    'sub_category': lambda row, context: context['taxonomy'].sub_category(
+        row['sub_category_id']
+    ),
+    'category': lambda row, context: context['taxonomy'].category_of(
+        row['sub_category_id']
+    ),
+    'is_in_shopping_cart': lambda row, context: (
+        row['id'] in context['cart_product_ids']
+    ),
+})
+
+# Фрагмент для api/fragments.py: таксономия и отметка корзины
+# подставляются при сборке ответа.
+serialize_product_fragment = compile_serializer(ProductSerializer, {
+    'images': lambda row, context: row['images'],
+    'sub_category': lambda row, context: None,
+    'category': lambda row, context: None,
+    'is_in_shopping_cart': lambda row, context: False,
+})
+
+serialize_product_minifield = compile_serializer(
+    ProductMinifieldSerializer, access='attr'
+)
+
+serialize_category = compile_serializer(CategorySerializer, {
+    'image': lambda row, context: context['renditions'](row['image']),
+    'sub_categories': lambda row, context: context[
+        'taxonomy'
+    ].sub_categories(row['id']),
+})
+
+
+def serialize_products(rows, cart_product_ids=frozenset()):
+    """
+    Список продуктов из строк values() с полями PRODUCT_VALUES.
+    cart_product_ids - id продуктов в корзине пользователя.
+    """
+    context = {
+        'taxonomy': get_taxonomy(),
+        'images': load_image_data([row['id'] for row in rows]),
+        'cart_product_ids': cart_product_ids,
+    }
+    return [serialize_product(row, context) for row in rows]
+
+
+def serialize_categories(rows):
+    """Список категорий из строк values('id', 'name', 'slug', 'image')."""
+    context = {
+        'taxonomy': get_taxonomy(),
+        'renditions': renditions_builder(
+            Category._meta.get_field('image').storage
+        ),
+    }
+    return [serialize_category(row, context) for row in rows]
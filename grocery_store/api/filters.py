@@ -0,0 +1,30 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from products.facets import FacetSelection
+from products.search import search_products
+
+
+class ProductSearchFilter(BaseFilterBackend):
+    """Полнотекстовый поиск продуктов по параметру search."""
+
+    search_param = 'search'
+
+    def get_search_text(self, request):
+        return request.query_params.get(self.search_param, '').strip()
+
+    def filter_queryset(self, request, queryset, view):
+        text = self.get_search_text(request)
+        if not text:
+            return queryset
+        return search_products(queryset, text)
+
+
+class ProductFacetFilter(BaseFilterBackend):
+    """Фильтрация продуктов по категории, подкатегории, цене и наличию."""
+
+    def filter_queryset(self, request, queryset, view):
+        selection = FacetSelection(request.query_params)
+        if selection.errors:
+            raise ValidationError(selection.errors)
+        return selection.filter_queryset(queryset)
@@ -0,0 +1,196 @@
+"""
+Кэш сериализованных представлений продуктов (фрагментов).
+
+Фрагмент - представление одного продукта в полной форме
+(ProductSerializer) или краткой (ProductMinifieldSerializer). Ключ
+включает id продукта и версию его строки - updated_at, которую сдвигают
+сохранение продукта и изменение его изображений, поэтому устаревший
+фрагмент просто перестает читаться и удалять его не нужно.
+
+Части полной формы, которые зависят не от продукта, во фрагменте
+не хранятся и подставляются при сборке ответа: подкатегория
+и категория - из снимка таксономии, поэтому переименование категорий
+не затрагивает фрагменты, отметка корзины - по корзине пользователя.
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from api.fast_serializers import (PRODUCT_CARD_VALUES,
+                                  serialize_product_fragment,
+                                  serialize_product_minifield)
+from products.models import ProductCard
+from products.taxonomy import get_taxonomy
+
+FULL = 'full'
+MINI = 'mini'
+
+
+def fragment_key(form, product_id, version):
+    return f'product-fragment:{form}:{product_id}:{version.timestamp():.6f}'
+
+
+class FragmentCache:
+    """
+    Кэш фрагментов.
+
+    Локальный уровень - LRU ограниченного размера без сериализации
+    значений: ключи версионные, поэтому запись в нем не устаревает
+    и общая инвалидация между процессами не нужна. Если задан alias,
+    промахи локального уровня читаются из общего кэша Django одним
+    get_many.
+    """
+
+    def __init__(self, max_size, ttl, alias=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.alias = alias
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def shared(self):
+        return caches[self.alias] if self.alias else None
+
+    def get_many(self, keys):
+        found = {}
+        with self.lock:
+            for key in keys:
+                value = self.entries.get(key)
+                if value is not None:
+                    self.entries.move_to_end(key)
+                    found[key] = value
+        missing = [key for key in keys if key not in found]
+        if missing and self.shared is not None:
+            shared = self.shared.get_many(missing)
+            self.store(shared)
+            found.update(shared)
+        with self.lock:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def set_many(self, values):
+        self.store(values)
+        if values and self.shared is not None:
+            self.shared.set_many(values, self.ttl)
+
+    def store(self, values):
+        with self.lock:
+            for key, value in values.items():
+                self.entries[key] = value
+                self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self.entries),
+            }
+
+
+fragment_cache = FragmentCache(
+    settings.PRODUCT_FRAGMENT_CACHE_SIZE,
+    settings.PRODUCT_FRAGMENT_CACHE_TTL,
+    settings.PRODUCT_FRAGMENT_CACHE_ALIAS,
+)
+
+
+def get_fragments(form, versions, build):
+    """
+    Возвращает {id продукта: фрагмент} для versions - {id: updated_at}.
+
+    Фрагменты читаются из кэша одним get_many. Недостающие строит
+    build(ids) -> {id: (updated_at, фрагмент)} и кладет в кэш одним
+    set_many под версией, с которой они построены.
+    """
+    keys = {
+        fragment_key(form, pk, version): pk
+        for pk, version in versions.items()
+    }
+    fragments = {
+        keys[key]: fragment
+        for key, fragment in fragment_cache.get_many(list(keys)).items()
+    }
+    missing = [pk for pk in versions if pk not in fragments]
+    if missing:
+        built = build(missing)
+        fragment_cache.set_many({
+            fragment_key(form, pk, version): fragment
+            for pk, (version, fragment) in built.items()
+        })
+        fragments.update(
+            (pk, fragment) for pk, (_, fragment) in built.items()
+        )
+    return fragments
+
+
+def build_product_fragments(product_ids):
+    """Полные фрагменты из карточек продуктов одним запросом."""
+    return {
+        row['id']: (
+            row['updated_at'],
+            (row['sub_category_id'], serialize_product_fragment(row, None)),
+        )
+        for row in ProductCard.objects.filter(id__in=product_ids).values(
+            'updated_at', *PRODUCT_CARD_VALUES
+        )
+    }
+
+
+def serialize_product_rows(rows, cart_product_ids=frozenset()):
+    """
+    Список продуктов, как у ProductSerializer, по строкам values()
+    с полями id и updated_at. cart_product_ids - id продуктов в корзине
+    пользователя. Продукты, удаленные после выборки строк, пропускаются.
+    """
+    fragments = get_fragments(
+        FULL,
+        {row['id']: row['updated_at'] for row in rows},
+        build_product_fragments,
+    )
+    taxonomy = get_taxonomy()
+    products = []
+    for row in rows:
+        fragment = fragments.get(row['id'])
+        if fragment is None:
+            continue
+        sub_category_id, data = fragment
+        products.append({
+            **data,
+            'sub_category': taxonomy.sub_category(sub_category_id),
+            'category': taxonomy.category_of(sub_category_id),
+            'is_in_shopping_cart': data['id'] in cart_product_ids,
+        })
+    return products
+
+
+def get_minifield_fragments(products):
+    """
+    Краткие фрагменты уже загруженных продуктов: {id: фрагмент}.
+    Промахи сериализуются из самих объектов без запросов к базе.
+    """
+    products = {product.id: product for product in products}
+    return get_fragments(
+        MINI,
+        {pk: product.updated_at for pk, product in products.items()},
+        lambda ids: {
+            pk: (
+                products[pk].updated_at,
+                serialize_product_minifield(products[pk], None),
+            )
+            for pk in ids
+        },
+    )
@@ -0,0 +1,195 @@
+"""
+Раздача медиафайлов: изображений продуктов и категорий.
+
+Файлы из ContentAddressedStorage названы по хэшу содержимого
+(products/images/ab/cd/<sha256>.bmp, производные изображения -
+<sha256>.<размер>.<формат>), поэтому при изменении содержимого меняется
+и адрес. Такие ответы кэшируются на год с immutable, а ETag берется
+из имени. Для остальных файлов ETag строится по времени изменения
+и размеру, а время кэширования ограничено MEDIA_MAX_AGE.
+
+Без MEDIA_OFFLOAD файл отдает Django: условные запросы получают 304,
+запрос Range с одним диапазоном - ответ 206. С MEDIA_OFFLOAD Django
+только проверяет путь и ставит заголовки кэширования, а файл вместе
+с Range и условными запросами отдает прокси по X-Accel-Redirect (nginx)
+или X-Sendfile (Apache, lighttpd).
+"""
+import mimetypes
+import os
+import re
+from stat import S_ISREG
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import (ImproperlyConfigured,
+                                    SuspiciousFileOperation)
+from django.http import (FileResponse, Http404, HttpResponse,
+                         StreamingHttpResponse)
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+X_ACCEL_REDIRECT = 'x-accel-redirect'
+X_SENDFILE = 'x-sendfile'
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+BLOCK_SIZE = 64 * 1024
+
+# Имя из ContentAddressedStorage: каталоги из первых символов хэша,
+# затем сам хэш и расширения.
+VERSIONED_NAME = re.compile(
+    r'(?:^|/)(?P<a>[0-9a-f]{2})/(?P<b>[0-9a-f]{2})/'
+    r'(?P<name>(?P=a)(?P=b)[0-9a-f]{60}(?:\.\w+)*)$'
+)
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+if settings.MEDIA_OFFLOAD not in (None, X_ACCEL_REDIRECT, X_SENDFILE):
+    raise ImproperlyConfigured(
+        f'Неизвестный MEDIA_OFFLOAD: {settings.MEDIA_OFFLOAD!r}'
+    )
+
+
+class RangeNotSatisfiable(Exception):
+    """Диапазон из Range начинается за концом файла."""
+
+
+def parse_range(header, size):
+    """
+    Возвращает (начало, конец) включительно для заголовка Range
+    или None, если заголовок нужно проигнорировать и отдать файл целиком:
+    несколько диапазонов, другие единицы или ошибка в записи.
+    """
+    match = RANGE.match(header.replace(' ', ''))
+    if match is None:
+        return None
+    start, end = match.groups()
+    if not start:
+        if not end:
+            return None
+        length = int(end)
+        if not length or not size:
+            raise RangeNotSatisfiable
+        return max(size - length, 0), size - 1
+    start = int(start)
+    if end and int(end) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable
+    return start, min(int(end), size - 1) if end else size - 1
+
+
+def read_range(file, start, length):
+    """Читает length байт файла с позиции start блоками."""
+    with file:
+        file.seek(start)
+        while length > 0:
+            block = file.read(min(BLOCK_SIZE, length))
+            if not block:
+                return
+            length -= len(block)
+            yield block
+
+
+def cache_control(versioned):
+    if versioned:
+        return f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return f'public, max-age={settings.MEDIA_MAX_AGE}'
+
+
+def offload_response(path, full_path, content_type, versioned):
+    """Пустой ответ, по которому файл отдает прокси."""
+    response = HttpResponse(content_type=content_type)
+    if settings.MEDIA_OFFLOAD == X_ACCEL_REDIRECT:
+        response['X-Accel-Redirect'] = (
+            settings.MEDIA_OFFLOAD_PREFIX + quote(path)
+        )
+    else:
+        response['X-Sendfile'] = full_path
+    response['Cache-Control'] = cache_control(versioned)
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """Файл из MEDIA_ROOT по пути относительно MEDIA_URL."""
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('Файл не найден.')
+    try:
+        stat = os.stat(full_path)
+    except (OSError, ValueError):
+        raise Http404('Файл не найден.')
+    if not S_ISREG(stat.st_mode):
+        raise Http404('Файл не найден.')
+    content_type, _ = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+    versioned = VERSIONED_NAME.search(path)
+    if settings.MEDIA_OFFLOAD:
+        return offload_response(
+            path, full_path, content_type, versioned is not None
+        )
+
+    if versioned is not None:
+        etag = f'"{versioned.group("name")}"'
+    else:
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    last_modified = int(stat.st_mtime)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        response = file_response(request, full_path, stat.st_size,
+                                 content_type, etag, last_modified)
+    if response.status_code == 416:
+        return response
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = cache_control(versioned is not None)
+    return response
+
+
+def file_response(request, full_path, size, content_type, etag,
+                  last_modified):
+    """Ответ 200, 206 или 416 с содержимым файла."""
+    byte_range = None
+    header = request.META.get('HTTP_RANGE')
+    if header and if_range_matches(request, etag, last_modified):
+        try:
+            byte_range = parse_range(header, size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type)
+        response['Content-Length'] = str(size)
+    elif byte_range is None:
+        response = FileResponse(
+            open(full_path, 'rb'), content_type=content_type
+        )
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            read_range(open(full_path, 'rb'), start, end - start + 1),
+            status=206,
+            content_type=content_type,
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def if_range_matches(request, etag, last_modified):
+    """
+    Range действует, если If-Range нет или он совпадает с текущей
+    версией файла: иначе у клиента другая версия и нужен файл целиком.
+    """
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
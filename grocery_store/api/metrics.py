@@ -0,0 +1,352 @@
+"""
+Метрики запросов в формате Prometheus.
+
+Каждый поток пишет только в свой набор счетчиков, поэтому обновление
+не требует блокировок. При выдаче наборы всех потоков суммируются.
+SQL-запросы синхронного запроса считаются счетчиками его потока,
+а асинхронного - счетчиками из контекста запроса, которые видят и потоки
+пула, выполняющие его работу с базой.
+Если задан METRICS_DIR, процесс периодически сохраняет свой снимок
+в этот каталог, и /metrics суммирует снимки всех рабочих процессов.
+Снимки завершившихся процессов и не обновлявшиеся дольше
+METRICS_STALE_AFTER секунд при этом удаляются.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from api.authentication import token_cache
+from api.fragments import fragment_cache
+from api.response_cache import response_cache
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Положение значений в строке счетчиков маршрута.
+COUNT = 0
+DURATION = 1
+QUERIES = 2
+QUERY_TIME = 3
+SIZE = 4
+BUCKET = 5
+ROW_LENGTH = BUCKET + len(BUCKETS) + 1
+
+_local = threading.local()
+_shards = []
+_next_flush = 0
+_request_queries = ContextVar('request_queries', default=None)
+
+
+def get_shard():
+    """Счетчики текущего потока: {(маршрут, метод, статус): [...]}."""
+    shard = getattr(_local, 'shard', None)
+    if shard is None:
+        shard = _local.shard = {}
+        _shards.append(shard)
+    return shard
+
+
+def get_query_stats():
+    """
+    Счетчики SQL текущего потока: [число запросов, время].
+
+    Обертка ставится на соединения потока один раз и остается на них,
+    поэтому на каждый запрос к приложению не тратится ничего.
+    """
+    stats = getattr(_local, 'queries', None)
+    if stats is None:
+        stats = _local.queries = [0, 0.0]
+        for connection in connections.all():
+            if count_query not in connection.execute_wrappers:
+                connection.execute_wrappers.append(count_query)
+    return stats
+
+
+@contextmanager
+def track_request_queries():
+    """
+    Счетчики SQL асинхронного запроса: [число запросов, время].
+
+    sync_to_async копирует контекст в поток пула, поэтому запросы к базе
+    из любого потока, работающего на этот запрос, попадают в них.
+    """
+    stats = [0, 0.0]
+    token = _request_queries.set(stats)
+    try:
+        yield stats
+    finally:
+        _request_queries.reset(token)
+
+
+@receiver(connection_created)
+def count_connection_queries(sender, connection, **kwargs):
+    """
+    Соединения потоков пула, которые не обслуживали синхронных
+    запросов, тоже считают SQL-запросы.
+    """
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+def count_query(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        stats = getattr(_local, 'queries', None)
+        if stats is None:
+            stats = _local.queries = [0, 0.0]
+        stats[0] += 1
+        stats[1] += elapsed
+        request_stats = _request_queries.get()
+        if request_stats is not None:
+            request_stats[0] += 1
+            request_stats[1] += elapsed
+
+
+def observe(route, method, status, duration, queries, query_time, size):
+    key = (route, method, status)
+    shard = get_shard()
+    row = shard.get(key)
+    if row is None:
+        row = shard[key] = [0] * ROW_LENGTH
+    row[COUNT] += 1
+    row[DURATION] += duration
+    row[QUERIES] += queries
+    row[QUERY_TIME] += query_time
+    row[SIZE] += size
+    row[BUCKET + bisect_left(BUCKETS, duration)] += 1
+
+
+def snapshot():
+    """Сумма счетчиков всех потоков процесса."""
+    rows = {}
+    for shard in list(_shards):
+        for key, row in list(shard.items()):
+            total = rows.setdefault(key, [0] * ROW_LENGTH)
+            for index, value in enumerate(row):
+                total[index] += value
+    stats = token_cache.stats()
+    return {
+        'rows': [[*key, row] for key, row in rows.items()],
+        'token_cache': {
+            'hits': stats['hits'],
+            'misses': stats['misses'],
+            'size': stats['size'],
+        },
+        'response_cache': response_cache.stats(),
+        'fragment_cache': fragment_cache.stats(),
+    }
+
+
+def flush():
+    """Сохраняет снимок процесса в METRICS_DIR."""
+    if not settings.METRICS_DIR:
+        return
+    descriptor, temporary = tempfile.mkstemp(
+        dir=settings.METRICS_DIR, suffix='.tmp'
+    )
+    with os.fdopen(descriptor, 'w') as file:
+        json.dump(snapshot(), file)
+    os.replace(
+        temporary, os.path.join(settings.METRICS_DIR, f'{os.getpid()}.json')
+    )
+
+
+def maybe_flush():
+    global _next_flush
+    now = time.monotonic()
+    if now < _next_flush:
+        return
+    _next_flush = now + settings.METRICS_FLUSH_INTERVAL
+    flush()
+
+
+def process_exists(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def is_stale(path, name):
+    """Снимок или временный файл, который больше никто не обновит."""
+    try:
+        modified = os.path.getmtime(path)
+    except OSError:
+        return False
+    if time.time() - modified > settings.METRICS_STALE_AFTER:
+        return True
+    pid = name[:-len('.json')]
+    return (name.endswith('.json') and pid.isdigit()
+            and int(pid) != os.getpid() and not process_exists(int(pid)))
+
+
+def collect():
+    """
+    Снимки всех процессов: из METRICS_DIR или только текущий. Устаревшие
+    снимки удаляются.
+    """
+    if not settings.METRICS_DIR:
+        return [snapshot()]
+    flush()
+    snapshots = []
+    for name in os.listdir(settings.METRICS_DIR):
+        if not name.endswith(('.json', '.tmp')):
+            continue
+        path = os.path.join(settings.METRICS_DIR, name)
+        if is_stale(path, name):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        if name.endswith('.tmp'):
+            continue
+        try:
+            with open(path) as file:
+                snapshots.append(json.load(file))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+
+def merge(snapshots):
+    rows = {}
+    token_stats = {'hits': 0, 'misses': 0, 'size': 0}
+    response_stats = {'hits': 0, 'misses': 0, 'stale': 0, 'waits': 0,
+                      'entries': 0, 'bytes': 0}
+    fragment_stats = {'hits': 0, 'misses': 0, 'size': 0}
+    for data in snapshots:
+        for route, method, status, row in data['rows']:
+            total = rows.setdefault(
+                (route, method, status), [0] * ROW_LENGTH
+            )
+            for index, value in enumerate(row):
+                total[index] += value
+        for name in token_stats:
+            token_stats[name] += data.get('token_cache', {}).get(name, 0)
+        for name in response_stats:
+            response_stats[name] += data.get(
+                'response_cache', {}
+            ).get(name, 0)
+        for name in fragment_stats:
+            fragment_stats[name] += data.get(
+                'fragment_cache', {}
+            ).get(name, 0)
+    return rows, token_stats, response_stats, fragment_stats
+
+
+def escape(value):
+    return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+def render(snapshots):
+    """Текст метрик в формате Prometheus."""
+    rows, token_stats, response_stats, fragment_stats = merge(snapshots)
+    keys = sorted(rows)
+    lines = []
+
+    def family(name, kind, description, values):
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+        lines.extend(values)
+
+    def labels(key, **extra):
+        route, method, status = key
+        pairs = [('route', route), ('method', method), ('status', status),
+                 *extra.items()]
+        return ','.join(f'{name}="{escape(value)}"' for name, value in pairs)
+
+    family(
+        'http_requests_total', 'counter', 'Количество запросов.',
+        [f'http_requests_total{{{labels(key)}}} {rows[key][COUNT]}'
+         for key in keys],
+    )
+    histogram = []
+    for key in keys:
+        row = rows[key]
+        cumulative = 0
+        for index, bound in enumerate((*BUCKETS, '+Inf')):
+            cumulative += row[BUCKET + index]
+            histogram.append(
+                f'http_request_duration_seconds_bucket'
+                f'{{{labels(key, le=bound)}}} {cumulative}'
+            )
+        histogram.append(
+            f'http_request_duration_seconds_sum{{{labels(key)}}} '
+            f'{row[DURATION]:.6f}'
+        )
+        histogram.append(
+            f'http_request_duration_seconds_count{{{labels(key)}}} '
+            f'{row[COUNT]}'
+        )
+    family('http_request_duration_seconds', 'histogram',
+           'Время обработки запроса.', histogram)
+    family(
+        'db_queries_total', 'counter', 'Количество SQL-запросов.',
+        [f'db_queries_total{{{labels(key)}}} {rows[key][QUERIES]}'
+         for key in keys],
+    )
+    family(
+        'db_query_duration_seconds_total', 'counter',
+        'Суммарное время SQL-запросов.',
+        [f'db_query_duration_seconds_total{{{labels(key)}}} '
+         f'{rows[key][QUERY_TIME]:.6f}' for key in keys],
+    )
+    sizes = []
+    for key in keys:
+        sizes.append(f'http_response_size_bytes_sum{{{labels(key)}}} '
+                     f'{rows[key][SIZE]}')
+        sizes.append(f'http_response_size_bytes_count{{{labels(key)}}} '
+                     f'{rows[key][COUNT]}')
+    family('http_response_size_bytes', 'summary',
+           'Размер тела ответа.', sizes)
+    family('auth_token_cache_hits_total', 'counter',
+           'Попадания в кэш токенов.',
+           [f'auth_token_cache_hits_total {token_stats["hits"]}'])
+    family('auth_token_cache_misses_total', 'counter',
+           'Промахи кэша токенов.',
+           [f'auth_token_cache_misses_total {token_stats["misses"]}'])
+    family('auth_token_cache_size', 'gauge',
+           'Записей в кэше токенов.',
+           [f'auth_token_cache_size {token_stats["size"]}'])
+    for name, description in (
+        ('hits', 'Ответы из кэша ответов каталога.'),
+        ('misses', 'Пересчеты ответов каталога.'),
+        ('stale', 'Записи кэша ответов, устаревшие после инвалидации.'),
+        ('waits', 'Ожидания пересчета записи другим запросом.'),
+    ):
+        family(f'response_cache_{name}_total', 'counter', description,
+               [f'response_cache_{name}_total {response_stats[name]}'])
+    family('response_cache_entries', 'gauge',
+           'Записей в локальном кэше ответов.',
+           [f'response_cache_entries {response_stats["entries"]}'])
+    family('response_cache_bytes', 'gauge',
+           'Объем локального кэша ответов в байтах.',
+           [f'response_cache_bytes {response_stats["bytes"]}'])
+    family('product_fragment_cache_hits_total', 'counter',
+           'Представления продуктов из кэша фрагментов.',
+           [f'product_fragment_cache_hits_total {fragment_stats["hits"]}'])
+    family('product_fragment_cache_misses_total', 'counter',
+           'Представления продуктов, построенные заново.',
+           [f'product_fragment_cache_misses_total '
+            f'{fragment_stats["misses"]}'])
+    family('product_fragment_cache_size', 'gauge',
+           'Записей в локальном кэше фрагментов.',
+           [f'product_fragment_cache_size {fragment_stats["size"]}'])
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,108 @@
+import time
+
+from asgiref.sync import (iscoroutinefunction, markcoroutinefunction,
+                          sync_to_async)
+
+from api.metrics import (get_query_stats, maybe_flush, observe,
+                         track_request_queries)
+from api.replicas import SAFE_METHODS, pin_user, routing_request
+
+UNMATCHED_ROUTE = '<unmatched>'
+
+
+class MetricsMiddleware:
+    """
+    Собирает метрики по маршрутам: время ответа, количество и время
+    SQL-запросов, размер ответа и статус. Маршрут - имя URL с пространством
+    имен, например api:products-list.
+
+    Под ASGI работает асинхронно, не занимая поток на время запроса.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        queries = get_query_stats()
+        queries_before, query_time_before = queries
+        started = time.perf_counter()
+        response = self.get_response(request)
+        duration = time.perf_counter() - started
+        self.observe(
+            request,
+            response,
+            duration,
+            queries[0] - queries_before,
+            queries[1] - query_time_before,
+        )
+        return response
+
+    async def __acall__(self, request):
+        with track_request_queries() as queries:
+            started = time.perf_counter()
+            response = await self.get_response(request)
+            duration = time.perf_counter() - started
+        self.observe(request, response, duration, *queries)
+        return response
+
+    def observe(self, request, response, duration, queries, query_time):
+        match = request.resolver_match
+        observe(
+            match.view_name if match is not None else UNMATCHED_ROUTE,
+            request.method,
+            response.status_code,
+            duration,
+            queries,
+            query_time,
+            0 if response.streaming else len(response.content),
+        )
+        maybe_flush()
+
+
+class DatabaseRoutingMiddleware:
+    """
+    Выбор базы для чтения каталога: изменяющие запросы работают только
+    с основной базой, а после успешного изменения пользователь еще
+    некоторое время читает из нее же.
+
+    Под ASGI работает асинхронно: состояние маршрутизации хранится
+    в контексте и доходит до потоков, где выполняются запросы к базе.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with routing_request(request):
+            response = self.get_response(request)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            self.pin(request, response)
+        return response
+
+    async def __acall__(self, request):
+        with routing_request(request):
+            response = await self.get_response(request)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            # request.user сессии загружается из базы при первом
+            # обращении, поэтому проверка выполняется в потоке.
+            await sync_to_async(self.pin)(request, response)
+        return response
+
+    def pin(self, request, response):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            pin_user(response, user.pk)
@@ -1,13 +1,27 @@
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.http import Http404
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
 from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
+from api.fast_serializers import compile_serializer
+from api.filters import ProductSearchFilter
+from api.replicas import use_primary
+from api.response_cache import CachedResponse, make_key, response_cache
+from products.cart import get_cart_summary
+from products.facets import FacetSelection, build_facets
 from products.models import Product
+from products.versions import catalog_version_scope, get_catalog_version
 
 User = get_user_model()
 
+# Скомпилированные сериализаторы CompiledListMixin по классам представлений.
+compiled_serializers = {}
+
 
 class CustomCreateUpdateDestroyMixin(generics.CreateAPIView,
                                      generics.UpdateAPIView,
@@ -20,17 +34,7 @@ class CustomCreateUpdateDestroyMixin(generics.CreateAPIView,
     lookup_field = 'product__id'
     lookup_url_kwarg = 'id'
 
-    def check_product_exist(self):
-        if not Product.objects.filter(
-            id=self.kwargs['id']
-        ).exists():
-            return Response(
-                'Такого объекта не существует!',
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
     def create(self, request, *args, **kwargs):
-        self.check_product_exist()
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         self.perform_create(serializer)
@@ -38,6 +42,7 @@ class CustomCreateUpdateDestroyMixin(generics.CreateAPIView,
         return Response(
             serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
+    @transaction.atomic
     def perform_create(self, serializer):
         product = get_object_or_404(Product, id=self.kwargs['id'])
         serializer.save(
@@ -45,37 +50,243 @@ class CustomCreateUpdateDestroyMixin(generics.CreateAPIView,
             product=product
         )
 
-    def check_product_in_shopping_cart_exist(self):
-        if not self.get_queryset().exists():
-            return Response(
-                'Такого объекта не существует!',
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
     def update(self, request, *args, **kwargs):
-        if not self.get_queryset().exists():
-            return Response(
-                'Такого объекта не существует!',
-                status=status.HTTP_400_BAD_REQUEST
-            )
         partial = kwargs.pop('partial', False)
         instance = self.get_object()
         serializer = self.get_serializer(
             instance, data=request.data, partial=partial
         )
         serializer.is_valid(raise_exception=True)
-        self.perform_update(serializer)
+        with transaction.atomic():
+            self.perform_update(serializer)
         return Response(serializer.data)
 
     def destroy(self, request, *args, **kwargs):
-        if not self.get_queryset().exists():
+        """
+        Удаляет строку одним запросом DELETE без предварительной
+        проверки: результат определяется по числу удаленных строк.
+        """
+        deleted, _ = self.get_queryset().filter(
+            **{self.lookup_field: self.kwargs[self.lookup_url_kwarg]}
+        ).delete()
+        if deleted:
             return Response(
-                'Такого объекта не существует!',
-                status=status.HTTP_400_BAD_REQUEST
+                {'message': 'Объект удален!'},
+                status=status.HTTP_204_NO_CONTENT
             )
-        instance = self.get_object()
-        self.perform_destroy(instance)
+        if not Product.objects.filter(id=self.kwargs['id']).exists():
+            raise Http404
         return Response(
-            {'message': 'Объект удален!'},
-            status=status.HTTP_204_NO_CONTENT
+            'Такого объекта не существует!',
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+
+class ConditionalGetMixin:
+    """
+    Миксин для ответа 304 на повторные запросы к каталогу.
+
+    ETag и Last-Modified строятся по версии каталога, а для персональных
+    ответов еще и по версии корзины пользователя. Проверка выполняется
+    до выборки объектов, а на время ответа версия каталога фиксируется
+    (catalog_version_scope).
+    """
+
+    personalized = False
+
+    def get_validators(self, request):
+        version, updated_at = get_catalog_version()
+        etag = f'catalog-{version}'
+        if self.personalized and request.user.is_authenticated:
+            # Итоги корзины нужны и для отметок корзины в ответе.
+            summary = self.cart_summary = get_cart_summary(request.user)
+            etag = f'{etag}-user-{request.user.pk}-cart-{summary.version}'
+            updated_at = max(updated_at, summary.updated_at)
+        return f'"{etag}"', int(updated_at.timestamp())
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        # Тело ответа строится по той же версии каталога, что и ETag.
+        with catalog_version_scope():
+            etag, last_modified = self.get_validators(request)
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is None:
+                response = handler(request, *args, **kwargs)
+        if response.status_code in (status.HTTP_200_OK,
+                                    status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+            patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+
+class CompiledRetrieveMixin:
+    """
+    Миксин для объекта тем же путем, что и список в CompiledListMixin:
+    строка values() с полями compiled_values из get_compiled_queryset
+    превращается в словарь функцией serialize_rows.
+    """
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = generics.get_object_or_404(
+            self.filter_queryset(self.get_compiled_queryset()).values(
+                *self.compiled_values
+            ),
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]},
+        )
+        self.check_object_permissions(request, row)
+        data = self.serialize_rows([row])
+        if not data:
+            raise Http404
+        return Response(data[0])
+
+
+class ResponseCacheMixin:
+    """
+    Миксин, отдающий анонимным пользователям ответы list и retrieve
+    из кэша ответов (api/response_cache.py).
+
+    Теги записи возвращает get_cache_tags по данным ответа: по умолчанию
+    это тег каждого объекта '<model_name>:<id>' и для списка тег выборки
+    cache_list_tag. Пересчет читает основную базу, чтобы отставание
+    реплик не попало в кэш после инвалидации.
+    """
+
+    cache_list_tag = None
+
+    def get_cached_objects(self, data):
+        """Словари объектов из данных ответа list или retrieve."""
+        if self.action == 'retrieve':
+            return [data]
+        return data['results'] if isinstance(data, dict) else data
+
+    def get_cache_tags(self, data):
+        model_name = self.get_queryset().model._meta.model_name
+        tags = {
+            f'{model_name}:{item["id"]}'
+            for item in self.get_cached_objects(data)
+        }
+        if self.action != 'retrieve' and self.cache_list_tag:
+            tags.add(self.cache_list_tag)
+        return tags
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if (not response_cache.enabled
+                or request.user.is_authenticated
+                or request.accepted_renderer.format != 'json'):
+            return handler(request, *args, **kwargs)
+        computed = []
+
+        def compute():
+            with use_primary():
+                response = handler(request, *args, **kwargs)
+            computed.append(response)
+            if (not isinstance(response, Response)
+                    or response.status_code != status.HTTP_200_OK):
+                return None
+            renderer = request.accepted_renderer
+            context = self.get_renderer_context()
+            context['response'] = response
+            content_type = renderer.media_type
+            if renderer.charset:
+                content_type = f'{content_type}; charset={renderer.charset}'
+            return CachedResponse(
+                renderer.render(
+                    response.data, request.accepted_media_type, context
+                ),
+                content_type,
+                self.get_cache_tags(response.data),
+            )
+
+        entry = response_cache.fetch(make_key(request), compute)
+        if entry is None:
+            return computed[0]
+        return entry.to_response()
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
         )
+
+
+class FacetMixin:
+    """
+    Миксин, добавляющий к списку продуктов счетчики фасетов.
+
+    Без поиска и произвольных границ цены счетчики берутся из таблицы
+    фасетов, иначе считаются группировкой по отфильтрованной выборке.
+    """
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        selection = FacetSelection(request.query_params)
+        queryset = None
+        if (not selection.uses_cells
+                or ProductSearchFilter().get_search_text(request)):
+            queryset = self.filter_queryset(self.get_queryset())
+        response.data['facets'] = build_facets(selection.get_cells(queryset))
+        return response
+
+
+class CompiledListMixin:
+    """
+    Миксин для списка через скомпилированный сериализатор.
+
+    Выборка из get_compiled_queryset читается через values() с полями
+    compiled_values и полями ключа пагинации, а строки превращаются
+    в словари функцией serialize_rows без создания объектов моделей
+    и полей DRF. По умолчанию serialize_rows собирает сериализатор
+    представления через compile_serializer с функциями compiled_methods
+    и передает им контекст сериализатора.
+    """
+
+    compiled_values = ()
+    compiled_methods = None
+
+    def get_compiled_queryset(self):
+        return self.get_queryset()
+
+    def get_compiled_serializer(self):
+        viewset_class = type(self)
+        if viewset_class not in compiled_serializers:
+            compiled_serializers[viewset_class] = compile_serializer(
+                self.get_serializer_class(), self.compiled_methods
+            )
+        return compiled_serializers[viewset_class]
+
+    def serialize_rows(self, rows):
+        serialize = self.get_compiled_serializer()
+        context = self.get_serializer_context()
+        return [serialize(row, context) for row in rows]
+
+    def get_compiled_values(self):
+        ordering = getattr(self, 'get_keyset_ordering', lambda: None)()
+        fields = list(self.compiled_values)
+        for field in ordering or ():
+            if field.lstrip('-') not in fields:
+                fields.append(field.lstrip('-'))
+        return fields
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(
+            self.get_compiled_queryset()
+        ).prefetch_related(None).values(*self.get_compiled_values())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.serialize_rows(page))
+        return Response(self.serialize_rows(list(queryset)))
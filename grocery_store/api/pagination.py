@@ -1,7 +1,217 @@
-from rest_framework.pagination import PageNumberPagination
+import binascii
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import reduce
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class CustomPagination(PageNumberPagination):
     '''Кастомный пагинатор'''
 
     page_size = 6
+
+
+class KeysetPagination(BasePagination):
+    '''
+    Пагинатор по ключу сортировки с непрозрачным курсором.
+
+    Не выполняет COUNT(*) и OFFSET: следующая страница выбирается условием
+    на ключ последнего объекта. Порядок задается атрибутом keyset_ordering
+    представления, последнее поле ключа должно быть уникальным.
+    При наличии параметра page или если представление вернуло None из
+    get_keyset_ordering, работает как CustomPagination.
+    '''
+
+    page_size = 6
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    legacy_query_param = 'page'
+    ordering = ('-id',)
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.legacy = None
+        ordering = self.get_keyset_ordering(view)
+        if ordering is None or (
+            self.legacy_query_param in request.query_params
+        ):
+            self.legacy = CustomPagination()
+            return self.legacy.paginate_queryset(queryset, request, view)
+
+        self.ordering = ordering
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request, queryset, view)
+        reverse = cursor is not None and cursor[0] == 'p'
+
+        if isinstance(queryset, list):
+            try:
+                items = self.slice_list(queryset, cursor, page_size + 1)
+            except TypeError:
+                # Значения курсора несравнимы с ключами списка.
+                raise NotFound(self.invalid_cursor_message)
+        else:
+            items = self.slice_queryset(queryset, cursor, page_size + 1)
+        has_more = len(items) > page_size
+        self.page = items[:page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        return self.page
+
+    def get_keyset_ordering(self, view):
+        if hasattr(view, 'get_keyset_ordering'):
+            return view.get_keyset_ordering()
+        return getattr(view, 'keyset_ordering', self.ordering)
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_key(self, item):
+        if isinstance(item, dict):
+            return [item[field.lstrip('-')] for field in self.ordering]
+        return [getattr(item, field.lstrip('-')) for field in self.ordering]
+
+    def get_cursor_model(self, queryset, view):
+        """Модель, по полям которой проверяются значения курсора."""
+        if not isinstance(queryset, list):
+            return queryset.model
+        return getattr(getattr(view, 'queryset', None), 'model', None)
+
+    def decode_cursor(self, request, queryset, view=None):
+        """
+        Направление и ключ из курсора. Число значений ключа должно
+        совпадать с числом полей сортировки, а каждое значение -
+        приводиться к типу своего поля, иначе ответ 404, как у
+        CursorPagination в DRF.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        model = self.get_cursor_model(queryset, view)
+        try:
+            direction, key = json.loads(
+                urlsafe_b64decode(encoded.encode('ascii'))
+            )
+            if direction not in ('n', 'p') or not isinstance(key, list) or (
+                len(key) != len(self.ordering)
+            ):
+                raise ValueError
+            if any(
+                value is None or isinstance(value, (bool, list, dict))
+                for value in key
+            ):
+                raise ValueError
+            if model is not None:
+                key = [
+                    model._meta.get_field(field.lstrip('-')).to_python(value)
+                    for field, value in zip(self.ordering, key)
+                ]
+        except (TypeError, ValueError, binascii.Error, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return direction, key
+
+    def encode_cursor(self, direction, item):
+        key = [
+            value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in self.get_key(item)
+        ]
+        encoded = urlsafe_b64encode(
+            json.dumps([direction, key], default=str).encode()
+        ).decode('ascii')
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded
+        )
+
+    def get_ordering(self, reverse):
+        if not reverse:
+            return self.ordering
+        return [
+            field[1:] if field.startswith('-') else '-' + field
+            for field in self.ordering
+        ]
+
+    def slice_queryset(self, queryset, cursor, limit):
+        if cursor is None:
+            return list(queryset.order_by(*self.ordering)[:limit])
+        direction, key = cursor
+        ordering = self.get_ordering(direction == 'p')
+        conditions = []
+        for position, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition = {
+                ordering[index].lstrip('-'): key[index]
+                for index in range(position)
+            }
+            condition[f'{name}__{lookup}'] = key[position]
+            conditions.append(Q(**condition))
+        return list(
+            queryset.filter(
+                reduce(lambda left, right: left | right, conditions)
+            ).order_by(*ordering)[:limit]
+        )
+
+    def slice_list(self, items, cursor, limit):
+        if cursor is None:
+            return items[:limit]
+        direction, key = cursor
+        if direction == 'p':
+            items = items[::-1]
+        ordering = self.get_ordering(direction == 'p')
+        result = []
+        for item in items:
+            if self.follows(self.get_key(item), key, ordering):
+                result.append(item)
+                if len(result) == limit:
+                    break
+        return result
+
+    @staticmethod
+    def follows(item_key, cursor_key, ordering):
+        for field, value, bound in zip(ordering, item_key, cursor_key):
+            if value == bound:
+                continue
+            if field.startswith('-'):
+                return value < bound
+            return value > bound
+        return False
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor('n', self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(
+                self.base_url, self.cursor_query_param
+            )
+        return self.encode_cursor('p', self.page[0])
+
+    def get_paginated_response(self, data):
+        if self.legacy is not None:
+            return self.legacy.get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
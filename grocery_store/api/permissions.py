@@ -1,3 +1,6 @@
+import ipaddress
+
+from django.conf import settings
 from rest_framework import permissions
 
 
@@ -6,3 +9,22 @@ class IsOwner(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
         return (obj.user == request.user)
+
+
+class IsMetricsClient(permissions.BasePermission):
+    """
+    Проверка: запрос пришел с адреса из METRICS_ALLOWED_NETWORKS
+    или от администратора.
+    """
+
+    def has_permission(self, request, view):
+        try:
+            address = ipaddress.ip_address(request.META.get('REMOTE_ADDR'))
+        except ValueError:
+            address = None
+        if address is not None and any(
+            address in ipaddress.ip_network(network)
+            for network in settings.METRICS_ALLOWED_NETWORKS
+        ):
+            return True
+        return bool(request.user and request.user.is_staff)
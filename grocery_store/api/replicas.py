@@ -0,0 +1,132 @@
+"""
+Маршрутизация запросов к базе между основной базой и репликами.
+
+Запись, корзина и авторизация всегда идут в default. Чтение моделей
+каталога из DATABASE_REPLICA_MODELS в HTTP-запросах распределяется
+по репликам из DATABASE_REPLICAS, кроме случаев, когда нужна основная
+база:
+
+- внутри транзакции на default;
+- в изменяющем запросе (POST, PUT, PATCH, DELETE) и в блоке use_primary;
+- в течение DATABASE_PRIMARY_PIN_SECONDS после изменяющего запроса
+  того же пользователя, чтобы он сразу видел свои изменения.
+
+Отметка о последнем изменении - подписанная cookie DATABASE_PIN_COOKIE
+с id пользователя и временем подписи. Она приходит с запросом в любой
+рабочий процесс и не требует общего кэша.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+PIN_COOKIE_SALT = 'api.replicas.pin'
+
+_state = ContextVar('database_routing', default=None)
+
+
+def is_pinned(request, user_id):
+    """
+    Изменял ли пользователь данные за последние
+    DATABASE_PRIMARY_PIN_SECONDS: подпись cookie проверяется вместе
+    со временем, поэтому просроченная или чужая отметка не действует.
+    """
+    value = request.get_signed_cookie(
+        settings.DATABASE_PIN_COOKIE,
+        default=None,
+        salt=PIN_COOKIE_SALT,
+        max_age=settings.DATABASE_PRIMARY_PIN_SECONDS,
+    )
+    return value == str(user_id)
+
+
+class RoutingState:
+    """Состояние маршрутизации одного запроса."""
+
+    def __init__(self, request=None, pinned=False):
+        self.request = request
+        self.pinned = pinned
+
+    def uses_primary(self):
+        if self.pinned:
+            return True
+        user = getattr(self.request, 'user', None)
+        if user is None or not user.is_authenticated:
+            return False
+        # Пользователь известен только после аутентификации DRF,
+        # поэтому проверка выполняется при первом чтении после нее.
+        self.pinned = is_pinned(self.request, user.pk)
+        self.request = None
+        return self.pinned
+
+
+@contextmanager
+def routing_request(request):
+    """Маршрутизация для запроса: изменяющие запросы идут в default."""
+    token = _state.set(RoutingState(
+        request, pinned=request.method not in SAFE_METHODS
+    ))
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+@contextmanager
+def use_primary():
+    """Все чтения внутри блока выполняются на основной базе."""
+    token = _state.set(RoutingState(pinned=True))
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+def pin_user(response, user_id):
+    """
+    Направляет чтения пользователя в default на время задержки реплик:
+    ставит в ответ подписанную cookie с отметкой.
+    """
+    if settings.DATABASE_REPLICAS and settings.DATABASE_PRIMARY_PIN_SECONDS:
+        response.set_signed_cookie(
+            settings.DATABASE_PIN_COOKIE,
+            str(user_id),
+            salt=PIN_COOKIE_SALT,
+            max_age=settings.DATABASE_PRIMARY_PIN_SECONDS,
+            httponly=True,
+            samesite='Lax',
+        )
+
+
+class PrimaryReplicaRouter:
+    """Роутер Django: каталог читается с реплик, остальное - с default."""
+
+    def db_for_read(self, model, **hints):
+        if not settings.DATABASE_REPLICAS:
+            return None
+        if model._meta.label_lower not in settings.DATABASE_REPLICA_MODELS:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        state = _state.get()
+        # Команды и фоновые задачи работают с основной базой.
+        if state is None or state.uses_primary():
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схему реплик повторяет репликация, миграции - только на default.
+        return db not in settings.DATABASE_REPLICAS
@@ -0,0 +1,348 @@
+"""
+Кэш ответов каталога для анонимных пользователей.
+
+Ответ хранится уже отрисованным под ключом из адреса запроса
+с отсортированными параметрами. Каждая запись помечена тегами объектов,
+которые в нее попали ('product:<id>', 'category:<id>',
+'sub_category:<id>'), и тегами выборок ('products', 'product-search',
+'categories', 'catalog'). Сигналы из api/signals.py после фиксации
+транзакции меняют версии затронутых тегов, а запись действительна,
+только пока версии всех ее тегов совпадают с сохраненными в ней.
+
+Пересчет записи выполняет один запрос: остальные запросы процесса ждут
+его результата, а при общем кэше запросы других процессов ждут,
+пока держится аренда пересчета. Если во время пересчета что-то было
+инвалидировано, результат не сохраняется: данные могли быть прочитаны
+до изменения.
+
+Версии тегов хранятся там же, где записи. В общем кэше Django
+(RESPONSE_CACHE_ALIAS) они общие для всех процессов, и изменение
+в любом процессе сразу сбрасывает затронутые записи. LRU в памяти
+процесса (RESPONSE_CACHE_ALIAS = None) подходит для одного процесса:
+изменения из других процессов дойдут до него только через
+RESPONSE_CACHE_TTL.
+"""
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+PRODUCTS_TAG = 'products'
+PRODUCT_SEARCH_TAG = 'product-search'
+CATEGORIES_TAG = 'categories'
+CATALOG_TAG = 'catalog'
+
+POLL_INTERVAL = 0.05
+
+
+def product_tag(product_id):
+    return f'product:{product_id}'
+
+
+def category_tag(category_id):
+    return f'category:{category_id}'
+
+
+def sub_category_tag(sub_category_id):
+    return f'sub_category:{sub_category_id}'
+
+
+def make_key(request):
+    """Ключ ответа: адрес, формат и отсортированные параметры запроса."""
+    params = sorted(
+        (name, value)
+        for name, values in request.query_params.lists()
+        for value in values
+    )
+    raw = '\n'.join((
+        request.scheme,
+        request.get_host(),
+        request.path,
+        request.accepted_media_type,
+        urlencode(params),
+    ))
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+class CachedResponse:
+    """Отрисованный ответ с тегами и их версиями на момент пересчета."""
+
+    __slots__ = ('content', 'content_type', 'tags', 'versions')
+
+    def __init__(self, content, content_type, tags):
+        self.content = content
+        self.content_type = content_type
+        self.tags = tuple(sorted(tags))
+        self.versions = None
+
+    @property
+    def size(self):
+        return len(self.content) + sum(len(tag) for tag in self.tags)
+
+    def to_response(self):
+        return HttpResponse(self.content, content_type=self.content_type)
+
+
+class LocalStore:
+    """
+    LRU в памяти процесса, ограниченный суммарным размером записей.
+
+    Версии тегов - номера из общего счетчика, их не больше max_tags.
+    Вытесненный тег и тег без версии получают номер floor, который при
+    вытеснении поднимается до счетчика: записи с вытесненным тегом
+    перестают совпадать, а не оживают с прежней версией.
+    """
+
+    shared = False
+
+    def __init__(self, max_bytes, max_tags):
+        self.max_bytes = max_bytes
+        self.max_tags = max_tags
+        self.entries = OrderedDict()
+        self.size = 0
+        self.versions = OrderedDict()
+        self.floor = 0
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                return None
+            if item[1] <= now:
+                self.remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return item[0]
+
+    def set(self, key, entry, ttl):
+        with self.lock:
+            self.remove(key)
+            if entry.size > self.max_bytes:
+                return
+            self.entries[key] = (entry, time.monotonic() + ttl)
+            self.size += entry.size
+            while self.size > self.max_bytes:
+                _, (evicted, _) = self.entries.popitem(last=False)
+                self.size -= evicted.size
+
+    def delete(self, key):
+        with self.lock:
+            self.remove(key)
+
+    def remove(self, key):
+        item = self.entries.pop(key, None)
+        if item is not None:
+            self.size -= item[0].size
+
+    def get_versions(self, tags):
+        with self.lock:
+            return tuple(self.versions.get(tag, self.floor) for tag in tags)
+
+    def bump(self, tags):
+        with self.lock:
+            self.generation += 1
+            for tag in tags:
+                self.versions.pop(tag, None)
+                self.versions[tag] = self.generation
+            while len(self.versions) > self.max_tags:
+                self.versions.popitem(last=False)
+                self.floor = self.generation
+
+    def get_generation(self):
+        return self.generation
+
+    def acquire(self, key, timeout):
+        # Запросы процесса уже ждут друг друга в ResponseCache.fetch.
+        return True
+
+    def release(self, key):
+        pass
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'bytes': self.size}
+
+
+class SharedStore:
+    """
+    Общий кэш Django. Версии тегов - случайные метки без срока жизни:
+    если кэш вытеснит метку, записи с ней просто перестанут совпадать.
+    """
+
+    shared = True
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get(self, key):
+        return self.cache.get(f'response:{key}')
+
+    def set(self, key, entry, ttl):
+        self.cache.set(f'response:{key}', entry, ttl)
+
+    def delete(self, key):
+        self.cache.delete(f'response:{key}')
+
+    def get_versions(self, tags):
+        keys = [f'response-tag:{tag}' for tag in tags]
+        versions = self.cache.get_many(keys)
+        missing = {
+            key: uuid.uuid4().hex for key in keys if key not in versions
+        }
+        if missing:
+            self.cache.set_many(missing, None)
+            versions.update(missing)
+        return tuple(versions[key] for key in keys)
+
+    def bump(self, tags):
+        self.cache.set_many({
+            f'response-tag:{tag}': uuid.uuid4().hex for tag in tags
+        }, None)
+        self.cache.set('response-generation', uuid.uuid4().hex, None)
+
+    def get_generation(self):
+        return self.cache.get('response-generation')
+
+    def acquire(self, key, timeout):
+        return self.cache.add(f'response-lease:{key}', 1, timeout)
+
+    def release(self, key):
+        self.cache.delete(f'response-lease:{key}')
+
+    def clear(self):
+        self.bump([CATALOG_TAG])
+
+    def stats(self):
+        # Объем общего кэша виден в метриках его сервера.
+        return {'entries': 0, 'bytes': 0}
+
+
+class ResponseCache:
+    """Кэш ответов с тегами и пересчетом записи одним запросом."""
+
+    def __init__(self, store, ttl, lock_timeout):
+        self.store = store
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self.flights = {}
+        self.lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0, 'stale': 0, 'waits': 0}
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def lookup(self, key):
+        entry = self.store.get(key)
+        if entry is None:
+            return None
+        if self.store.get_versions(entry.tags) != entry.versions:
+            self.store.delete(key)
+            self.count('stale')
+            return None
+        self.count('hits')
+        return entry
+
+    def fetch(self, key, compute):
+        """
+        Возвращает запись из кэша или результат compute().
+
+        compute возвращает CachedResponse или None, если ответ
+        кэшировать нельзя.
+        """
+        entry = self.lookup(key)
+        if entry is not None:
+            return entry
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = threading.Event()
+        if not leader:
+            self.count('waits')
+            flight.wait(self.lock_timeout)
+            entry = self.lookup(key)
+            if entry is not None:
+                return entry
+        try:
+            return self.fill(key, compute)
+        finally:
+            if leader:
+                with self.lock:
+                    del self.flights[key]
+                flight.set()
+
+    def fill(self, key, compute):
+        acquired = self.store.acquire(key, self.lock_timeout)
+        if not acquired:
+            self.count('waits')
+            deadline = time.monotonic() + self.lock_timeout
+            while not acquired and time.monotonic() < deadline:
+                time.sleep(POLL_INTERVAL)
+                entry = self.lookup(key)
+                if entry is not None:
+                    return entry
+                acquired = self.store.acquire(key, self.lock_timeout)
+        self.count('misses')
+        try:
+            generation = self.store.get_generation()
+            entry = compute()
+            if entry is None:
+                return None
+            entry.tags = tuple(sorted({*entry.tags, CATALOG_TAG}))
+            entry.versions = self.store.get_versions(entry.tags)
+            if self.store.get_generation() == generation:
+                self.store.set(key, entry, self.ttl)
+            return entry
+        finally:
+            if acquired:
+                self.store.release(key)
+
+    def invalidate(self, *tags):
+        if tags:
+            self.store.bump(tags)
+
+    def clear(self):
+        self.store.clear()
+        with self.lock:
+            for name in self.counters:
+                self.counters[name] = 0
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+        stats.update(self.store.stats())
+        return stats
+
+
+response_cache = ResponseCache(
+    SharedStore(settings.RESPONSE_CACHE_ALIAS)
+    if settings.RESPONSE_CACHE_ALIAS
+    else LocalStore(
+        settings.RESPONSE_CACHE_MAX_BYTES, settings.RESPONSE_CACHE_MAX_TAGS
+    ),
+    settings.RESPONSE_CACHE_TTL,
+    settings.RESPONSE_CACHE_LOCK_TIMEOUT,
+)
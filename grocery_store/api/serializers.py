@@ -3,11 +3,14 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.core.validators import MaxLengthValidator, RegexValidator
 from django.db.models import Count, F, Sum
-from django.shortcuts import get_object_or_404
 from djoser.serializers import UserCreateSerializer
 from rest_framework import serializers
 
-from products.models import Category, Image, Product, ShoppingCart, SubCategory
+from products.cart import CART_OPERATIONS, CART_SET
+from products.models import (CartSummary, Category, Image, Product,
+                             ShoppingCart, SubCategory)
+from products.renditions import rendition_urls
+from products.taxonomy import get_taxonomy
 
 
 User = get_user_model()
@@ -103,9 +106,7 @@ class SubCategorySerializer(serializers.ModelSerializer):
         )
 
     def get_image(self, obj):
-        if obj.image:
-            return obj.image.url
-        return None
+        return rendition_urls(obj.image.storage, obj.image.name)
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -127,16 +128,10 @@ class CategorySerializer(serializers.ModelSerializer):
         )
 
     def get_image(self, obj):
-        if obj.image:
-            return obj.image.url
-        return None
+        return rendition_urls(obj.image.storage, obj.image.name)
 
     def get_sub_categories(self, obj):
-        sub_categories = SubCategorySerializer(
-            SubCategory.objects.filter(category=obj),
-            many=True
-        ).data
-        return sub_categories
+        return get_taxonomy().sub_categories(obj.id)
 
 
 class ImageSerializer(serializers.ModelSerializer):
@@ -144,6 +139,8 @@ class ImageSerializer(serializers.ModelSerializer):
     Сериализатор для модели изображений.
     """
 
+    image = serializers.SerializerMethodField()
+
     class Meta:
         model = Image
         fields = (
@@ -151,6 +148,9 @@ class ImageSerializer(serializers.ModelSerializer):
             'image',
         )
 
+    def get_image(self, obj):
+        return rendition_urls(obj.image.storage, obj.image.name)
+
 
 class ProductSerializer(serializers.ModelSerializer):
     """
@@ -159,26 +159,27 @@ class ProductSerializer(serializers.ModelSerializer):
 
     id = serializers.IntegerField(read_only=True)
     images = serializers.SerializerMethodField()
-    sub_category = SubCategorySerializer(
-        read_only=True,
-    )
+    sub_category = serializers.SerializerMethodField()
     category = serializers.SerializerMethodField()
-    is_in_shopping_cart = serializers.BooleanField()
+    is_in_shopping_cart = serializers.SerializerMethodField()
 
     def get_images(self, obj):
         images = ImageSerializer(
-            Image.objects.filter(product=obj),
+            obj.products_image.all(),
             many=True
         ).data
         return images
 
+    def get_sub_category(self, obj):
+        return get_taxonomy().sub_category(obj.sub_category_id)
+
     def get_category(self, obj):
-        sub_category = get_object_or_404(SubCategory, name=obj.sub_category)
-        category = CategorySerializer(
-            get_object_or_404(Category, name=sub_category.category),
-        ).data
-        category.pop('sub_categories')
-        return category
+        return get_taxonomy().category_of(obj.sub_category_id)
+
+    def get_is_in_shopping_cart(self, obj):
+        # Выборка каталога не зависит от пользователя: id продуктов
+        # из его корзины передаются в контексте.
+        return obj.id in self.context.get('cart_product_ids', ())
 
     class Meta:
         model = Product
@@ -221,11 +222,17 @@ class ProductInShoppingCartSerializer(serializers.ModelSerializer):
         read_only=True,
         slug_field='username',
     )
-    product = ProductMinifieldSerializer(
-        read_only=True,
-    )
+    product = serializers.SerializerMethodField()
     summ = serializers.SerializerMethodField()
 
+    def get_product(self, obj):
+        # Списки корзины передают готовые представления продуктов
+        # из кэша фрагментов (api/fragments.py), в ответ идет копия.
+        fragments = self.context.get('product_fragments')
+        if fragments is not None and obj.product_id in fragments:
+            return dict(fragments[obj.product_id])
+        return ProductMinifieldSerializer(obj.product).data
+
     def get_queryset(self):
         return self.context['request'].user.shopping_cart.all().annotate(
             total_summ=Sum('product__price' * 'amount')
@@ -241,7 +248,9 @@ class ProductInShoppingCartSerializer(serializers.ModelSerializer):
         return value
 
     def get_summ(self, obj):
-        summ = obj.amount * obj.product.price
+        summ = getattr(obj, 'summ', None)
+        if summ is None:
+            summ = obj.amount * obj.product.price
         return summ
 
     class Meta:
@@ -250,29 +259,26 @@ class ProductInShoppingCartSerializer(serializers.ModelSerializer):
 
 
 class ShoppingCartSerializer(serializers.ModelSerializer):
-    """Сериализатор для получения всех товаров корзины."""
+    """Сериализатор для получения всех товаров корзины.
+
+    Принимает список строк корзины из products.cart.get_cart_lines.
+    """
 
     list_of_products = serializers.SerializerMethodField()
     total_summ = serializers.SerializerMethodField()
     products_count = serializers.SerializerMethodField()
 
-    def get_queryset(self):
-        return ShoppingCart.objects.filter(
-            user=self.context['request'].user
-        )
-
     def get_total_summ(self, obj):
-        return self.get_queryset().annotate(
-            summ=F('product__price') * F('amount')
-        ).aggregate(total_summ=Sum('summ'))['total_summ']
+        if not obj:
+            return None
+        return sum(line.summ for line in obj)
 
     def get_products_count(self, obj):
-        return obj.count()
+        return len(obj)
 
     def get_list_of_products(self, obj):
         return ProductInShoppingCartSerializer(
-            ShoppingCart.objects.filter(user=self.context['request'].user),
-            many=True
+            obj, many=True, context=self.context
         ).data
 
     class Meta:
@@ -280,6 +286,52 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
         fields = ('list_of_products', 'total_summ', 'products_count')
 
 
+class CartOperationSerializer(serializers.Serializer):
+    """Сериализатор для одной операции пакетного изменения корзины."""
+
+    product_id = serializers.IntegerField()
+    amount = serializers.IntegerField(required=False, default=1)
+    operation = serializers.ChoiceField(
+        choices=CART_OPERATIONS,
+        required=False,
+        default=CART_SET,
+    )
+
+    def validate(self, data):
+        if data['operation'] == CART_SET and data['amount'] < 0:
+            raise serializers.ValidationError(
+                'Количество не может быть отрицательным!'
+            )
+        return data
+
+
+class CartBatchSerializer(serializers.Serializer):
+    """Сериализатор для пакетного изменения корзины."""
+
+    operations = CartOperationSerializer(many=True, allow_empty=False)
+
+    def validate_operations(self, value):
+        product_ids = {operation['product_id'] for operation in value}
+        existing = set(Product.objects.filter(
+            id__in=product_ids
+        ).values_list('id', flat=True))
+        missing = sorted(product_ids - existing)
+        if missing:
+            raise serializers.ValidationError(
+                'Таких продуктов не существует: '
+                + ', '.join(map(str, missing))
+            )
+        return value
+
+
+class CartSummarySerializer(serializers.ModelSerializer):
+    """Сериализатор для итогов корзины."""
+
+    class Meta:
+        model = CartSummary
+        fields = ('total_summ', 'products_count')
+
+
 class ExtraShoppingCartSerializer(serializers.ModelSerializer):
     """Сериализатор для получения всех товаров корзины."""
 
@@ -0,0 +1,132 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.authentication import token_cache
+from api.response_cache import (CATALOG_TAG, CATEGORIES_TAG, PRODUCTS_TAG,
+                                PRODUCT_SEARCH_TAG, category_tag, product_tag,
+                                response_cache, sub_category_tag)
+from products.models import Category, Image, Product, SubCategory
+from products.versions import catalog_replaced
+
+User = get_user_model()
+
+# Поля пользователя, при сохранении которых сбрасываются его токены.
+USER_CREDENTIALS_FIELDS = ('password', 'is_active')
+
+# Поля продукта, от которых зависят состав и порядок списков продуктов
+# и счетчики фасетов, и поля, по которым ищет полнотекстовый поиск.
+PRODUCT_LIST_FIELDS = ('sub_category_id', 'price', 'is_avaliable', 'pub_date')
+PRODUCT_SEARCH_FIELDS = ('name',)
+
+
+def invalidate_tokens(*keys):
+    """
+    Сбрасываем токены из кэша сразу и еще раз после фиксации транзакции:
+    запрос, прочитавший токен до фиксации, мог снова положить его в кэш.
+    """
+    token_cache.delete(*keys)
+    transaction.on_commit(lambda: token_cache.delete(*keys))
+
+
+def invalidate_responses(*tags):
+    """Сбрасываем ответы с тегами после фиксации транзакции."""
+    if response_cache.enabled:
+        transaction.on_commit(lambda: response_cache.invalidate(*tags))
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    """Сбрасываем токен из кэша при выходе пользователя."""
+    invalidate_tokens(instance.key)
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created, update_fields, **kwargs):
+    """
+    Сбрасываем токены пользователя при сохранении: смене пароля,
+    деактивации, изменении данных. Сохранение отдельных полей без пароля
+    и is_active, например last_login при входе, токены не сбрасывает.
+    """
+    if created:
+        return
+    if update_fields is not None and not set(update_fields) & set(
+        USER_CREDENTIALS_FIELDS
+    ):
+        return
+    keys = list(Token.objects.filter(user=instance).values_list(
+        'key', flat=True
+    ))
+    if keys:
+        invalidate_tokens(*keys)
+
+
+@receiver(pre_save, sender=Product)
+def product_before_save(sender, instance, **kwargs):
+    """Запоминаем поля продукта, от которых зависят списки."""
+    instance._previous_response_values = None
+    if instance.pk is None or not response_cache.enabled:
+        return
+    instance._previous_response_values = sender.objects.filter(
+        pk=instance.pk
+    ).values_list(*PRODUCT_LIST_FIELDS, *PRODUCT_SEARCH_FIELDS).first()
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, **kwargs):
+    """
+    Сбрасываем ответы с продуктом, а списки - только если продукт мог
+    в них появиться, исчезнуть или сдвинуться.
+    """
+    previous = getattr(instance, '_previous_response_values', None)
+    current = tuple(
+        getattr(instance, field)
+        for field in (*PRODUCT_LIST_FIELDS, *PRODUCT_SEARCH_FIELDS)
+    )
+    tags = [product_tag(instance.pk)]
+    if previous is None:
+        tags += [PRODUCTS_TAG, PRODUCT_SEARCH_TAG]
+    else:
+        size = len(PRODUCT_LIST_FIELDS)
+        if previous[:size] != current[:size]:
+            tags += [PRODUCTS_TAG, PRODUCT_SEARCH_TAG]
+        elif previous[size:] != current[size:]:
+            tags.append(PRODUCT_SEARCH_TAG)
+    invalidate_responses(*tags)
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    invalidate_responses(
+        product_tag(instance.pk), PRODUCTS_TAG, PRODUCT_SEARCH_TAG
+    )
+
+
+@receiver(post_save, sender=Image)
+@receiver(post_delete, sender=Image)
+def product_image_changed(sender, instance, **kwargs):
+    invalidate_responses(product_tag(instance.product_id))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, instance, **kwargs):
+    invalidate_responses(category_tag(instance.pk), CATEGORIES_TAG)
+
+
+@receiver(post_save, sender=SubCategory)
+@receiver(post_delete, sender=SubCategory)
+def sub_category_changed(sender, instance, **kwargs):
+    """Подкатегория видна и в ответах своей категории."""
+    invalidate_responses(
+        sub_category_tag(instance.pk),
+        category_tag(instance.category_id),
+        CATEGORIES_TAG,
+    )
+
+
+@receiver(catalog_replaced)
+def catalog_reloaded(sender, **kwargs):
+    invalidate_responses(CATALOG_TAG)
@@ -0,0 +1,88 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db.backends.signals import connection_created
+from django.test import TransactionTestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.authentication import token_cache
+from api.fragments import fragment_cache
+from products.models import Category, Image, Product, SubCategory
+
+User = get_user_model()
+
+
+class AsyncCatalogViewTests(TransactionTestCase):
+    """
+    Асинхронные точки входа отвечают так же, как синхронные, включая
+    ETag и ответ 304, и каждый запрос работает с базой через одно
+    соединение.
+    """
+
+    def setUp(self):
+        category = Category.objects.create(name='Овощи', slug='vegetables')
+        sub_category = SubCategory.objects.create(
+            name='Корнеплоды', slug='roots', category=category
+        )
+        self.product = Product.objects.create(
+            name='Морковь',
+            slug='carrot',
+            price=Decimal('1.20'),
+            measurement_unit='кг',
+            is_avaliable=True,
+            sub_category=sub_category,
+        )
+        Image.objects.create(
+            product=self.product, image='products/images/carrot.png'
+        )
+        user = User.objects.create_user(
+            username='buyer',
+            email='buyer@example.com',
+            password='buyer-password',
+        )
+        token = Token.objects.create(user=user)
+        fragment_cache.clear()
+        token_cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.connections = []
+        connection_created.connect(self.connection_opened)
+        self.addCleanup(
+            connection_created.disconnect, self.connection_opened
+        )
+
+    def connection_opened(self, sender, connection, **kwargs):
+        self.connections.append(connection)
+
+    def assert_same_response(self, url):
+        expected = self.client.get(url)
+        self.connections.clear()
+        response = self.client.get(url.replace('/api/', '/api/async/'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), expected.json())
+        self.assertEqual(response['ETag'], expected['ETag'])
+        self.assertEqual(len(self.connections), 1)
+
+    def test_product_list(self):
+        self.assert_same_response('/api/products/')
+
+    def test_product_detail(self):
+        self.assert_same_response(f'/api/products/{self.product.id}/')
+
+    def test_categories(self):
+        self.assert_same_response('/api/categories/')
+
+    def test_cart_summary(self):
+        url = '/api/async/products/shopping_cart/summary/'
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.client.credentials()
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+    def test_not_modified(self):
+        self.client.credentials()
+        etag = self.client.get('/api/async/products/')['ETag']
+        response = self.client.get(
+            '/api/async/products/', HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 304)
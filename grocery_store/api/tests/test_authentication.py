@@ -0,0 +1,71 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.authentication import CachedTokenAuthentication, token_cache
+
+User = get_user_model()
+
+
+class TokenCacheTests(TestCase):
+    """
+    Попадание в кэш токенов не обращается к базе, а выход и изменение
+    пользователя сбрасывают только его записи, в том числе в общем кэше.
+    """
+
+    def setUp(self):
+        patcher = mock.patch.object(token_cache, 'alias', 'default')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        caches['default'].clear()
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+        self.tokens = []
+        for name in ('buyer', 'other'):
+            user = User.objects.create_user(
+                username=name,
+                email=f'{name}@example.com',
+                password=f'{name}-password',
+            )
+            self.tokens.append(Token.objects.create(user=user))
+        self.authentication = CachedTokenAuthentication()
+        for token in self.tokens:
+            self.authentication.authenticate_credentials(token.key)
+
+    def cached(self, token):
+        local = token_cache.entries.get(token.key)
+        shared = token_cache.shared.get(token_cache.shared_key(token.key))
+        return local is not None, shared is not None
+
+    def test_hit_does_not_query_database(self):
+        with self.assertNumQueries(0):
+            user, _ = self.authentication.authenticate_credentials(
+                self.tokens[0].key
+            )
+        self.assertEqual(user.username, 'buyer')
+
+    def test_logout_drops_only_that_token(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tokens[0].delete()
+        self.assertEqual(self.cached(self.tokens[0]), (False, False))
+        self.assertEqual(self.cached(self.tokens[1]), (True, True))
+
+    def test_deactivation_drops_user_tokens(self):
+        user = self.tokens[0].user
+        user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        self.assertEqual(self.cached(self.tokens[0]), (False, False))
+        self.assertEqual(self.cached(self.tokens[1]), (True, True))
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.tokens[0].key}')
+        response = client.get('/api/products/shopping_cart/summary/')
+        self.assertEqual(response.status_code, 401)
+
+    def test_last_login_keeps_tokens(self):
+        self.tokens[0].user.save(update_fields=['last_login'])
+        self.assertEqual(self.cached(self.tokens[0]), (True, True))
@@ -0,0 +1,119 @@
+import threading
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TransactionTestCase
+from rest_framework.authtoken.models import Token
+
+from products.cart import get_cart_summary
+from products.models import (CartSummary, Category, Product, ShoppingCart,
+                             SubCategory)
+
+User = get_user_model()
+
+THREADS = 4
+REQUESTS = 10
+
+
+class CartConcurrencyTests(TransactionTestCase):
+    """
+    Потоки одновременно добавляют один продукт в корзину одного
+    пользователя через POST /api/products/<id>/shopping_cart/ и пакетные
+    операции increment. Ни одно добавление не теряется, а итоги корзины
+    совпадают с ее строками.
+    """
+
+    def setUp(self):
+        category = Category.objects.create(name='Ягоды', slug='berries')
+        sub_category = SubCategory.objects.create(
+            name='Садовые ягоды', slug='garden-berries', category=category
+        )
+        self.product = Product.objects.create(
+            name='Клубника',
+            slug='strawberry',
+            price=Decimal('2.50'),
+            measurement_unit='кг',
+            is_avaliable=True,
+            sub_category=sub_category,
+        )
+        other = Product.objects.create(
+            name='Малина',
+            slug='raspberry',
+            price=Decimal('4.00'),
+            measurement_unit='кг',
+            is_avaliable=True,
+            sub_category=sub_category,
+        )
+        self.user = User.objects.create_user(
+            username='buyer',
+            email='buyer@example.com',
+            password='buyer-password',
+        )
+        self.token = Token.objects.create(user=self.user)
+        ShoppingCart.objects.create(user=self.user, product=other, amount=3)
+        self.initial_version = get_cart_summary(self.user).version
+
+    def add_to_cart(self, client, index):
+        headers = {'HTTP_AUTHORIZATION': f'Token {self.token.key}'}
+        if index % 2:
+            return client.post(
+                '/api/products/shopping_cart/batch/',
+                {'operations': [{
+                    'product_id': self.product.id,
+                    'amount': 1,
+                    'operation': 'increment',
+                }]},
+                content_type='application/json',
+                **headers,
+            )
+        return client.post(
+            f'/api/products/{self.product.id}/shopping_cart/',
+            {'amount': 1},
+            content_type='application/json',
+            **headers,
+        )
+
+    def test_concurrent_increments(self):
+        barrier = threading.Barrier(THREADS)
+        statuses = []
+        errors = []
+
+        def worker(number):
+            client = Client()
+            try:
+                barrier.wait()
+                for index in range(number, number + REQUESTS):
+                    response = self.add_to_cart(client, index)
+                    statuses.append(response.status_code)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=worker, args=(number,))
+            for number in range(THREADS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(statuses), THREADS * REQUESTS)
+        self.assertTrue(all(200 <= code < 300 for code in statuses), statuses)
+        amount = ShoppingCart.objects.get(
+            user=self.user, product=self.product
+        ).amount
+        self.assertEqual(amount, THREADS * REQUESTS)
+        summary = CartSummary.objects.get(user=self.user)
+        self.assertEqual(summary.products_count, 2)
+        self.assertEqual(
+            summary.total_summ,
+            Decimal('2.50') * THREADS * REQUESTS + Decimal('12.00'),
+        )
+        # Каждый успешный запрос пересчитывает итоги ровно один раз.
+        self.assertEqual(
+            summary.version, self.initial_version + THREADS * REQUESTS
+        )
@@ -0,0 +1,89 @@
+from decimal import Decimal
+
+from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
+
+from api.fast_serializers import (PRODUCT_VALUES, serialize_categories,
+                                  serialize_product_minifield,
+                                  serialize_products)
+from api.serializers import (CategorySerializer, ProductMinifieldSerializer,
+                             ProductSerializer)
+from products import taxonomy
+from products.models import Category, Image, Product, SubCategory
+
+
+class CompiledSerializerTests(TestCase):
+    """
+    Скомпилированные сериализаторы дают тот же JSON, что и сериализаторы
+    DRF, на небольшом каталоге с изображениями, пустыми полями
+    и продуктами в корзине.
+    """
+
+    def setUp(self):
+        taxonomy._snapshot = None
+        categories = [
+            Category.objects.create(
+                name='Фрукты', slug='fruits', image='categories/fruits.png'
+            ),
+            Category.objects.create(name='Овощи', slug='vegetables'),
+        ]
+        sub_categories = [
+            SubCategory.objects.create(
+                name=f'Подкатегория {index}',
+                slug=f'sub-{index}',
+                category=categories[index % 2],
+            )
+            for index in range(3)
+        ]
+        for index in range(6):
+            product = Product.objects.create(
+                name=f'Продукт {index}',
+                slug=f'product-{index}',
+                price=Decimal('9.5') + index,
+                measurement_unit='кг',
+                is_avaliable=bool(index % 2),
+                sub_category=sub_categories[index % 3],
+            )
+            for number in range(index % 3):
+                Image.objects.create(
+                    product=product,
+                    image=f'products/images/{index}-{number}.png',
+                )
+        self.products = Product.objects.order_by('id')
+        self.renderer = JSONRenderer()
+
+    def assertSameJSON(self, compiled, expected):
+        self.assertEqual(
+            self.renderer.render(compiled), self.renderer.render(expected)
+        )
+
+    def test_product_serializer(self):
+        cart_product_ids = frozenset(
+            self.products.values_list('id', flat=True)[:2]
+        )
+        expected = ProductSerializer(
+            self.products.with_related(), many=True,
+            context={'cart_product_ids': cart_product_ids},
+        ).data
+        self.assertSameJSON(
+            serialize_products(
+                list(self.products.values(*PRODUCT_VALUES)), cart_product_ids
+            ),
+            expected,
+        )
+
+    def test_product_minifield_serializer(self):
+        self.assertSameJSON(
+            [serialize_product_minifield(product, None)
+             for product in self.products],
+            ProductMinifieldSerializer(self.products, many=True).data,
+        )
+
+    def test_category_serializer(self):
+        categories = Category.objects.order_by('id')
+        self.assertSameJSON(
+            serialize_categories(
+                list(categories.values('id', 'name', 'slug', 'image'))
+            ),
+            CategorySerializer(categories, many=True).data,
+        )
@@ -0,0 +1,71 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api import metrics
+
+User = get_user_model()
+
+
+class MetricsSnapshotTests(TestCase):
+    """
+    /metrics удаляет снимки завершившихся процессов и давно
+    не обновлявшиеся снимки, а свежие снимки суммирует.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        override = override_settings(
+            METRICS_DIR=self.directory, METRICS_STALE_AFTER=60
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def write(self, name, mtime=None):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as file:
+            json.dump({'rows': []}, file)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+        return path
+
+    def test_prunes_stale_snapshots(self):
+        finished = subprocess.Popen([sys.executable, '-c', 'pass'])
+        finished.wait()
+        dead = self.write(f'{finished.pid}.json')
+        old = self.write('1.json', time.time() - 120)
+        live = self.write(f'{os.getppid()}.json')
+        snapshots = metrics.collect()
+        self.assertFalse(os.path.exists(dead))
+        self.assertFalse(os.path.exists(old))
+        self.assertTrue(os.path.exists(live))
+        # Снимки текущего и родительского процессов.
+        self.assertEqual(len(snapshots), 2)
+
+
+class MetricsAccessTests(TestCase):
+    """/metrics отдается адресам из списка и администраторам."""
+
+    def test_allowed_network(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+    def test_other_address(self):
+        client = APIClient(REMOTE_ADDR='203.0.113.5')
+        self.assertIn(client.get('/metrics').status_code, (401, 403))
+        admin = User.objects.create_user(
+            username='admin',
+            email='admin@example.com',
+            password='admin-password',
+            is_staff=True,
+        )
+        client.force_authenticate(admin)
+        self.assertEqual(client.get('/metrics').status_code, 200)
@@ -0,0 +1,54 @@
+import asyncio
+
+from asgiref.sync import async_to_sync
+from django.http import HttpResponse
+from django.test import (AsyncClient, RequestFactory, SimpleTestCase,
+                         TransactionTestCase)
+
+from api import metrics
+from api.middleware import DatabaseRoutingMiddleware, MetricsMiddleware
+from products.models import Category
+
+
+class AsyncMiddlewareTests(SimpleTestCase):
+    """Под ASGI промежуточные слои работают без перехода в поток."""
+
+    def test_middleware_is_async_with_async_handler(self):
+        async def get_response(request):
+            return HttpResponse('ok')
+
+        def get_response_sync(request):
+            return HttpResponse('ok')
+
+        for middleware in (MetricsMiddleware, DatabaseRoutingMiddleware):
+            with self.subTest(middleware=middleware.__name__):
+                self.assertTrue(asyncio.iscoroutinefunction(
+                    middleware(get_response)
+                ))
+                self.assertFalse(asyncio.iscoroutinefunction(
+                    middleware(get_response_sync)
+                ))
+                request = RequestFactory().get('/')
+                request.resolver_match = None
+                response = async_to_sync(middleware(get_response))(request)
+                self.assertEqual(response.content, b'ok')
+
+
+class AsyncRequestMetricsTests(TransactionTestCase):
+    """Запросы к базе асинхронного запроса попадают в его метрики."""
+
+    def route_stats(self):
+        rows = {tuple(key): row for *key, row in metrics.snapshot()['rows']}
+        row = rows.get(('api:async_categories', 'GET', 200))
+        if row is None:
+            return 0, 0
+        return row[metrics.COUNT], row[metrics.QUERIES]
+
+    def test_async_request_queries_are_counted(self):
+        Category.objects.create(name='Овощи', slug='vegetables')
+        count, queries = self.route_stats()
+        response = async_to_sync(AsyncClient().get)('/api/async/categories/')
+        self.assertEqual(response.status_code, 200)
+        new_count, new_queries = self.route_stats()
+        self.assertEqual(new_count, count + 1)
+        self.assertGreater(new_queries, queries)
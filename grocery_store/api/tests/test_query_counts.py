@@ -0,0 +1,122 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TransactionTestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.authentication import token_cache
+from api.fragments import fragment_cache
+from api.response_cache import response_cache
+from products import taxonomy
+from products.cart import get_cart_summary
+from products.models import (Category, Image, Product, ShoppingCart,
+                             SubCategory)
+
+User = get_user_model()
+
+
+class ProductQueryCountTests(TransactionTestCase):
+    """
+    Число запросов к базе для списка, продукта и корзины не зависит
+    от количества продуктов на странице и изображений у продуктов.
+
+    Кэши ответов и фрагментов сбрасываются, поэтому проверяется путь
+    без кэшей, на котором N+1 был бы виден.
+    """
+
+    def setUp(self):
+        category = Category.objects.create(name='Фрукты', slug='fruits')
+        sub_categories = [
+            SubCategory.objects.create(
+                name=f'Подкатегория {index}',
+                slug=f'sub-{index}',
+                category=category,
+            )
+            for index in range(2)
+        ]
+        self.products = []
+        for index in range(12):
+            product = Product.objects.create(
+                name=f'Продукт {index}',
+                slug=f'product-{index}',
+                price=Decimal('10.00') + index,
+                measurement_unit='кг',
+                is_avaliable=True,
+                sub_category=sub_categories[index % 2],
+            )
+            for number in range(2):
+                Image.objects.create(
+                    product=product,
+                    image=f'products/images/{index}-{number}.png',
+                )
+            self.products.append(product)
+        self.user = User.objects.create_user(
+            username='buyer',
+            email='buyer@example.com',
+            password='buyer-password',
+        )
+        self.token = Token.objects.create(user=self.user)
+        for product in self.products[:3]:
+            ShoppingCart.objects.create(
+                user=self.user, product=product, amount=1
+            )
+        get_cart_summary(self.user)
+
+        patcher = mock.patch.object(response_cache, 'ttl', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        caches['default'].clear()
+        fragment_cache.clear()
+        token_cache.clear()
+        taxonomy._snapshot = None
+        self.client = APIClient()
+
+    def authenticate(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def get(self, url, queries, **params):
+        with self.assertNumQueries(queries):
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_list_queries_do_not_grow_with_page_size(self):
+        # Версия каталога, id страницы, карточки, дерево категорий,
+        # счетчики фасетов.
+        self.get('/api/products/', 5, page_size=2)
+        fragment_cache.clear()
+        data = self.get('/api/products/', 4, page_size=12)
+        self.assertEqual(len(data['results']), 12)
+        self.assertEqual(len(data['results'][0]['images']), 2)
+        self.assertIsNotNone(data['results'][0]['category'])
+
+    def test_detail_queries(self):
+        product = self.products[0]
+        # Версия каталога, строка продукта, карточка, дерево категорий.
+        data = self.get(f'/api/products/{product.id}/', 4)
+        self.assertEqual(data['id'], product.id)
+        self.assertEqual(len(data['images']), 2)
+
+    def test_authenticated_list_with_cart_flags(self):
+        self.authenticate()
+        # Токен, версия каталога, итоги корзины, id продуктов корзины,
+        # id страницы, карточки, дерево категорий, счетчики фасетов.
+        data = self.get('/api/products/', 8, page_size=12)
+        flagged = {
+            product['id'] for product in data['results']
+            if product['is_in_shopping_cart']
+        }
+        self.assertEqual(
+            flagged, {product.id for product in self.products[:3]}
+        )
+
+    def test_authenticated_detail_with_cart_flag(self):
+        self.authenticate()
+        product = self.products[0]
+        # Токен, версия каталога, итоги корзины, id продуктов корзины,
+        # строка продукта, карточка, дерево категорий.
+        data = self.get(f'/api/products/{product.id}/', 7)
+        self.assertTrue(data['is_in_shopping_cart'])
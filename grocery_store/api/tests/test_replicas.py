@@ -0,0 +1,43 @@
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from api.replicas import is_pinned, pin_user
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class PrimaryPinTests(SimpleTestCase):
+    """Отметка об изменении приходит в cookie и видна любому процессу."""
+
+    def pinned_request(self, user_id):
+        response = HttpResponse()
+        pin_user(response, user_id)
+        cookie = response.cookies[settings.DATABASE_PIN_COOKIE].value
+        request = RequestFactory().get('/')
+        request.COOKIES[settings.DATABASE_PIN_COOKIE] = cookie
+        return request
+
+    def test_pin_applies_to_same_user(self):
+        request = self.pinned_request(7)
+        self.assertTrue(is_pinned(request, 7))
+        self.assertFalse(is_pinned(request, 8))
+
+    def test_pin_expires(self):
+        request = self.pinned_request(7)
+        later = time.time() + settings.DATABASE_PRIMARY_PIN_SECONDS + 1
+        with mock.patch('django.core.signing.time.time', return_value=later):
+            self.assertFalse(is_pinned(request, 7))
+
+    def test_forged_pin_is_ignored(self):
+        request = RequestFactory().get('/')
+        request.COOKIES[settings.DATABASE_PIN_COOKIE] = '7'
+        self.assertFalse(is_pinned(request, 7))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_pin_without_replicas(self):
+        response = HttpResponse()
+        pin_user(response, 7)
+        self.assertNotIn(settings.DATABASE_PIN_COOKIE, response.cookies)
@@ -0,0 +1,75 @@
+from decimal import Decimal
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.response_cache import (CachedResponse, LocalStore, ResponseCache,
+                                product_tag, response_cache)
+from products.models import Category, Product, SubCategory
+
+
+class LocalStoreTests(TestCase):
+    """Версии тегов LRU ограничены, а вытеснение не оживляет записи."""
+
+    def setUp(self):
+        self.cache = ResponseCache(LocalStore(1024 * 1024, 2), 300, 1)
+
+    def fill(self, key, *tags):
+        return self.cache.fetch(
+            key, lambda: CachedResponse(b'{}', 'application/json', tags)
+        )
+
+    def test_versions_are_bounded(self):
+        for index in range(10):
+            self.cache.invalidate(product_tag(index))
+        self.assertEqual(len(self.cache.store.versions), 2)
+
+    def test_evicted_tag_does_not_revive_entry(self):
+        self.fill('before', product_tag(1))
+        self.cache.invalidate(product_tag(1))
+        self.fill('after', product_tag(1))
+        self.cache.invalidate(product_tag(2), product_tag(3))
+        self.assertNotIn(product_tag(1), self.cache.store.versions)
+        self.assertIsNone(self.cache.lookup('before'))
+        self.assertIsNone(self.cache.lookup('after'))
+
+
+class ResponseCacheInvalidationTests(TestCase):
+    """Изменение продукта сбрасывает только ответы с его тегами."""
+
+    def setUp(self):
+        category = Category.objects.create(name='Фрукты', slug='fruits')
+        sub_category = SubCategory.objects.create(
+            name='Яблоки', slug='apples', category=category
+        )
+        self.products = [
+            Product.objects.create(
+                name=f'Яблоко {index}',
+                slug=f'apple-{index}',
+                price=Decimal('10.00'),
+                measurement_unit='кг',
+                is_avaliable=True,
+                sub_category=sub_category,
+            )
+            for index in range(2)
+        ]
+        response_cache.clear()
+        self.addCleanup(response_cache.clear)
+        self.client = APIClient()
+
+    def test_change_invalidates_tagged_responses(self):
+        first, second = (
+            f'/api/products/{product.id}/' for product in self.products
+        )
+        self.client.get(first)
+        self.client.get(second)
+        self.products[0].name = 'Зеленое яблоко'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products[0].save()
+        hits = response_cache.stats()['hits']
+        self.assertEqual(
+            self.client.get(first).json()['name'], 'Зеленое яблоко'
+        )
+        self.assertEqual(response_cache.stats()['hits'], hits)
+        self.client.get(second)
+        self.assertEqual(response_cache.stats()['hits'], hits + 1)
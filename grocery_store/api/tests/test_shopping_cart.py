@@ -0,0 +1,57 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from products.cart import get_cart_summary
+from products.models import Category, Product, ShoppingCart, SubCategory
+
+User = get_user_model()
+
+
+class ShoppingCartDestroyTests(TestCase):
+    """
+    Удаление продукта из корзины - один DELETE: 204, если строка была,
+    400, если продукта нет в корзине, и 404, если нет самого продукта.
+    """
+
+    def setUp(self):
+        category = Category.objects.create(name='Ягоды', slug='berries')
+        sub_category = SubCategory.objects.create(
+            name='Садовые ягоды', slug='garden-berries', category=category
+        )
+        self.product = Product.objects.create(
+            name='Клубника',
+            slug='strawberry',
+            price=Decimal('2.50'),
+            measurement_unit='кг',
+            is_avaliable=True,
+            sub_category=sub_category,
+        )
+        self.user = User.objects.create_user(
+            username='buyer',
+            email='buyer@example.com',
+            password='buyer-password',
+        )
+        ShoppingCart.objects.create(
+            user=self.user, product=self.product, amount=2
+        )
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user)}'
+        )
+        self.url = f'/api/products/{self.product.id}/shopping_cart/'
+
+    def test_destroy(self):
+        self.assertEqual(self.client.delete(self.url).status_code, 204)
+        self.assertFalse(ShoppingCart.objects.filter(user=self.user).exists())
+        self.assertEqual(get_cart_summary(self.user).products_count, 0)
+        self.assertEqual(self.client.delete(self.url).status_code, 400)
+
+    def test_destroy_missing_product(self):
+        response = self.client.delete(
+            f'/api/products/{self.product.id + 1}/shopping_cart/'
+        )
+        self.assertEqual(response.status_code, 404)
@@ -1,6 +1,7 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from api import async_views
 from api.views import (CategoryViewSet, CustomUserViewSet,
                        ProductViewSet, APIShoppingCartCreateUpdateDestroy)
 
@@ -17,8 +18,19 @@ shopping_cart_urlpatterns = [
          APIShoppingCartCreateUpdateDestroy.as_view(), name='shopping_cart'),
     ]
 
+async_urlpatterns = [
+    path('products/', async_views.product_list, name='async_products'),
+    path('products/<int:pk>/', async_views.product_detail,
+         name='async_product'),
+    path('products/shopping_cart/summary/',
+         async_views.shopping_cart_summary,
+         name='async_shopping_cart_summary'),
+    path('categories/', async_views.category_list, name='async_categories'),
+    ]
+
 urlpatterns = [
     path('', include(router_api_01.urls)),
     path('', include(shopping_cart_urlpatterns)),
+    path('async/', include(async_urlpatterns)),
     path('auth/', include('djoser.urls.authtoken')),
 ]
@@ -1,36 +1,74 @@
 from django.contrib.auth import get_user_model
 from django.db.models import Sum
 from django.db.models.functions import Lower
-from django.http import FileResponse
+from django.http import (FileResponse, Http404, HttpResponse,
+                         StreamingHttpResponse)
 from django.shortcuts import get_object_or_404, render
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from djoser.serializers import SetPasswordSerializer
 from rest_framework import generics, status, viewsets
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import (AllowAny, IsAdminUser, IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
 
-from api.mixins import CustomCreateUpdateDestroyMixin
-from api.pagination import CustomPagination
-from api.permissions import IsOwner
-from api.serializers import (CategorySerializer, CustomUserCreateSerializer,
+from api import metrics
+from api.filters import ProductFacetFilter, ProductSearchFilter
+from api.fragments import get_minifield_fragments, serialize_product_rows
+from api.mixins import (CompiledListMixin, CompiledRetrieveMixin,
+                        ConditionalGetMixin, CustomCreateUpdateDestroyMixin,
+                        FacetMixin, ResponseCacheMixin)
+from api.pagination import CustomPagination, KeysetPagination
+from api.permissions import IsMetricsClient, IsOwner
+from api.response_cache import (CATEGORIES_TAG, PRODUCT_SEARCH_TAG,
+                                PRODUCTS_TAG, category_tag, sub_category_tag)
+from api.serializers import (CartBatchSerializer, CartSummarySerializer,
+                             CategorySerializer, CustomUserCreateSerializer,
                              CustomUserSerializer,
                              ProductInShoppingCartSerializer,
                              ProductSerializer,
                              ShoppingCartSerializer,)
 
 
-from products.models import Category, Product, ShoppingCart
+from products.cart import (CART_INCREMENT, apply_cart_operations,
+                           deferred_cart_summary, get_cart_lines,
+                           get_cart_product_ids, get_cart_summary,
+                           set_cart_amount, upsert_cart_lines)
+from products.export import csv_lines, export_products, ndjson_lines
+from products.models import Category, Product, ProductCard, ShoppingCart
+from products.taxonomy import get_taxonomy
 
 User = get_user_model()
 
+CART_PRODUCT_FIELDS = ('id', 'name', 'slug', 'price', 'measurement_unit')
+
+EXPORT_FORMATS = {
+    'ndjson': (ndjson_lines, 'application/x-ndjson'),
+    'csv': (csv_lines, 'text/csv; charset=utf-8'),
+}
+
 
 def page_not_found(request, exception):
     """Страница не найдена."""
     return render(request, 'static/404.html', status=status.HTTP_404_NOT_FOUND)
 
 
+@api_view(['GET'])
+@permission_classes([IsMetricsClient])
+def metrics_view(request):
+    """
+    Метрики всех рабочих процессов в формате Prometheus: для адресов
+    из METRICS_ALLOWED_NETWORKS и администраторов.
+    """
+    return HttpResponse(
+        metrics.render(metrics.collect()),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
+
+
 class CustomUserViewSet(viewsets.ModelViewSet):
     """
     Cоздаем нового пользователя, получаем страницу текущего пользователя,
@@ -90,7 +128,8 @@ class CustomUserViewSet(viewsets.ModelViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(ConditionalGetMixin, ResponseCacheMixin,
+                      viewsets.ModelViewSet):
     """
     Получаем список всех продуктов, получаем продукт по id.
     """
@@ -99,10 +138,60 @@ class CategoryViewSet(viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [AllowAny]
-    pagination_class = CustomPagination
+    pagination_class = KeysetPagination
+    keyset_ordering = ('name', 'id')
+    cache_list_tag = CATEGORIES_TAG
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            self.cached_list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            self.cached_retrieve, request, *args, **kwargs
+        )
+
+    def cached_list(self, request, *args, **kwargs):
+        return self.cached_response(
+            self.list_from_snapshot, request, *args, **kwargs
+        )
+
+    def cached_retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            self.retrieve_from_snapshot, request, *args, **kwargs
+        )
+
+    def get_cache_tags(self, data):
+        tags = super().get_cache_tags(data)
+        for category in self.get_cached_objects(data):
+            for sub_category in category.get('sub_categories', ()):
+                tags.add(sub_category_tag(sub_category['id']))
+        return tags
+
+    def list_from_snapshot(self, request, *args, **kwargs):
+        categories = get_taxonomy().categories()
+        page = self.paginate_queryset(categories)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(categories)
 
+    def retrieve_from_snapshot(self, request, *args, **kwargs):
+        try:
+            category_id = int(self.kwargs[self.lookup_field])
+        except ValueError:
+            raise Http404
+        category = get_taxonomy().category(
+            category_id, with_sub_categories=True
+        )
+        if category is None:
+            raise Http404
+        return Response(category)
 
-class ProductViewSet(viewsets.ModelViewSet):
+
+class ProductViewSet(ConditionalGetMixin, ResponseCacheMixin, FacetMixin,
+                     CompiledRetrieveMixin, CompiledListMixin,
+                     viewsets.ModelViewSet):
     """
     Получаем список всех продуктов, получаем продукт по id.
     """
@@ -110,12 +199,69 @@ class ProductViewSet(viewsets.ModelViewSet):
     http_method_names = ('get', 'delete')
     serializer_class = ProductSerializer
     permission_classes = [AllowAny]
-    pagination_class = CustomPagination
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-pub_date', '-id')
+    personalized = True
+    filter_backends = [ProductFacetFilter, ProductSearchFilter]
+    compiled_values = ('id', 'updated_at')
+    cache_list_tag = PRODUCTS_TAG
+
+    def get_cart_product_ids(self):
+        """Id продуктов в корзине пользователя, один раз за запрос."""
+        if not hasattr(self, '_cart_product_ids'):
+            self._cart_product_ids = get_cart_product_ids(
+                self.request.user, getattr(self, 'cart_summary', None)
+            )
+        return self._cart_product_ids
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action == 'retrieve':
+            context['cart_product_ids'] = self.get_cart_product_ids()
+        return context
+
+    def serialize_rows(self, rows):
+        return serialize_product_rows(rows, self.get_cart_product_ids())
+
+    def get_cache_tags(self, data):
+        tags = super().get_cache_tags(data)
+        if self.action != 'retrieve':
+            if ProductSearchFilter().get_search_text(self.request):
+                tags.add(PRODUCT_SEARCH_TAG)
+            facets = data.get('facets', {}) if isinstance(data, dict) else {}
+            tags.update(
+                category_tag(category['id'])
+                for category in facets.get('categories', ())
+            )
+            tags.update(
+                sub_category_tag(sub_category['id'])
+                for sub_category in facets.get('sub_categories', ())
+            )
+        for product in self.get_cached_objects(data):
+            if product['sub_category'] is not None:
+                tags.add(sub_category_tag(product['sub_category']['id']))
+            if product['category'] is not None:
+                tags.add(category_tag(product['category']['id']))
+        return tags
+
+    def get_keyset_ordering(self):
+        if ProductSearchFilter().get_search_text(self.request):
+            return None
+        return self.keyset_ordering
 
     def get_queryset(self):
         if 'shopping_cart' in self.request.path:
             return ShoppingCart.objects.filter(user=self.request.user)
-        return Product.objects.add_user_annotations(self.request.user.pk)
+        return Product.objects.with_related().order_by(*self.keyset_ordering)
+
+    def get_compiled_queryset(self):
+        """
+        Список и продукт читаются из карточек продуктов запросом,
+        одинаковым для всех пользователей: выбираются id и версии,
+        представления берутся из кэша фрагментов, а отметки корзины
+        накладываются при сборке ответа.
+        """
+        return ProductCard.objects.order_by(*self.keyset_ordering)
 
     @action(
         methods=['get', 'delete'],
@@ -126,14 +272,106 @@ class ProductViewSet(viewsets.ModelViewSet):
     )
     def shopping_cart(self, request):
         if self.request.method == 'DELETE':
-            ShoppingCart.objects.filter(user=request.user).delete()
+            with deferred_cart_summary():
+                ShoppingCart.objects.filter(user=request.user).delete()
             return Response(
                 {'message': 'Корзина очищена!'},
                 status=status.HTTP_204_NO_CONTENT
             )
-        serializer = self.get_serializer(self.get_queryset())
+        lines = get_cart_lines(request.user)
+        serializer = self.get_serializer(lines, context={
+            **self.get_serializer_context(),
+            'product_fragments': get_minifield_fragments(
+                line.product for line in lines
+            ),
+        })
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @action(
+        methods=['get'],
+        serializer_class=CartSummarySerializer,
+        permission_classes=[IsAuthenticated],
+        detail=False,
+        url_path='shopping_cart/summary',
+    )
+    def shopping_cart_summary(self, request):
+        serializer = self.get_serializer(get_cart_summary(request.user))
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    @action(
+        methods=['post'],
+        serializer_class=CartBatchSerializer,
+        permission_classes=[IsAuthenticated],
+        http_method_names=['post'],
+        detail=False,
+        url_path='shopping_cart/batch',
+    )
+    def shopping_cart_batch(self, request):
+        data = request.data
+        if isinstance(data, list):
+            data = {'operations': data}
+        serializer = self.get_serializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        apply_cart_operations(
+            request.user, serializer.validated_data['operations']
+        )
+        lines = get_cart_lines(request.user)
+        cart = ShoppingCartSerializer(lines, context={
+            'product_fragments': get_minifield_fragments(
+                line.product for line in lines
+            ),
+        })
+        return Response(cart.data, status=status.HTTP_200_OK)
+
+    @action(
+        methods=['get'],
+        permission_classes=[IsAdminUser],
+        detail=False,
+        url_path='export',
+    )
+    def export(self, request):
+        """
+        Выгрузка всего каталога потоком в NDJSON или CSV
+        (export_format=ndjson|csv). Параметр since - дата или дата и время
+        в ISO 8601: выгружаются только продукты, измененные после нее.
+        """
+        export_format = request.query_params.get('export_format', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            raise ValidationError(
+                {'export_format': 'Ожидается ndjson или csv.'}
+            )
+        since = self.get_export_since(request)
+        lines, content_type = EXPORT_FORMATS[export_format]
+        response = StreamingHttpResponse(
+            lines(export_products(since)), content_type=content_type
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="products.{export_format}"'
+        )
+        return response
+
+    def get_export_since(self, request):
+        value = request.query_params.get('since')
+        if not value:
+            return None
+        try:
+            since = parse_datetime(value)
+            if since is None:
+                date = parse_date(value)
+                if date is not None:
+                    since = timezone.datetime.combine(
+                        date, timezone.datetime.min.time()
+                    )
+        except ValueError:
+            since = None
+        if since is None:
+            raise ValidationError(
+                {'since': 'Ожидается дата или дата и время в ISO 8601.'}
+            )
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+        return since
+
 
 class APIShoppingCartCreateUpdateDestroy(CustomCreateUpdateDestroyMixin):
     """
@@ -147,3 +385,49 @@ class APIShoppingCartCreateUpdateDestroy(CustomCreateUpdateDestroyMixin):
 
     def get_queryset(self):
         return ShoppingCart.objects.filter(user=self.request.user)
+
+    def get_line(self, pk, amount):
+        """Строка корзины для ответа: читается только продукт."""
+        product = get_object_or_404(
+            Product.objects.only(*CART_PRODUCT_FIELDS), id=self.kwargs['id']
+        )
+        return ShoppingCart(
+            id=pk, user=self.request.user, product=product, amount=amount
+        )
+
+    def create(self, request, *args, **kwargs):
+        """
+        Добавляет продукт в корзину, а если он уже там - увеличивает
+        количество. Строка меняется одним запросом INSERT ... ON CONFLICT.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        changed = upsert_cart_lines(
+            request.user.id,
+            {self.kwargs['id']: serializer.validated_data['amount']},
+            CART_INCREMENT,
+        )
+        if not changed:
+            raise Http404
+        pk, amount = changed[self.kwargs['id']]
+        serializer = self.get_serializer(self.get_line(pk, amount))
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def update(self, request, *args, **kwargs):
+        """Меняет количество продукта в корзине одним запросом UPDATE."""
+        serializer = self.get_serializer(
+            data=request.data, partial=kwargs.pop('partial', False)
+        )
+        serializer.is_valid(raise_exception=True)
+        amount = serializer.validated_data.get('amount')
+        if amount is not None and set_cart_amount(
+            request.user.id, self.kwargs['id'], amount
+        ):
+            return Response(
+                self.get_serializer(self.get_line(None, amount)).data
+            )
+        line = get_object_or_404(
+            self.get_queryset().select_related('product'),
+            product_id=self.kwargs['id'],
+        )
+        return Response(self.get_serializer(line).data)
@@ -0,0 +1,196 @@
+"""
+Сравнение пропускной способности каталога под ASGI и WSGI.
+
+Приложения вызываются в одном процессе без сетевого сервера: для ASGI
+запросы передаются так же, как их передает uvicorn (scope, receive, send),
+для WSGI - из пула потоков, как в многопоточном WSGI-сервере.
+Сравниваются синхронный DRF под WSGI, он же под ASGI и асинхронные
+представления из api/async_views.py под ASGI.
+
+Запуск из каталога grocery_store:
+
+    python -m benchmarks.asgi_vs_wsgi --requests 2000 --concurrency 100
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from benchmarks.report import percentile
+
+PATHS = {
+    'products': ('/api/products/', '/api/async/products/'),
+    'categories': ('/api/categories/', '/api/async/categories/'),
+}
+
+
+def summarize(name, path, durations, statuses, elapsed):
+    return {
+        'name': name,
+        'path': path,
+        'requests': len(durations),
+        'errors': sum(1 for code in statuses if code != 200),
+        'rps': round(len(durations) / elapsed, 1),
+        'p50_ms': round(percentile(durations, 0.5) * 1000, 2),
+        'p99_ms': round(percentile(durations, 0.99) * 1000, 2),
+    }
+
+
+def asgi_scope(url, token):
+    parts = urlsplit(url)
+    headers = [(b'host', b'localhost')]
+    if token:
+        headers.append((b'authorization', f'Token {token}'.encode()))
+    return {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': parts.path,
+        'raw_path': parts.path.encode(),
+        'query_string': parts.query.encode(),
+        'root_path': '',
+        'headers': headers,
+        'client': ('127.0.0.1', 50000),
+        'server': ('localhost', 80),
+    }
+
+
+async def run_asgi(application, url, total, concurrency, token):
+    semaphore = asyncio.Semaphore(concurrency)
+    durations = []
+    statuses = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def one():
+        async with semaphore:
+            response = {}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    response['status'] = message['status']
+
+            started = time.perf_counter()
+            await application(asgi_scope(url, token), receive, send)
+            durations.append(time.perf_counter() - started)
+            statuses.append(response.get('status'))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return durations, statuses, time.perf_counter() - started
+
+
+def wsgi_environ(url, token):
+    parts = urlsplit(url)
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'SCRIPT_NAME': '',
+        'PATH_INFO': parts.path,
+        'QUERY_STRING': parts.query,
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'localhost',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    if token:
+        environ['HTTP_AUTHORIZATION'] = f'Token {token}'
+    return environ
+
+
+def run_wsgi(application, url, total, concurrency, token):
+    def one(_):
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split()[0])
+
+        started = time.perf_counter()
+        result = application(wsgi_environ(url, token), start_response)
+        try:
+            for _chunk in result:
+                pass
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return time.perf_counter() - started, response.get('status')
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+    return (
+        [duration for duration, _ in results],
+        [code for _, code in results],
+        elapsed,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--endpoint', choices=sorted(PATHS),
+                        default='products')
+    parser.add_argument('--query', default='',
+                        help='строка запроса, например page_size=20')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--token', default='',
+                        help='токен пользователя для персональных ответов')
+    parser.add_argument('--json', action='store_true',
+                        help='вывести результаты в формате JSON')
+    options = parser.parse_args(argv)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'grocery_store.settings')
+    from django.core.asgi import get_asgi_application
+    from django.core.wsgi import get_wsgi_application
+    asgi_application = get_asgi_application()
+    wsgi_application = get_wsgi_application()
+
+    sync_path, async_path = PATHS[options.endpoint]
+    suffix = f'?{options.query}' if options.query else ''
+    runs = (
+        ('wsgi', sync_path, lambda url, total: run_wsgi(
+            wsgi_application, url, total,
+            options.concurrency, options.token)),
+        ('asgi', sync_path, lambda url, total: asyncio.run(run_asgi(
+            asgi_application, url, total,
+            options.concurrency, options.token))),
+        ('asgi-async', async_path, lambda url, total: asyncio.run(run_asgi(
+            asgi_application, url, total,
+            options.concurrency, options.token))),
+    )
+    results = []
+    for name, path, run in runs:
+        # Прогрев: снимок таксономии, соединения, импорт модулей.
+        run(path + suffix, options.concurrency)
+        results.append(summarize(
+            name, path, *run(path + suffix, options.requests)
+        ))
+
+    if options.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+    print(f'{"режим":<12}{"путь":<26}{"rps":>10}{"p50, мс":>10}'
+          f'{"p99, мс":>10}{"ошибки":>8}')
+    for result in results:
+        print(f'{result["name"]:<12}{result["path"]:<26}'
+              f'{result["rps"]:>10}{result["p50_ms"]:>10}'
+              f'{result["p99_ms"]:>10}{result["errors"]:>8}')
+
+
+if __name__ == '__main__':
+    main()
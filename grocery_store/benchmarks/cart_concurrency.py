@@ -0,0 +1,125 @@
+"""
+Проверка корзины под одновременными запросами.
+
+Несколько потоков одновременно добавляют один и тот же продукт в корзину
+одного пользователя: через POST /api/products/<id>/shopping_cart/
+и пакетными операциями increment. В конце количество в корзине должно
+равняться числу успешных запросов, итоги корзины - совпадать с ее
+строками, а ответов 5xx быть не должно. Работает на данных из
+benchmarks.generate:
+
+    python -m benchmarks.cart_concurrency --threads 8 --requests 50
+"""
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.generate import PREFIX, token_key
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=50,
+                        help='запросов на поток')
+    parser.add_argument('--seed', type=int, default=1,
+                        help='seed, с которым запускался генератор')
+    parser.add_argument('--user', type=int, default=0,
+                        help='номер сгенерированного пользователя')
+    options = parser.parse_args(argv)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'grocery_store.settings')
+    import django
+    django.setup()
+    from django.db import connection
+    from django.test import Client
+    from rest_framework.authtoken.models import Token
+
+    from products.cart import refresh_cart_summary
+    from products.models import CartSummary, Product, ShoppingCart
+
+    product_id = Product.objects.filter(
+        slug__startswith=f'{PREFIX}-'
+    ).order_by('id').values_list('id', flat=True).first()
+    if product_id is None:
+        raise SystemExit('Нет данных, запустите benchmarks.generate.')
+    key = token_key(options.seed, options.user)
+    headers = {'HTTP_AUTHORIZATION': f'Token {key}'}
+    user_id = Token.objects.get(key=key).user_id
+    ShoppingCart.objects.filter(
+        user_id=user_id, product_id=product_id
+    ).delete()
+    refresh_cart_summary(user_id)
+    connection.close()
+
+    # Ошибки считаются в отчете, трассировки каждой из них не нужны.
+    logging.getLogger('django.request').setLevel(logging.CRITICAL)
+    local = threading.local()
+
+    def request(index):
+        if not hasattr(local, 'client'):
+            local.client = Client(raise_request_exception=False)
+        try:
+            if index % 2:
+                return local.client.post(
+                    '/api/products/shopping_cart/batch/',
+                    {'operations': [{
+                        'product_id': product_id,
+                        'amount': 1,
+                        'operation': 'increment',
+                    }]},
+                    content_type='application/json',
+                    **headers,
+                ).status_code
+            return local.client.post(
+                f'/api/products/{product_id}/shopping_cart/',
+                {'amount': 1},
+                content_type='application/json',
+                **headers,
+            ).status_code
+        finally:
+            connection.close()
+
+    total = options.threads * options.requests
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=options.threads) as executor:
+        statuses = Counter(executor.map(request, range(total)))
+    elapsed = time.perf_counter() - started
+
+    succeeded = sum(
+        count for code, count in statuses.items() if 200 <= code < 300
+    )
+    amount = ShoppingCart.objects.filter(
+        user_id=user_id, product_id=product_id
+    ).values_list('amount', flat=True).first() or 0
+    summary = CartSummary.objects.get(user_id=user_id)
+    lines = ShoppingCart.objects.filter(user_id=user_id)
+    expected_count = lines.count()
+    expected_summ = sum(
+        line.amount * line.product.price
+        for line in lines.select_related('product')
+    )
+    print(f'Запросов: {total} за {elapsed:.1f} с, статусы: '
+          + ', '.join(f'{code}: {count}'
+                      for code, count in sorted(statuses.items())))
+    print(f'Количество в корзине: {amount}, успешных запросов: {succeeded}')
+    print(f'Итоги корзины: {summary.products_count} / {summary.total_summ}, '
+          f'по строкам: {expected_count} / {expected_summ}')
+    failed = (
+        amount != succeeded
+        or any(code >= 500 for code in statuses)
+        or summary.products_count != expected_count
+        or summary.total_summ != expected_summ
+    )
+    print('ОШИБКА' if failed else 'OK')
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
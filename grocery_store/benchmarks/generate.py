@@ -0,0 +1,241 @@
+"""
+Генератор синтетического каталога для нагрузочного теста.
+
+Данные детерминированы: при одинаковых параметрах и seed получаются
+одинаковые названия, цены, изображения и корзины. Строки пишутся
+через bulk_create порциями, поэтому генератор справляется с миллионом
+продуктов в постоянной памяти. Запускать на пустой базе:
+
+    python -m benchmarks.generate --products 1000000 --users 1000
+"""
+import argparse
+import hashlib
+import io
+import os
+import random
+import sys
+import time
+from decimal import Decimal
+from itertools import islice
+
+PREFIX = 'bench'
+WORDS = (
+    'Яблоки', 'Бананы', 'Картофель', 'Морковь', 'Молоко', 'Сыр', 'Хлеб',
+    'Рис', 'Гречка', 'Чай', 'Кофе', 'Сок', 'Томаты', 'Огурцы', 'Лук',
+    'Груши', 'Сливы', 'Капуста', 'Кефир', 'Творог',
+)
+ADJECTIVES = (
+    'свежие', 'отборные', 'фермерские', 'молодые', 'сладкие', 'домашние',
+    'органические', 'крупные', 'мелкие', 'спелые',
+)
+UNITS = ('кг', 'шт', 'л', 'уп')
+COLORS = ((231, 76, 60), (46, 204, 113), (52, 152, 219), (241, 196, 15),
+          (155, 89, 182), (230, 126, 34), (26, 188, 156), (149, 165, 166))
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def token_key(seed, index):
+    """Детерминированный токен пользователя."""
+    return hashlib.sha1(f'{PREFIX}-{seed}-{index}'.encode()).hexdigest()
+
+
+def make_images(count):
+    """Сохраняет в хранилище набор одноцветных изображений."""
+    from django.core.files.base import ContentFile
+    from PIL import Image as PillowImage
+
+    from products.storage import content_addressed_storage
+
+    names = []
+    for index in range(count):
+        buffer = io.BytesIO()
+        PillowImage.new('RGB', (64, 64), COLORS[index % len(COLORS)]).save(
+            buffer, format='PNG'
+        )
+        names.append(content_addressed_storage.save(
+            f'products/images/{PREFIX}-{index}.png',
+            ContentFile(buffer.getvalue()),
+        ))
+    return names
+
+
+def generate(options, stdout=sys.stdout):
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import make_password
+    from django.db import transaction
+    from rest_framework.authtoken.models import Token
+
+    from products.cards import rebuild_product_cards
+    from products.cart import refresh_cart_summary
+    from products.facets import rebuild_facet_counts
+    from products.models import (CartSummary, Category, Image, Product,
+                                 ShoppingCart, SubCategory)
+    from products.versions import bump_catalog_version, catalog_replaced
+
+    User = get_user_model()
+    if Category.objects.filter(slug__startswith=f'{PREFIX}-').exists():
+        raise SystemExit('Синтетические данные уже есть, нужна пустая база.')
+
+    rng = random.Random(options.seed)
+    batch_size = options.batch_size
+    started = time.monotonic()
+
+    def report(message):
+        stdout.write(f'[{time.monotonic() - started:7.1f} с] {message}\n')
+
+    image_names = make_images(options.image_files)
+    with transaction.atomic():
+        Category.objects.bulk_create(
+            Category(
+                name=f'Категория {index}',
+                slug=f'{PREFIX}-category-{index}',
+                image=image_names[index % len(image_names)],
+            )
+            for index in range(options.categories)
+        )
+        category_ids = list(Category.objects.filter(
+            slug__startswith=f'{PREFIX}-'
+        ).order_by('id').values_list('id', flat=True))
+        SubCategory.objects.bulk_create(
+            SubCategory(
+                name=f'Подкатегория {category_index}.{index}',
+                slug=f'{PREFIX}-sub-category-{category_index}-{index}',
+                category_id=category_id,
+                image=image_names[index % len(image_names)],
+            )
+            for category_index, category_id in enumerate(category_ids)
+            for index in range(options.sub_categories)
+        )
+    sub_category_ids = list(SubCategory.objects.filter(
+        slug__startswith=f'{PREFIX}-'
+    ).order_by('id').values_list('id', flat=True))
+    report(f'Категорий: {len(category_ids)}, '
+           f'подкатегорий: {len(sub_category_ids)}')
+
+    def products():
+        for index in range(options.products):
+            yield Product(
+                name=f'{rng.choice(WORDS)} {rng.choice(ADJECTIVES)} {index}',
+                slug=f'{PREFIX}-{index}',
+                sub_category_id=rng.choice(sub_category_ids),
+                price=Decimal(rng.randrange(1000, 500000)) / 100,
+                measurement_unit=rng.choice(UNITS),
+                is_avaliable=rng.random() < 0.8,
+            )
+
+    created = 0
+    for chunk in batched(products(), batch_size):
+        with transaction.atomic():
+            Product.objects.bulk_create(chunk)
+        created += len(chunk)
+        if created % (batch_size * 20) == 0:
+            report(f'Продуктов: {created}')
+    report(f'Продуктов: {created}')
+
+    product_ids = Product.objects.filter(
+        slug__startswith=f'{PREFIX}-'
+    ).order_by('id').values_list('id', flat=True)
+    first_id = product_ids.first()
+    last_id = product_ids.last()
+
+    def images():
+        for product_id in range(first_id, last_id + 1):
+            for _ in range(options.images):
+                yield Image(
+                    product_id=product_id,
+                    image=rng.choice(image_names),
+                )
+
+    for chunk in batched(images(), batch_size):
+        with transaction.atomic():
+            Image.objects.bulk_create(chunk)
+    report(f'Изображений: {(last_id - first_id + 1) * options.images}')
+
+    with transaction.atomic():
+        User.objects.bulk_create(
+            User(
+                username=f'{PREFIX}-user-{index}',
+                email=f'{PREFIX}-user-{index}@example.com',
+                first_name='Покупатель',
+                last_name=str(index),
+                # Пользователи входят по токенам; неиспользуемый пароль
+                # уникален и не требует медленного хэширования.
+                password=make_password(None),
+            )
+            for index in range(options.users)
+        )
+        users = list(User.objects.filter(
+            username__startswith=f'{PREFIX}-user-'
+        ).order_by('id').values_list('id', flat=True))
+        Token.objects.bulk_create(
+            Token(key=token_key(options.seed, index), user_id=user_id)
+            for index, user_id in enumerate(users)
+        )
+
+    def cart_lines():
+        for user_id in users:
+            for product_id in rng.sample(
+                range(first_id, last_id + 1),
+                min(options.cart_lines, last_id - first_id + 1),
+            ):
+                yield ShoppingCart(
+                    user_id=user_id,
+                    product_id=product_id,
+                    amount=rng.randint(1, 5),
+                )
+
+    for chunk in batched(cart_lines(), batch_size):
+        with transaction.atomic():
+            ShoppingCart.objects.bulk_create(chunk)
+    CartSummary.objects.bulk_create(
+        CartSummary(user_id=user_id) for user_id in users
+    )
+    for user_id in users:
+        refresh_cart_summary(user_id)
+    report(f'Пользователей: {len(users)}, '
+           f'строк корзин: {len(users) * options.cart_lines}')
+
+    # bulk_create не отправляет сигналы: фасеты, карточки продуктов,
+    # версия каталога и кэши обновляются один раз, полнотекстовый индекс
+    # заполняют триггеры.
+    with transaction.atomic():
+        rebuild_facet_counts()
+        rebuild_product_cards()
+        bump_catalog_version()
+        catalog_replaced.send(sender=None)
+    report('Готово.')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--categories', type=int, default=10)
+    parser.add_argument('--sub-categories', type=int, default=10,
+                        help='подкатегорий в каждой категории')
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--images', type=int, default=2,
+                        help='изображений у каждого продукта')
+    parser.add_argument('--image-files', type=int, default=8,
+                        help='различных файлов изображений')
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--cart-lines', type=int, default=5,
+                        help='продуктов в корзине каждого пользователя')
+    parser.add_argument('--batch-size', type=int, default=5000)
+    options = parser.parse_args(argv)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'grocery_store.settings')
+    import django
+    django.setup()
+    generate(options)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Накладные расходы MetricsMiddleware на один запрос.
+
+Middleware вызывается с готовым ответом, без URL-резолвера и базы,
+и сравнивается с прямым вызовом обработчика:
+
+    python -m benchmarks.metrics_overhead --requests 200000
+"""
+import argparse
+import os
+import time
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--requests', type=int, default=200000)
+    options = parser.parse_args(argv)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'grocery_store.settings')
+    import django
+    django.setup()
+    from django.http import HttpResponse
+    from django.test import RequestFactory
+    from django.urls import resolve
+
+    from api.middleware import MetricsMiddleware
+
+    request = RequestFactory().get('/api/products/')
+    request.resolver_match = resolve('/api/products/')
+    response = HttpResponse(b'{"results": []}')
+
+    def get_response(request):
+        return response
+
+    middleware = MetricsMiddleware(get_response)
+    results = {}
+    for name, handler in (('без middleware', get_response),
+                          ('MetricsMiddleware', middleware)):
+        handler(request)
+        started = time.perf_counter()
+        for _ in range(options.requests):
+            handler(request)
+        results[name] = (time.perf_counter() - started) / options.requests
+    overhead = results['MetricsMiddleware'] - results['без middleware']
+    for name, seconds in results.items():
+        print(f'{name:<20}{seconds * 1e6:8.2f} мкс')
+    print(f'{"накладные расходы":<20}{overhead * 1e6:8.2f} мкс')
+
+
+if __name__ == '__main__':
+    main()
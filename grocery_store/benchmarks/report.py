@@ -0,0 +1,97 @@
+"""Сводка замеров и сравнение отчетов нагрузочного теста."""
+import json
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    if not values:
+        return 0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def summarize(durations, statuses, elapsed, queries=None):
+    """Сводка одного прогона: пропускная способность и задержки в мс."""
+    result = {
+        'requests': len(durations),
+        'errors': sum(1 for code in statuses if not 200 <= code < 300),
+        'rps': round(len(durations) / elapsed, 1) if elapsed else 0,
+        'p50_ms': round(percentile(durations, 0.5) * 1000, 2),
+        'p95_ms': round(percentile(durations, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(durations, 0.99) * 1000, 2),
+    }
+    if queries is not None:
+        result['queries_per_request'] = (
+            round(sum(queries) / len(queries), 2) if queries else 0
+        )
+    return result
+
+
+def save(report, path):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+
+
+def load(path):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def compare(report, baseline):
+    """
+    Сравнивает отчет с базовым по совпадающим endpoint и concurrency.
+
+    Возвращает строки с изменением в процентах: положительное изменение
+    rps - улучшение, положительное изменение задержек и запросов - ухудшение.
+    """
+    base = {
+        (result['endpoint'], result['concurrency']): result
+        for result in baseline['results']
+    }
+    rows = []
+    for result in report['results']:
+        previous = base.get((result['endpoint'], result['concurrency']))
+        if previous is None:
+            continue
+        row = {
+            'endpoint': result['endpoint'],
+            'concurrency': result['concurrency'],
+        }
+        for key in ('rps', 'p95_ms', 'p99_ms', 'queries_per_request'):
+            old, new = previous.get(key), result.get(key)
+            if old is None or new is None:
+                continue
+            row[key] = (old, new, round((new - old) / old * 100, 1)
+                        if old else None)
+        rows.append(row)
+    return rows
+
+
+HEADER = (
+    f'{"endpoint":<16}{"conc":>6}{"rps":>10}{"p50, мс":>10}'
+    f'{"p95, мс":>10}{"p99, мс":>10}{"запросов":>10}{"ошибки":>8}'
+)
+
+
+def format_result(result):
+    return (
+        f'{result["endpoint"]:<16}{result["concurrency"]:>6}'
+        f'{result["rps"]:>10}{result["p50_ms"]:>10}'
+        f'{result["p95_ms"]:>10}{result["p99_ms"]:>10}'
+        f'{result.get("queries_per_request", "-"):>10}'
+        f'{result["errors"]:>8}'
+    )
+
+
+def format_comparison(rows):
+    lines = []
+    for row in rows:
+        changes = ', '.join(
+            f'{key} {old} -> {new}'
+            + (f' ({change:+}%)' if change is not None else '')
+            for key, (old, new, change) in (
+                (key, row[key]) for key in row
+                if key not in ('endpoint', 'concurrency')
+            )
+        )
+        lines.append(f'{row["endpoint"]} x{row["concurrency"]}: {changes}')
+    return '\n'.join(lines)
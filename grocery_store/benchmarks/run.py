@@ -0,0 +1,184 @@
+"""
+Нагрузочный тест API на данных из benchmarks.generate.
+
+Запросы выполняются тестовым клиентом Django из пула потоков,
+по одному клиенту на поток, для каждого уровня конкурентности.
+Для каждого запроса считаются время ответа и число запросов к базе.
+Отчет сохраняется в JSON и может сравниваться с базовым:
+
+    python -m benchmarks.run --concurrency 1,10,50 --output report.json
+    python -m benchmarks.run --baseline report.json
+"""
+import argparse
+import datetime
+import itertools
+import logging
+import os
+import platform
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import report as reports
+from benchmarks.generate import PREFIX, token_key
+
+ENDPOINTS = ('products', 'categories', 'shopping_cart', 'cart_batch')
+
+
+class Driver:
+
+    def __init__(self, options):
+        from products.models import Product
+
+        self.options = options
+        self.local = threading.local()
+        self.thread_numbers = itertools.count()
+        products = Product.objects.filter(
+            slug__startswith=f'{PREFIX}-'
+        ).order_by('id').values_list('id', flat=True)
+        self.first_id = products.first()
+        self.last_id = products.last()
+        if self.first_id is None:
+            raise SystemExit('Нет данных, запустите benchmarks.generate.')
+        self.tokens = [
+            token_key(options.seed, index) for index in range(options.users)
+        ]
+
+    def get_client(self):
+        """Клиент и генератор случайных чисел текущего потока."""
+        from django.test import Client
+
+        if not hasattr(self.local, 'client'):
+            self.local.client = Client(raise_request_exception=False)
+            self.local.random = random.Random(
+                f'{self.options.seed}-{next(self.thread_numbers)}'
+            )
+        return self.local.client, self.local.random
+
+    def request(self, endpoint):
+        client, rng = self.get_client()
+        headers = {
+            'HTTP_AUTHORIZATION': f'Token {rng.choice(self.tokens)}',
+        }
+        if endpoint == 'products':
+            return client.get('/api/products/', **headers)
+        if endpoint == 'categories':
+            return client.get('/api/categories/', **headers)
+        if endpoint == 'shopping_cart':
+            return client.get('/api/products/shopping_cart/', **headers)
+        operations = [
+            {
+                'product_id': rng.randint(self.first_id, self.last_id),
+                'amount': rng.randint(0, 3),
+                'operation': 'set',
+            }
+            for _ in range(self.options.batch_operations)
+        ]
+        return client.post(
+            '/api/products/shopping_cart/batch/',
+            {'operations': operations},
+            content_type='application/json',
+            **headers,
+        )
+
+    def measure(self, endpoint):
+        from django.db import connection
+
+        queries = []
+
+        def count(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            started = time.perf_counter()
+            response = self.request(endpoint)
+            duration = time.perf_counter() - started
+        return duration, response.status_code, len(queries)
+
+    def run(self, endpoint, concurrency, total):
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(
+                lambda _: self.measure(endpoint), range(concurrency)
+            ))
+            started = time.perf_counter()
+            results = list(executor.map(
+                lambda _: self.measure(endpoint), range(total)
+            ))
+            elapsed = time.perf_counter() - started
+        return reports.summarize(
+            [duration for duration, _, _ in results],
+            [status for _, status, _ in results],
+            elapsed,
+            [queries for _, _, queries in results],
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS),
+                        help='через запятую: ' + ', '.join(ENDPOINTS))
+    parser.add_argument('--concurrency', default='1,10,50',
+                        help='уровни конкурентности через запятую')
+    parser.add_argument('--requests', type=int, default=500,
+                        help='запросов на endpoint и уровень')
+    parser.add_argument('--seed', type=int, default=1,
+                        help='seed, с которым запускался генератор')
+    parser.add_argument('--users', type=int, default=100,
+                        help='сколько сгенерированных пользователей '
+                             'использовать')
+    parser.add_argument('--batch-operations', type=int, default=5,
+                        help='операций в одном запросе cart_batch')
+    parser.add_argument('--output', help='файл для отчета в JSON')
+    parser.add_argument('--baseline', help='отчет для сравнения')
+    options = parser.parse_args(argv)
+    endpoints = [name for name in options.endpoints.split(',') if name]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f'неизвестные endpoint: {", ".join(sorted(unknown))}')
+    levels = [int(level) for level in options.concurrency.split(',')]
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'grocery_store.settings')
+    import django
+    django.setup()
+    from django.conf import settings
+
+    from products.models import Product
+
+    # Ошибки считаются в отчете, трассировки каждой из них не нужны.
+    logging.getLogger('django.request').setLevel(logging.CRITICAL)
+    driver = Driver(options)
+    print(reports.HEADER)
+    results = []
+    for endpoint in endpoints:
+        for concurrency in levels:
+            result = driver.run(endpoint, concurrency, options.requests)
+            result.update(endpoint=endpoint, concurrency=concurrency)
+            results.append(result)
+            print(reports.format_result(result), flush=True)
+    report = {
+        'meta': {
+            'created': datetime.datetime.now(
+                datetime.timezone.utc
+            ).isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': settings.DATABASES['default']['ENGINE'],
+            'debug': settings.DEBUG,
+            'products': Product.objects.count(),
+            'requests': options.requests,
+            'seed': options.seed,
+        },
+        'results': results,
+    }
+    if options.output:
+        reports.save(report, options.output)
+    if options.baseline:
+        print(reports.format_comparison(
+            reports.compare(report, reports.load(options.baseline))
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Сравнение сериализаторов DRF со скомпилированными на 1000 строк.
+
+Для каждого сериализатора сначала проверяется, что JSON обоих вариантов
+совпадает байт в байт, затем замеряется время выборки и сериализации
+в пересчете на 1000 строк:
+
+    python -m benchmarks.serializers --rows 1000 --repeat 20
+"""
+import argparse
+import os
+import time
+
+
+def measure(function, repeat):
+    function()
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--user', type=int, default=0,
+                        help='номер сгенерированного пользователя, '
+                             'корзина которого попадет в выборку')
+    options = parser.parse_args(argv)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'grocery_store.settings')
+    import django
+    django.setup()
+    from django.contrib.auth import get_user_model
+    from rest_framework.renderers import JSONRenderer
+
+    from api.fast_serializers import (PRODUCT_VALUES, serialize_categories,
+                                      serialize_product_minifield,
+                                      serialize_products)
+    from api.serializers import (CategorySerializer,
+                                 ProductMinifieldSerializer,
+                                 ProductSerializer)
+    from benchmarks.generate import PREFIX
+    from products.loaders import load_cart_product_ids
+    from products.models import Category, Product, ShoppingCart
+
+    user = get_user_model().objects.filter(
+        username=f'{PREFIX}-user-{options.user}'
+    ).first()
+    user_id = user.pk if user else None
+    product_ids = list(Product.objects.order_by('id').values_list(
+        'id', flat=True
+    )[:options.rows])
+    product_ids += ShoppingCart.objects.filter(
+        user_id=user_id
+    ).exclude(product_id__in=product_ids).values_list('product_id', flat=True)
+    cart_product_ids = frozenset(load_cart_product_ids(user))
+    products = Product.objects.filter(id__in=product_ids).order_by('id')
+    categories = Category.objects.order_by('id')
+    renderer = JSONRenderer()
+
+    cases = {
+        'ProductSerializer': (
+            lambda: ProductSerializer(
+                products.with_related(), many=True,
+                context={'cart_product_ids': cart_product_ids},
+            ).data,
+            lambda: serialize_products(list(products.values(
+                *PRODUCT_VALUES
+            )), cart_product_ids),
+        ),
+        'ProductMinifield': (
+            lambda: ProductMinifieldSerializer(
+                products.all(), many=True
+            ).data,
+            lambda: [serialize_product_minifield(product, None)
+                     for product in products.all()],
+        ),
+        'CategorySerializer': (
+            lambda: CategorySerializer(categories.all(), many=True).data,
+            lambda: serialize_categories(list(categories.values(
+                'id', 'name', 'slug', 'image'
+            ))),
+        ),
+    }
+    print(f'{"сериализатор":<20}{"строк":>8}{"DRF, мс":>12}'
+          f'{"компил., мс":>14}{"ускорение":>11}')
+    for name, (drf, compiled) in cases.items():
+        data = drf()
+        expected = renderer.render(data)
+        rows = len(data)
+        if renderer.render(compiled()) != expected:
+            raise SystemExit(f'{name}: JSON не совпадает с DRF.')
+        per_thousand = 1000 / rows if rows else 0
+        drf_time = measure(drf, options.repeat) * per_thousand * 1000
+        compiled_time = measure(compiled, options.repeat) * per_thousand * 1000
+        print(f'{name:<20}{rows:>8}{drf_time:>12.2f}{compiled_time:>14.2f}'
+              f'{drf_time / compiled_time if compiled_time else 0:>10.1f}x')
+
+
+if __name__ == '__main__':
+    main()
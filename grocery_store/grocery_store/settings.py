@@ -28,6 +28,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
+    'api.middleware.DatabaseRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -60,13 +62,54 @@ WSGI_APPLICATION = 'grocery_store.wsgi.application'
 
 # Database
 
+# Тестовая база SQLite - файл, а не база в памяти: в общей базе в памяти
+# параллельные соединения получают "database table is locked" вместо
+# ожидания блокировки, а тесты корзины пишут в базу из нескольких потоков.
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
+# Реплики для чтения каталога: псевдонимы из DATABASES. Для локальной
+# проверки на двух файлах SQLite:
+#
+# DATABASES['replica'] = {
+#     'ENGINE': 'django.db.backends.sqlite3',
+#     'NAME': BASE_DIR / 'db.replica.sqlite3',
+#     'TEST': {'MIRROR': 'default'},
+# }
+# DATABASE_REPLICAS = ['replica']
+#
+# и копировать основную базу командой manage.py sync_sqlite_replicas.
+
+DATABASE_REPLICAS = []
+
+DATABASE_ROUTERS = ['api.replicas.PrimaryReplicaRouter']
+
+# Модели, которые можно читать с реплик. Корзина, пользователи и токены
+# всегда читаются из default.
+
+DATABASE_REPLICA_MODELS = (
+    'products.category',
+    'products.subcategory',
+    'products.product',
+    'products.image',
+    'products.catalogversion',
+    'products.productfacetcount',
+    'products.productcard',
+)
+
+# Сколько секунд после изменяющего запроса пользователь читает из
+# default, и имя подписанной cookie с этой отметкой. Cookie приходит
+# с каждым запросом, поэтому отметку видят все рабочие процессы.
+
+DATABASE_PRIMARY_PIN_SECONDS = 10
+
+DATABASE_PIN_COOKIE = 'db_primary'
+
 
 # Password validation
 
@@ -103,6 +146,31 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
+# Media files (изображения продуктов и категорий). Их отдает api/media.py:
+# файлы с хэшем содержимого в имени - с Cache-Control immutable,
+# остальные - с max-age MEDIA_MAX_AGE секунд. После изменения MEDIA_URL
+# карточки продуктов нужно перестроить: manage.py rebuild_product_cards.
+
+MEDIA_URL = '/media/'
+
+MEDIA_ROOT = BASE_DIR / 'media'
+
+MEDIA_MAX_AGE = 60 * 60
+
+# Передача медиафайлов прокси, чтобы рабочие процессы не читали их сами:
+# None - файл отдает Django, 'x-accel-redirect' - nginx по внутреннему
+# адресу MEDIA_OFFLOAD_PREFIX, 'x-sendfile' - Apache (mod_xsendfile)
+# или lighttpd по полному пути к файлу. Для nginx:
+#
+#     location /protected-media/ {
+#         internal;
+#         alias /srv/grocery_store/media/;
+#     }
+
+MEDIA_OFFLOAD = None
+
+MEDIA_OFFLOAD_PREFIX = '/protected-media/'
+
 # Default primary key field type
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -119,10 +187,84 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
 }
 
+# Кэш токенов аутентификации: размер локального LRU, время жизни записи
+# в секундах и необязательный alias общего кэша из CACHES. Выход, смена
+# пароля и деактивация сбрасывают записи токена или пользователя
+# в локальном кэше своего процесса и в общем кэше, остальные процессы
+# перестают принимать токен не позже чем через TOKEN_CACHE_TTL.
+
+TOKEN_CACHE_SIZE = 10000
+
+TOKEN_CACHE_TTL = 300
+
+TOKEN_CACHE_ALIAS = None
+
+# Кэш множеств id продуктов в корзинах для отметок is_in_shopping_cart
+# в каталоге: alias из CACHES (None - читать корзину из базы на каждый
+# запрос) и время жизни записи в секундах. Ключ включает версию итогов
+# корзины, поэтому запись устаревает при любом изменении корзины.
+
+CART_PRODUCT_IDS_CACHE_ALIAS = 'default'
+
+CART_PRODUCT_IDS_CACHE_TTL = 300
+
+# Снимок дерева категорий (products/taxonomy.py): alias кэша из CACHES,
+# в котором лежит версия дерева, и сколько секунд процесс не перепроверяет
+# ее. Версию сдвигают только изменения категорий и подкатегорий; чтобы
+# изменения из других процессов были видны не позже чем через
+# TAXONOMY_VERSION_TTL, кэш должен быть общим для процессов.
+
+TAXONOMY_VERSION_ALIAS = 'default'
+
+TAXONOMY_VERSION_TTL = 1
+
+# Кэш ответов каталога для анонимных пользователей: alias общего кэша
+# из CACHES (None - LRU в памяти каждого процесса; изменения из других
+# процессов он видит только через RESPONSE_CACHE_TTL, поэтому для
+# нескольких процессов нужен общий кэш), предельный объем LRU в байтах
+# и число версий тегов в нем, время жизни записи в секундах (0 отключает
+# кэш) и сколько секунд запросы ждут пересчета записи другим запросом.
+
+RESPONSE_CACHE_ALIAS = None
+
+RESPONSE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+RESPONSE_CACHE_MAX_TAGS = 100000
+
+RESPONSE_CACHE_TTL = 300
+
+RESPONSE_CACHE_LOCK_TIMEOUT = 10
+
+# Кэш представлений отдельных продуктов (api/fragments.py): размер
+# локального LRU (по две записи на продукт - полная и краткая форма),
+# необязательный alias общего кэша из CACHES и время жизни записи в нем
+# в секундах.
+
+PRODUCT_FRAGMENT_CACHE_SIZE = 20000
+
+PRODUCT_FRAGMENT_CACHE_ALIAS = None
+
+PRODUCT_FRAGMENT_CACHE_TTL = 24 * 60 * 60
+
+# Метрики: каталог, через который рабочие процессы одного хоста
+# складывают свои снимки для /metrics (None - только текущий процесс),
+# период записи снимка и через сколько секунд без обновления снимок
+# удаляется; снимки завершившихся процессов удаляются сразу. /metrics
+# доступен администраторам и адресам из METRICS_ALLOWED_NETWORKS
+# (REMOTE_ADDR, без заголовков прокси).
+
+METRICS_DIR = None
+
+METRICS_FLUSH_INTERVAL = 5
+
+METRICS_STALE_AFTER = 300
+
+METRICS_ALLOWED_NETWORKS = ('127.0.0.1/32', '::1/128')
+
 # Настройки Djoser
 
 DJOSER = {
@@ -138,6 +280,43 @@ DJOSER = {
     'HIDE_USERS': False,
 }
 
+# Производные изображения: размеры (ширина, высота), форматы и число
+# процессов, которые строят их в manage.py build_renditions. Для новых
+# файлов их строят задачи очереди.
+
+IMAGE_RENDITIONS = {
+    'thumbnail': (160, 160),
+    'card': (480, 480),
+    'full': (1280, 1280),
+}
+
+IMAGE_RENDITION_FORMATS = ('webp', 'jpeg')
+
+IMAGE_RENDITION_WORKERS = 2
+
+# Очередь фоновых задач (products/jobs.py): число процессов
+# manage.py run_workers, пауза между проверками пустой очереди, число
+# попыток задачи, задержка перед первым повтором (дальше она удваивается
+# до JOB_RETRY_MAX_DELAY) и время, после которого выполняющаяся задача
+# считается брошенной и возвращается в очередь. Времена в секундах.
+
+JOB_WORKERS = 2
+
+JOB_POLL_INTERVAL = 1
+
+JOB_MAX_ATTEMPTS = 5
+
+JOB_RETRY_DELAY = 10
+
+JOB_RETRY_MAX_DELAY = 60 * 60
+
+JOB_LEASE_TIMEOUT = 10 * 60
+
+# Границы ценовых диапазонов для фасетов. После изменения нужно выполнить
+# manage.py rebuild_facets.
+
+PRODUCT_PRICE_BUCKETS = (100, 300, 500, 1000, 3000)
+
 # Длины полей и количество символов
 
 MAX_LEN_USERNAME = 150
@@ -1,13 +1,24 @@
+import re
+from urllib.parse import urlsplit
+
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
+
+from api.media import serve_media
+from api.views import metrics_view
 
 urlpatterns = [
+    path('metrics', metrics_view, name='metrics'),
     path('admin/', admin.site.urls),
     path('api/', include('api.urls', namespace='api')),
 ]
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL,
-                          document_root=settings.MEDIA_ROOT)
+# Медиафайлы отдаются и без DEBUG. Если MEDIA_URL указывает на другой
+# хост, например CDN, маршрут не нужен.
+if not urlsplit(settings.MEDIA_URL).netloc:
+    urlpatterns.append(re_path(
+        r'^%s(?P<path>.+)$' % re.escape(settings.MEDIA_URL.lstrip('/')),
+        serve_media,
+        name='media',
+    ))
@@ -1,6 +1,8 @@
 from django.contrib import admin
+from django.utils import timezone
 
-from products.models import Category, Image, Product, SubCategory
+from products.models import Category, Image, Job, Product, SubCategory
+from products.search import search_products
 
 
 class InlineSubCategory(admin.StackedInline):
@@ -59,5 +61,32 @@ class ProductAdmin(admin.ModelAdmin):
     search_fields = ('name',)
     list_filter = ('name',)
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return search_products(queryset, search_term), False
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """Настройка админзоны для задач фоновой очереди."""
+
+    list_display = (
+        'name',
+        'status',
+        'priority',
+        'attempts',
+        'run_at',
+        'locked_by',
+    )
+    list_filter = ('status', 'name')
+    actions = ('retry',)
+
+    @admin.action(description='Повторить выбранные задачи')
+    def retry(self, request, queryset):
+        queryset.exclude(status=Job.RUNNING).update(
+            status=Job.QUEUED, attempts=0, run_at=timezone.now()
+        )
+
 
 admin.site.empty_value_display = 'Не задано'
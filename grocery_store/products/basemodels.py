@@ -2,6 +2,8 @@ from django.conf import settings
 from django.core.validators import RegexValidator
 from django.db import models
 
+from products.storage import content_addressed_storage
+
 
 class BaseModel(models.Model):
     """Базовая модель"""
@@ -20,6 +22,7 @@ class BaseModel(models.Model):
     )
     image = models.ImageField(
         upload_to='products/images/',
+        storage=content_addressed_storage,
         null=True,
         default=None,
     )
@@ -0,0 +1,96 @@
+from itertools import islice
+
+from django.db import transaction
+
+from products.models import Image, Product, ProductCard
+from products.renditions import renditions_builder
+
+# Поля карточки и откуда они берутся в продукте.
+CARD_SOURCES = {
+    'id': 'id',
+    'name': 'name',
+    'slug': 'slug',
+    'price': 'price',
+    'measurement_unit': 'measurement_unit',
+    'is_avaliable': 'is_avaliable',
+    'pub_date': 'pub_date',
+    'updated_at': 'updated_at',
+    'sub_category_id': 'sub_category_id',
+    'sub_category_name': 'sub_category__name',
+    'sub_category_slug': 'sub_category__slug',
+    'category_id': 'sub_category__category_id',
+    'category_name': 'sub_category__category__name',
+    'category_slug': 'sub_category__category__slug',
+}
+
+
+def build_product_cards(products, chunk_size=2000):
+    """
+    Строит карточки для выборки продуктов, читая базу порциями.
+
+    В карточке хранятся готовые представления изображений, как их отдает
+    API, поэтому после изменения MEDIA_URL или IMAGE_RENDITIONS карточки
+    нужно перестроить командой manage.py rebuild_product_cards.
+    """
+    renditions = renditions_builder(Image._meta.get_field('image').storage)
+    rows = products.order_by('id').values_list(
+        *CARD_SOURCES.values()
+    ).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        images = {}
+        for pk, product_id, name in Image.objects.filter(
+            product_id__in=[row[0] for row in chunk]
+        ).order_by('id').values_list('id', 'product_id', 'image'):
+            images.setdefault(product_id, []).append(
+                {'id': pk, 'image': renditions(name)}
+            )
+        for row in chunk:
+            product_images = images.get(row[0], [])
+            yield ProductCard(
+                **dict(zip(CARD_SOURCES, row)),
+                image=next((
+                    image['image']['original'] for image in product_images
+                    if image['image'] is not None
+                ), None),
+                images=product_images,
+            )
+
+
+def refresh_product_cards(products, batch_size=1000):
+    """Заменяет карточки продуктов из выборки в текущей транзакции."""
+    cards = build_product_cards(products, chunk_size=batch_size)
+    while True:
+        chunk = list(islice(cards, batch_size))
+        if not chunk:
+            return
+        ProductCard.objects.filter(
+            id__in=[card.id for card in chunk]
+        ).delete()
+        ProductCard.objects.bulk_create(chunk)
+
+
+def refresh_taxonomy_cards(sub_category=None, category=None):
+    """Переносит в карточки новые названия и слаги категорий."""
+    if sub_category is not None:
+        ProductCard.objects.filter(sub_category_id=sub_category.id).update(
+            sub_category_name=sub_category.name,
+            sub_category_slug=sub_category.slug,
+            category_id=sub_category.category_id,
+            category_name=sub_category.category.name,
+            category_slug=sub_category.category.slug,
+        )
+    if category is not None:
+        ProductCard.objects.filter(category_id=category.id).update(
+            category_name=category.name,
+            category_slug=category.slug,
+        )
+
+
+@transaction.atomic
+def rebuild_product_cards(batch_size=1000):
+    """Полностью перестраивает таблицу карточек."""
+    ProductCard.objects.all().delete()
+    refresh_product_cards(Product.objects.all(), batch_size)
@@ -0,0 +1,312 @@
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import (Case, Count, DecimalField, F, IntegerField,
+                              OuterRef, Q, Subquery, Sum, Value, When)
+from django.db.models.functions import Coalesce, Greatest, Now
+
+from products.loaders import load_cart_product_ids
+from products.models import CartSummary, Product, ShoppingCart
+
+_state = threading.local()
+
+
+def get_cart_lines(user):
+    """
+    Возвращает строки корзины пользователя одним запросом.
+
+    У каждой строки есть аннотация summ - стоимость строки.
+    """
+    lines = list(
+        ShoppingCart.objects.filter(user=user).select_related(
+            'product'
+        ).annotate(
+            summ=F('product__price') * F('amount')
+        ).order_by('id')
+    )
+    for line in lines:
+        line.user = user
+    return lines
+
+
+def _summary_values(user_ref):
+    lines = ShoppingCart.objects.filter(
+        user_id=user_ref
+    ).order_by().values('user_id')
+    return {
+        'products_count': Coalesce(
+            Subquery(
+                lines.annotate(count=Count('id')).values('count'),
+                output_field=IntegerField(),
+            ),
+            Value(0),
+        ),
+        'total_summ': Coalesce(
+            Subquery(
+                lines.annotate(
+                    summ=Sum(F('product__price') * F('amount'))
+                ).values('summ'),
+                output_field=DecimalField(),
+            ),
+            Value(0),
+            output_field=DecimalField(),
+        ),
+        'version': F('version') + 1,
+        'updated_at': Now(),
+    }
+
+
+def refresh_cart_summary(user_id):
+    """Пересчитывает итоги корзины пользователя одним запросом."""
+    pending = getattr(_state, 'pending', None)
+    if pending is not None:
+        pending.add(user_id)
+        return
+    CartSummary.objects.filter(user_id=user_id).update(
+        **_summary_values(OuterRef('user_id'))
+    )
+
+
+def refresh_product_cart_summaries(*product_ids):
+    """Пересчитывает итоги всех корзин, в которых лежат продукты."""
+    CartSummary.objects.filter(
+        user__shopping_cart__product_id__in=product_ids
+    ).update(**_summary_values(OuterRef('user_id')))
+
+
+@contextmanager
+def deferred_cart_summary():
+    """
+    Открывает транзакцию и откладывает пересчет итогов корзин до ее конца.
+
+    Каждая корзина, измененная внутри блока, пересчитывается один раз.
+    """
+    if getattr(_state, 'pending', None) is not None:
+        yield
+        return
+    _state.pending = set()
+    try:
+        with transaction.atomic():
+            yield
+            user_ids, _state.pending = _state.pending, None
+            for user_id in user_ids:
+                refresh_cart_summary(user_id)
+    finally:
+        _state.pending = None
+
+
+CART_SET = 'set'
+CART_INCREMENT = 'increment'
+CART_REMOVE = 'remove'
+CART_OPERATIONS = (CART_SET, CART_INCREMENT, CART_REMOVE)
+
+
+UPSERT_SQL = (
+    'INSERT INTO {cart} (user_id, product_id, amount) '
+    'SELECT %s, id, CASE id {cases} END FROM {product} WHERE id IN ({ids}) '
+    'ON CONFLICT (user_id, product_id) DO UPDATE SET {update} '
+    'RETURNING id, product_id, amount'
+)
+UPSERT_UPDATES = {
+    CART_SET: ('amount = excluded.amount '
+               'WHERE {cart}.amount <> excluded.amount'),
+    CART_INCREMENT: 'amount = {cart}.amount + excluded.amount',
+}
+
+
+def upsert_cart_lines(user_id, amounts, operation=CART_SET):
+    """
+    Добавляет продукты в корзину или меняет количество уже добавленных.
+
+    amounts - {id продукта: количество не меньше нуля}, operation - set
+    (заменить количество) или increment (прибавить к нему). В SQLite
+    и PostgreSQL это один запрос INSERT ... ON CONFLICT DO UPDATE,
+    поэтому одновременные запросы не нарушают уникальность строки
+    корзины. Несуществующие продукты пропускаются. Возвращает
+    {id продукта: (id строки, новое количество)} для изменившихся строк.
+    """
+    if not amounts:
+        return {}
+    database = router.db_for_write(ShoppingCart)
+    connection = connections[database]
+    with transaction.atomic(using=database):
+        if connection.vendor in ('sqlite', 'postgresql'):
+            params = [user_id]
+            for product_id, amount in amounts.items():
+                params += [product_id, amount]
+            params += list(amounts)
+            sql = UPSERT_SQL.format(
+                cart=ShoppingCart._meta.db_table,
+                product=Product._meta.db_table,
+                cases=' '.join(['WHEN %s THEN %s'] * len(amounts)),
+                ids=', '.join(['%s'] * len(amounts)),
+                update=UPSERT_UPDATES[operation].format(
+                    cart=ShoppingCart._meta.db_table
+                ),
+            )
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                rows = cursor.fetchall()
+            changed = {
+                product_id: (pk, amount) for pk, product_id, amount in rows
+            }
+        else:
+            changed = _upsert_cart_lines(user_id, amounts, operation)
+        if changed:
+            refresh_cart_summary(user_id)
+    return changed
+
+
+def _upsert_cart_lines(user_id, amounts, operation):
+    """upsert_cart_lines для баз без INSERT ... ON CONFLICT."""
+    changed = {}
+    for product_id in Product.objects.filter(
+        id__in=list(amounts)
+    ).values_list('id', flat=True):
+        amount = amounts[product_id]
+        lines = ShoppingCart.objects.filter(
+            user_id=user_id, product_id=product_id
+        )
+        value = amount if operation == CART_SET else F('amount') + amount
+        if not lines.update(amount=value):
+            try:
+                with transaction.atomic():
+                    ShoppingCart.objects.create(
+                        user_id=user_id, product_id=product_id, amount=amount
+                    )
+            except IntegrityError:
+                lines.update(amount=value)
+        changed[product_id] = lines.values_list('id', 'amount').get()
+    return changed
+
+
+def set_cart_amount(user_id, product_id, amount):
+    """
+    Меняет количество продукта в корзине одним UPDATE.
+
+    Возвращает False, если продукта в корзине нет.
+    """
+    with transaction.atomic():
+        updated = ShoppingCart.objects.filter(
+            user_id=user_id, product_id=product_id
+        ).update(amount=amount)
+        if updated:
+            refresh_cart_summary(user_id)
+    return bool(updated)
+
+
+def apply_cart_operations(user, operations):
+    """
+    Применяет к корзине список операций в одной транзакции.
+
+    Каждая операция - словарь с ключами product_id, amount и operation
+    (set, increment или remove). Операции над одним продуктом выполняются
+    по порядку; продукт с итоговым количеством меньше единицы удаляется
+    из корзины. Существование продуктов проверяет вызывающий код.
+
+    Операции над продуктом сводятся к итоговому количеству (после set
+    или remove) или к приращению (только increment), поэтому строки
+    корзины не читаются: количество меняется запросами
+    INSERT ... ON CONFLICT и UPDATE, безопасными при одновременных
+    запросах.
+    """
+    effects = {}
+    for operation in operations:
+        product_id = operation['product_id']
+        if operation['operation'] == CART_REMOVE:
+            effects[product_id] = (CART_SET, 0)
+        elif operation['operation'] == CART_INCREMENT:
+            kind, amount = effects.get(product_id, (CART_INCREMENT, 0))
+            effects[product_id] = (kind, amount + operation['amount'])
+        else:
+            effects[product_id] = (CART_SET, operation['amount'])
+
+    to_set = {}
+    to_add = {}
+    to_subtract = {}
+    to_delete = []
+    for product_id, (kind, amount) in effects.items():
+        if kind == CART_SET:
+            if amount < 1:
+                to_delete.append(product_id)
+            else:
+                to_set[product_id] = amount
+        elif amount > 0:
+            to_add[product_id] = amount
+        elif amount < 0:
+            to_subtract[product_id] = amount
+
+    with deferred_cart_summary():
+        upsert_cart_lines(user.id, to_set, CART_SET)
+        upsert_cart_lines(user.id, to_add, CART_INCREMENT)
+        lines = ShoppingCart.objects.filter(user=user)
+        if to_subtract and lines.filter(
+            product_id__in=list(to_subtract)
+        ).update(amount=Greatest(
+            Case(
+                *[
+                    When(product_id=product_id, then=F('amount') + amount)
+                    for product_id, amount in to_subtract.items()
+                ],
+                default=F('amount'),
+            ),
+            Value(0),
+            output_field=IntegerField(),
+        )):
+            refresh_cart_summary(user.id)
+        if to_delete or to_subtract:
+            lines.filter(
+                Q(product_id__in=to_delete)
+                | Q(product_id__in=list(to_subtract), amount__lt=1)
+            ).delete()
+
+
+def get_cart_summary(user):
+    """
+    Возвращает итоги корзины. Итоги существующих пользователей заполнены
+    миграцией, а если строки еще нет, она создается пустой и сразу
+    пересчитывается тем же UPDATE, что и при изменении корзины: изменения,
+    сделанные после вставки, пересчитают ее сами, а сделанные до нее
+    видит этот UPDATE.
+    """
+    summary = CartSummary.objects.filter(user=user).first()
+    if summary is not None:
+        return summary
+    with transaction.atomic():
+        _, created = CartSummary.objects.get_or_create(user=user)
+        if created:
+            CartSummary.objects.filter(user=user).update(
+                **_summary_values(OuterRef('user_id'))
+            )
+    return CartSummary.objects.get(user=user)
+
+
+def cart_product_ids_key(user_id, version):
+    return f'cart-products:{user_id}:{version}'
+
+
+def get_cart_product_ids(user, summary=None):
+    """
+    Возвращает множество id продуктов в корзине пользователя.
+
+    Множество кэшируется по версии итогов корзины: любое изменение
+    корзины увеличивает версию, и старая запись больше не читается.
+    Для анонимного пользователя запросов нет. summary - уже прочитанные
+    итоги корзины, если они есть у вызывающего кода.
+    """
+    if user is None or not user.is_authenticated:
+        return frozenset()
+    if settings.CART_PRODUCT_IDS_CACHE_ALIAS is None:
+        return frozenset(load_cart_product_ids(user))
+    if summary is None:
+        summary = get_cart_summary(user)
+    cache = caches[settings.CART_PRODUCT_IDS_CACHE_ALIAS]
+    key = cart_product_ids_key(user.pk, summary.version)
+    product_ids = cache.get(key)
+    if product_ids is None:
+        product_ids = frozenset(load_cart_product_ids(user))
+        cache.set(key, product_ids, settings.CART_PRODUCT_IDS_CACHE_TTL)
+    return product_ids
@@ -0,0 +1,93 @@
+import csv
+import io
+import json
+from collections import defaultdict
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from products.models import Image, Product
+from products.renditions import rendition_urls
+from products.taxonomy import get_taxonomy
+
+EXPORT_FIELDS = ('id', 'name', 'slug', 'price', 'measurement_unit',
+                 'is_avaliable', 'pub_date', 'updated_at', 'sub_category_id')
+CSV_COLUMNS = ('id', 'name', 'slug', 'price', 'measurement_unit',
+               'is_avaliable', 'pub_date', 'updated_at', 'sub_category_id',
+               'sub_category', 'category_id', 'category', 'images')
+
+
+def export_products(since=None, chunk_size=2000):
+    """
+    Отдает продукты каталога словарями, читая базу порциями.
+
+    Таксономия берется из снимка, изображения загружаются одним запросом
+    на порцию, поэтому память не зависит от размера каталога.
+    Если передан since, отдаются только продукты, измененные после него.
+    """
+    taxonomy = get_taxonomy()
+    image_field = Image._meta.get_field('image')
+    products = Product.objects.order_by('id')
+    if since is not None:
+        products = products.filter(updated_at__gte=since)
+    rows = products.values(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        images = defaultdict(list)
+        for product_id, name in Image.objects.filter(
+            product_id__in=[row['id'] for row in chunk]
+        ).exclude(image='').exclude(image__isnull=True).order_by(
+            'id'
+        ).values_list('product_id', 'image'):
+            images[product_id].append(
+                rendition_urls(image_field.storage, name)
+            )
+        for row in chunk:
+            row['sub_category'] = taxonomy.sub_category(
+                row['sub_category_id']
+            )
+            row['category'] = taxonomy.category_of(row['sub_category_id'])
+            row['images'] = images[row['id']]
+            yield row
+
+
+def ndjson_lines(products):
+    for product in products:
+        yield json.dumps(
+            product, cls=DjangoJSONEncoder, ensure_ascii=False
+        ) + '\n'
+
+
+def csv_lines(products):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return value
+
+    writer.writerow(CSV_COLUMNS)
+    yield flush()
+    for product in products:
+        sub_category = product['sub_category'] or {}
+        category = product['category'] or {}
+        writer.writerow((
+            product['id'],
+            product['name'],
+            product['slug'],
+            product['price'],
+            product['measurement_unit'],
+            product['is_avaliable'],
+            product['pub_date'].isoformat(),
+            product['updated_at'].isoformat(),
+            product['sub_category_id'],
+            sub_category.get('name'),
+            category.get('id'),
+            category.get('name'),
+            ' '.join(image['original'] for image in product['images']),
+        ))
+        yield flush()
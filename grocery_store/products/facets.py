@@ -0,0 +1,254 @@
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Value, When
+
+from products.models import Product, ProductFacetCount
+from products.taxonomy import get_taxonomy
+
+TRUE_VALUES = ('1', 'true', 'True')
+FALSE_VALUES = ('0', 'false', 'False')
+
+
+def price_bucket(price):
+    """Номер ценового диапазона для цены."""
+    for index, bound in enumerate(settings.PRODUCT_PRICE_BUCKETS):
+        if price < bound:
+            return index
+    return len(settings.PRODUCT_PRICE_BUCKETS)
+
+
+def price_bucket_expression():
+    bounds = settings.PRODUCT_PRICE_BUCKETS
+    return Case(
+        *[
+            When(price__lt=bound, then=Value(index))
+            for index, bound in enumerate(bounds)
+        ],
+        default=Value(len(bounds)),
+        output_field=IntegerField(),
+    )
+
+
+def price_bucket_bounds(index):
+    bounds = (None, *settings.PRODUCT_PRICE_BUCKETS, None)
+    return bounds[index], bounds[index + 1]
+
+
+def facet_key(product):
+    return (
+        product.sub_category_id,
+        price_bucket(product.price),
+        product.is_avaliable,
+    )
+
+
+def change_facet_count(key, delta):
+    """Изменяет счетчик ячейки фасетов на delta одним запросом."""
+    sub_category_id, bucket, is_avaliable = key
+    cells = ProductFacetCount.objects.filter(
+        sub_category_id=sub_category_id,
+        price_bucket=bucket,
+        is_avaliable=is_avaliable,
+    )
+    if cells.update(count=F('count') + delta) or delta < 0:
+        return
+    try:
+        with transaction.atomic():
+            ProductFacetCount.objects.create(
+                sub_category_id=sub_category_id,
+                price_bucket=bucket,
+                is_avaliable=is_avaliable,
+                count=delta,
+            )
+    except IntegrityError:
+        cells.update(count=F('count') + delta)
+
+
+def group_facet_cells(queryset):
+    """Считает ячейки фасетов группировкой по выборке продуктов."""
+    return queryset.order_by().annotate(
+        facet_bucket=price_bucket_expression(),
+    ).values(
+        'sub_category_id', 'facet_bucket', 'is_avaliable',
+    ).annotate(
+        facet_count=Count('pk'),
+    ).values_list(
+        'sub_category_id', 'facet_bucket', 'is_avaliable', 'facet_count',
+    )
+
+
+@transaction.atomic
+def rebuild_facet_counts():
+    """Полностью пересчитывает таблицу фасетов."""
+    ProductFacetCount.objects.all().delete()
+    ProductFacetCount.objects.bulk_create(
+        ProductFacetCount(
+            sub_category_id=sub_category_id,
+            price_bucket=bucket,
+            is_avaliable=is_avaliable,
+            count=count,
+        )
+        for sub_category_id, bucket, is_avaliable, count
+        in group_facet_cells(Product.objects.all())
+    )
+
+
+class FacetSelection:
+    """
+    Фильтры каталога из параметров запроса.
+
+    Параметры: category и sub_category - id через запятую, price_bucket -
+    номера ценовых диапазонов через запятую, min_price и max_price,
+    is_avaliable - true или false.
+    """
+
+    def __init__(self, query_params):
+        self.errors = {}
+        self.category_ids = self.parse_ids(query_params, 'category')
+        self.sub_category_ids = self.parse_ids(query_params, 'sub_category')
+        self.price_buckets = self.parse_ids(query_params, 'price_bucket')
+        self.min_price = self.parse_price(query_params, 'min_price')
+        self.max_price = self.parse_price(query_params, 'max_price')
+        self.is_avaliable = None
+        value = query_params.get('is_avaliable')
+        if value in TRUE_VALUES:
+            self.is_avaliable = True
+        elif value in FALSE_VALUES:
+            self.is_avaliable = False
+        elif value is not None:
+            self.errors['is_avaliable'] = 'Ожидается true или false.'
+
+    def parse_ids(self, query_params, name):
+        value = query_params.get(name)
+        if not value:
+            return None
+        try:
+            return {int(item) for item in value.split(',') if item}
+        except ValueError:
+            self.errors[name] = 'Ожидается список id через запятую.'
+            return None
+
+    def parse_price(self, query_params, name):
+        value = query_params.get(name)
+        if not value:
+            return None
+        try:
+            return Decimal(value)
+        except InvalidOperation:
+            self.errors[name] = 'Ожидается число.'
+            return None
+
+    @property
+    def uses_cells(self):
+        """Можно ли посчитать фасеты по таблице, без группировки."""
+        return self.min_price is None and self.max_price is None
+
+    def get_sub_category_ids(self):
+        if self.category_ids is None:
+            return self.sub_category_ids
+        taxonomy = get_taxonomy()
+        ids = {
+            sub_category['id']
+            for category_id in self.category_ids
+            for sub_category in taxonomy.sub_categories(category_id)
+        }
+        if self.sub_category_ids is not None:
+            ids &= self.sub_category_ids
+        return ids
+
+    def cell_filter(self):
+        condition = Q()
+        sub_category_ids = self.get_sub_category_ids()
+        if sub_category_ids is not None:
+            condition &= Q(sub_category_id__in=sub_category_ids)
+        if self.is_avaliable is not None:
+            condition &= Q(is_avaliable=self.is_avaliable)
+        return condition
+
+    def filter_queryset(self, queryset):
+        queryset = queryset.filter(self.cell_filter())
+        if self.price_buckets is not None:
+            condition = Q(pk__in=[])
+            for bucket in self.price_buckets:
+                if not 0 <= bucket <= len(settings.PRODUCT_PRICE_BUCKETS):
+                    continue
+                low, high = price_bucket_bounds(bucket)
+                bucket_condition = Q()
+                if low is not None:
+                    bucket_condition &= Q(price__gte=low)
+                if high is not None:
+                    bucket_condition &= Q(price__lt=high)
+                condition |= bucket_condition
+            queryset = queryset.filter(condition)
+        if self.min_price is not None:
+            queryset = queryset.filter(price__gte=self.min_price)
+        if self.max_price is not None:
+            queryset = queryset.filter(price__lte=self.max_price)
+        return queryset
+
+    def get_cells(self, queryset=None):
+        """
+        Ячейки фасетов для выборки. Если queryset не передан, они берутся
+        из таблицы фасетов, иначе считаются группировкой по queryset.
+        """
+        if queryset is not None:
+            return list(group_facet_cells(queryset))
+        cells = ProductFacetCount.objects.filter(
+            self.cell_filter(), count__gt=0
+        )
+        if self.price_buckets is not None:
+            cells = cells.filter(price_bucket__in=self.price_buckets)
+        return list(cells.values_list(
+            'sub_category_id', 'price_bucket', 'is_avaliable', 'count'
+        ))
+
+
+def build_facets(cells):
+    """Собирает счетчики фасетов из ячеек."""
+    taxonomy = get_taxonomy()
+    categories = defaultdict(int)
+    sub_categories = defaultdict(int)
+    buckets = defaultdict(int)
+    availability = defaultdict(int)
+    for sub_category_id, bucket, is_avaliable, count in cells:
+        sub_categories[sub_category_id] += count
+        buckets[bucket] += count
+        availability[is_avaliable] += count
+    for sub_category_id, count in sub_categories.items():
+        category = taxonomy.category_of(sub_category_id)
+        if category is not None:
+            categories[category['id']] += count
+
+    def describe(getter, counts):
+        result = []
+        for pk, count in sorted(counts.items()):
+            data = getter(pk)
+            if data is not None:
+                result.append({
+                    'id': pk,
+                    'name': data['name'],
+                    'slug': data['slug'],
+                    'count': count,
+                })
+        return result
+
+    return {
+        'categories': describe(taxonomy.category, categories),
+        'sub_categories': describe(taxonomy.sub_category, sub_categories),
+        'prices': [
+            {
+                'bucket': bucket,
+                'min': price_bucket_bounds(bucket)[0],
+                'max': price_bucket_bounds(bucket)[1],
+                'count': count,
+            }
+            for bucket, count in sorted(buckets.items())
+        ],
+        'is_avaliable': [
+            {'value': value, 'count': count}
+            for value, count in sorted(availability.items())
+        ],
+    }
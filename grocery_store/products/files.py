@@ -0,0 +1,50 @@
+import os
+import uuid
+
+from django.conf import settings
+
+from products.models import Category, Image, SubCategory
+from products.renditions import rendition_name
+from products.storage import content_addressed_storage
+
+FILE_MODELS = (Category, SubCategory, Image)
+
+
+def reference_count(name):
+    """Сколько объектов ссылается на файл name."""
+    return sum(
+        model.objects.filter(image=name).count() for model in FILE_MODELS
+    )
+
+
+def release_file(name, storage=content_addressed_storage):
+    """
+    Удаляет файл и его производные изображения, если на файл
+    больше никто не ссылается.
+
+    Загрузка того же содержимого находит существующий файл и не пишет
+    его заново, поэтому ссылка может появиться между проверкой и
+    удалением. Файл сначала переносится в сторону, ссылки проверяются
+    еще раз, и файл возвращается на место, если ссылка появилась.
+    Загрузка, зафиксированная уже после удаления, записывает файл
+    заново сама (ContentAddressedStorage.restore).
+    """
+    if not name or reference_count(name):
+        return False
+    path = storage.path(name)
+    directory, filename = os.path.split(path)
+    aside = os.path.join(directory, f'.{filename}.{uuid.uuid4().hex}')
+    try:
+        os.replace(path, aside)
+    except FileNotFoundError:
+        aside = None
+    if reference_count(name):
+        if aside is not None:
+            os.replace(aside, path)
+        return False
+    for size in settings.IMAGE_RENDITIONS:
+        for fmt in settings.IMAGE_RENDITION_FORMATS:
+            storage.delete(rendition_name(name, size, fmt))
+    if aside is not None:
+        os.remove(aside)
+    return True
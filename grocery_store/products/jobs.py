@@ -0,0 +1,209 @@
+"""
+Очередь фоновых задач в таблице Job.
+
+Задача - функция, отмеченная декоратором task. enqueue добавляет строку
+задачи в текущей транзакции, поэтому задача появляется в очереди только
+вместе с изменениями, которые ее вызвали, и пропадает при откате.
+Обработчики сигналов и представления вызывают enqueue напрямую, без
+transaction.on_commit.
+
+Задачи выполняют рабочие процессы manage.py run_workers. Процесс берет
+готовую задачу с наибольшим приоритетом: на базах с SELECT ... FOR UPDATE
+SKIP LOCKED (PostgreSQL) - в транзакции с этой блокировкой, на SQLite -
+условным UPDATE по статусу, который удается только одному процессу.
+Успешно выполненная задача удаляется. Ошибка возвращает задачу в очередь
+с задержкой, которая удваивается с каждой попыткой, а после max_attempts
+попыток задача остается со статусом failed. Задачу, которая выполняется
+дольше JOB_LEASE_TIMEOUT, считают брошенной упавшим процессом и
+возвращают в очередь, поэтому задачи должны допускать повторный запуск.
+"""
+import logging
+import os
+import random
+import socket
+import traceback
+from datetime import timedelta
+from importlib import import_module
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from products.models import Job
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+# Сколько готовых задач перебирает захват без блокировок, прежде чем
+# считать очередь занятой другими процессами.
+CLAIM_CANDIDATES = 10
+
+
+def task(func=None, *, priority=0, max_attempts=None):
+    """
+    Регистрирует функцию как задачу очереди под именем модуль.функция.
+    Аргументы задачи должны сериализоваться в JSON.
+    """
+    def decorator(func):
+        func.job_name = f'{func.__module__}.{func.__qualname__}'
+        func.job_priority = priority
+        func.job_max_attempts = max_attempts or settings.JOB_MAX_ATTEMPTS
+        TASKS[func.job_name] = func
+        return func
+
+    return decorator if func is None else decorator(func)
+
+
+def enqueue(func, *args, priority=None, delay=None, **kwargs):
+    """
+    Ставит задачу func(*args, **kwargs) в очередь в текущей транзакции.
+    priority заменяет приоритет задачи, delay - задержка запуска
+    в секундах.
+    """
+    if TASKS.get(getattr(func, 'job_name', None)) is not func:
+        raise ValueError(f'{func!r} не зарегистрирована как задача.')
+    return Job.objects.create(
+        name=func.job_name,
+        payload={'args': list(args), 'kwargs': kwargs},
+        priority=func.job_priority if priority is None else priority,
+        max_attempts=func.job_max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay or 0),
+    )
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def ready_jobs():
+    return Job.objects.filter(
+        status=Job.QUEUED, run_at__lte=timezone.now()
+    ).order_by('-priority', 'run_at', 'id')
+
+
+def claim_job(worker):
+    """Забирает готовую задачу для процесса worker или возвращает None."""
+    now = timezone.now()
+    claimed = {
+        'status': Job.RUNNING,
+        'locked_by': worker,
+        'locked_at': now,
+        'attempts': F('attempts') + 1,
+    }
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            pk = ready_jobs().select_for_update(
+                skip_locked=True
+            ).values_list('id', flat=True).first()
+            if pk is None:
+                return None
+            Job.objects.filter(pk=pk).update(**claimed)
+        return Job.objects.get(pk=pk)
+    for pk in ready_jobs().values_list('id', flat=True)[:CLAIM_CANDIDATES]:
+        if Job.objects.filter(pk=pk, status=Job.QUEUED).update(**claimed):
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def retry_delay(attempts):
+    """Задержка перед попыткой attempts + 1 с разбросом до 10%."""
+    delay = min(
+        settings.JOB_RETRY_DELAY * 2 ** (attempts - 1),
+        settings.JOB_RETRY_MAX_DELAY,
+    )
+    return delay * random.uniform(1, 1.1)
+
+
+def run_job(job, worker):
+    """Выполняет захваченную задачу и записывает результат."""
+    func = TASKS.get(job.name)
+    if func is None:
+        module = job.name.rpartition('.')[0]
+        try:
+            import_module(module)
+        except ImportError:
+            pass
+        func = TASKS.get(job.name)
+    current = Job.objects.filter(pk=job.pk, locked_by=worker)
+    if func is None:
+        current.update(
+            status=Job.FAILED,
+            locked_by=None,
+            last_error=f'Неизвестная задача {job.name}.',
+        )
+        return False
+    try:
+        func(*job.payload['args'], **job.payload['kwargs'])
+    except Exception:
+        error = traceback.format_exc()
+        logger.exception('Задача %s #%s завершилась ошибкой.',
+                         job.name, job.pk)
+        if job.attempts >= job.max_attempts:
+            current.update(status=Job.FAILED, locked_by=None,
+                           last_error=error)
+        else:
+            current.update(
+                status=Job.QUEUED,
+                locked_by=None,
+                locked_at=None,
+                run_at=timezone.now() + timedelta(
+                    seconds=retry_delay(job.attempts)
+                ),
+                last_error=error,
+            )
+        return False
+    current.delete()
+    return True
+
+
+def run_next_job(worker):
+    """
+    Выполняет одну задачу, если она есть. Соединения с базой
+    обслуживаются так же, как между HTTP-запросами.
+    """
+    close_old_connections()
+    try:
+        job = claim_job(worker)
+        if job is None:
+            return False
+        run_job(job, worker)
+        return True
+    finally:
+        close_old_connections()
+
+
+def requeue_stale_jobs():
+    """
+    Возвращает в очередь задачи, которые выполняются дольше
+    JOB_LEASE_TIMEOUT, а исчерпавшие попытки отмечает как failed.
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status=Job.RUNNING,
+        locked_at__lt=now - timedelta(seconds=settings.JOB_LEASE_TIMEOUT),
+    )
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED,
+        locked_by=None,
+        last_error='Превышено время выполнения.',
+    )
+    requeued = stale.update(
+        status=Job.QUEUED, locked_by=None, locked_at=None, run_at=now
+    )
+    return requeued, failed
+
+
+def work(stop, burst=False):
+    """
+    Цикл рабочего процесса: выполняет задачи, пока не установлено
+    событие stop. В режиме burst процесс завершается, когда готовых
+    задач не остается.
+    """
+    worker = worker_name()
+    while not stop.is_set():
+        if not run_next_job(worker):
+            if burst:
+                return
+            stop.wait(settings.JOB_POLL_INTERVAL)
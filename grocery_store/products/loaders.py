@@ -0,0 +1,15 @@
+from products.models import ShoppingCart
+
+
+def load_cart_product_ids(user, product_ids=None):
+    """
+    Возвращает множество id продуктов из корзины пользователя.
+
+    Если передан product_ids, проверяются только эти продукты.
+    """
+    if user is None or not user.is_authenticated:
+        return set()
+    lines = ShoppingCart.objects.filter(user=user)
+    if product_ids is not None:
+        lines = lines.filter(product_id__in=product_ids)
+    return set(lines.values_list('product_id', flat=True))
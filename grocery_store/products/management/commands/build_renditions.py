@@ -0,0 +1,41 @@
+from concurrent.futures import as_completed
+
+from django.core.management.base import BaseCommand
+
+from products.models import Category, Image, SubCategory
+from products.renditions import schedule_renditions
+
+
+class Command(BaseCommand):
+    help = 'Строит производные изображения для уже загруженных файлов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Перестроить даже актуальные производные изображения.',
+        )
+
+    def handle(self, *args, **options):
+        futures = {}
+        seen = set()
+        for model in (Category, SubCategory, Image):
+            for obj in model.objects.exclude(image='').exclude(
+                image__isnull=True
+            ).only('id', 'image').iterator():
+                if obj.image.name in seen:
+                    continue
+                seen.add(obj.image.name)
+                future = schedule_renditions(obj.image, options['force'])
+                futures[future] = obj.image.name
+        written = failed = 0
+        for future in as_completed(futures):
+            try:
+                written += len(future.result())
+            except Exception as error:
+                failed += 1
+                self.stderr.write(f'{futures[future]}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано файлов: {len(futures)}, '
+            f'создано изображений: {written}, ошибок: {failed}'
+        ))
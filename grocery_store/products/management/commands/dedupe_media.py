@@ -0,0 +1,81 @@
+import posixpath
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from products.cards import refresh_product_cards
+from products.files import FILE_MODELS, release_file
+from products.models import Image, Product
+from products.storage import content_addressed_storage
+from products.versions import bump_catalog_version, catalog_replaced
+
+
+class Command(BaseCommand):
+    help = ('Переименовывает загруженные изображения по хэшу содержимого '
+            'и удаляет дубликаты.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать, что будет сделано.',
+        )
+
+    def handle(self, *args, **options):
+        storage = content_addressed_storage
+        renamed = {}
+        sizes = {}
+        freed = 0
+        for model in FILE_MODELS:
+            upload_to = model._meta.get_field('image').upload_to
+            names = model.objects.exclude(image='').exclude(
+                image__isnull=True
+            ).values_list('image', flat=True).distinct()
+            for name in names:
+                if name in renamed:
+                    continue
+                if not storage.exists(name):
+                    self.stderr.write(f'Файл не найден: {name}')
+                    continue
+                with storage.open(name) as file:
+                    new_name = storage.hashed_name(
+                        posixpath.join(upload_to, posixpath.basename(name)),
+                        file,
+                    )
+                if new_name != name:
+                    renamed[name] = new_name
+                    sizes[new_name] = storage.size(name)
+                    freed += sizes[new_name]
+
+        unique = set(renamed.values())
+        freed -= sum(sizes[new_name] for new_name in unique)
+        self.stdout.write(
+            f'Файлов к переименованию: {len(renamed)}, '
+            f'уникальных: {len(unique)}, освободится байт: {freed}'
+        )
+        if options['dry_run'] or not renamed:
+            return
+
+        for name in renamed:
+            with storage.open(name) as file:
+                storage.save(name, file)
+        # QuerySet.update не отправляет сигналы: карточки продуктов,
+        # версии их фрагментов и версия каталога обновляются здесь же,
+        # иначе ответы ссылались бы на удаляемые ниже файлы.
+        with transaction.atomic():
+            for model in FILE_MODELS:
+                for name, new_name in renamed.items():
+                    model.objects.filter(image=name).update(image=new_name)
+            products = Product.objects.filter(pk__in=Image.objects.filter(
+                image__in=list(unique)
+            ).values('product_id'))
+            products.update(updated_at=timezone.now())
+            refresh_product_cards(products)
+            bump_catalog_version()
+            catalog_replaced.send(sender=self.__class__)
+        for name in renamed:
+            release_file(name)
+        call_command('build_renditions', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS('Дубликаты удалены.'))
@@ -0,0 +1,221 @@
+import csv
+import json
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from products.cards import refresh_product_cards
+from products.cart import refresh_product_cart_summaries
+from products.facets import FALSE_VALUES, TRUE_VALUES, rebuild_facet_counts
+from products.models import Product, SubCategory
+from products.versions import bump_catalog_version, catalog_replaced
+
+FIELDS = ('name', 'price', 'measurement_unit', 'is_avaliable',
+          'sub_category')
+AMBIGUOUS = object()
+
+
+class RowError(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Импортирует продукты из CSV или JSONL. Продукты сопоставляются '
+            'по slug: существующие обновляются, новые создаются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл CSV или JSONL.')
+        parser.add_argument(
+            '--format',
+            choices=('csv', 'jsonl'),
+            help='Формат файла, по умолчанию определяется по расширению.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество строк в одной транзакции.',
+        )
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or (
+            'csv' if options['path'].endswith('.csv') else 'jsonl'
+        )
+        self.verbosity = options['verbosity']
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size должен быть больше нуля.')
+        self.load_sub_categories()
+
+        started = time.monotonic()
+        processed = created = updated = errors = 0
+        batch = {}
+        with open(options['path'], encoding='utf-8', newline='') as file:
+            for line_number, row in self.read_rows(file, file_format):
+                try:
+                    slug, values = self.clean_row(row)
+                except RowError as error:
+                    errors += 1
+                    self.stderr.write(f'Строка {line_number}: {error}')
+                    continue
+                batch[slug] = values
+                if len(batch) >= batch_size:
+                    batch_created, batch_updated = self.save_batch(batch)
+                    processed += len(batch)
+                    created += batch_created
+                    updated += batch_updated
+                    batch = {}
+                    self.report_progress(processed, started)
+        if batch:
+            batch_created, batch_updated = self.save_batch(batch)
+            processed += len(batch)
+            created += batch_created
+            updated += batch_updated
+
+        # bulk_create и bulk_update не отправляют сигналы: счетчики фасетов
+        # и версия каталога обновляются один раз в конце, полнотекстовый
+        # индекс поддерживают триггеры базы данных.
+        if created or updated:
+            with transaction.atomic():
+                rebuild_facet_counts()
+                bump_catalog_version()
+                catalog_replaced.send(sender=self.__class__)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: {created}, обновлено: {updated}, '
+            f'без изменений: {processed - created - updated}, '
+            f'ошибок: {errors}, время: {elapsed:.1f} с, '
+            f'строк в секунду: {processed / (elapsed or 1):.0f}'
+        ))
+
+    def load_sub_categories(self):
+        """Словари подкатегорий по slug и по паре (категория, slug)."""
+        self.sub_categories = {}
+        self.sub_categories_in_category = {}
+        for pk, slug, category_slug in SubCategory.objects.values_list(
+            'id', 'slug', 'category__slug'
+        ):
+            self.sub_categories_in_category[(category_slug, slug)] = pk
+            self.sub_categories[slug] = (
+                AMBIGUOUS if slug in self.sub_categories else pk
+            )
+
+    def read_rows(self, file, file_format):
+        if file_format == 'csv':
+            reader = csv.DictReader(file)
+            for row in reader:
+                yield reader.line_num, row
+            return
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_number, row
+
+    def clean_row(self, row):
+        if not isinstance(row, dict):
+            raise RowError('неверный JSON.')
+        slug = (row.get('slug') or '').strip()
+        if not slug:
+            raise RowError('не указан slug.')
+        if len(slug) > settings.MAX_LEN_SLUG:
+            raise RowError('slug слишком длинный.')
+        name = (row.get('name') or '').strip()
+        if not name or len(name) > settings.MAX_LEN_NAME:
+            raise RowError('пустое или слишком длинное название.')
+        measurement_unit = (row.get('measurement_unit') or '').strip()
+        if len(measurement_unit) > settings.MAX_LEN_NAME:
+            raise RowError('слишком длинная единица измерения.')
+        try:
+            price = Decimal(str(row.get('price'))).quantize(Decimal('0.01'))
+            if price.is_nan():
+                raise InvalidOperation
+        except InvalidOperation:
+            raise RowError(f'неверная цена {row.get("price")!r}.')
+        if price < 0 or price >= Decimal('1e8'):
+            raise RowError(f'цена вне допустимого диапазона: {price}.')
+        is_avaliable = row.get('is_avaliable', False)
+        if isinstance(is_avaliable, str):
+            if is_avaliable in TRUE_VALUES:
+                is_avaliable = True
+            elif is_avaliable in FALSE_VALUES or is_avaliable == '':
+                is_avaliable = False
+            else:
+                raise RowError(f'неверное значение is_avaliable '
+                               f'{is_avaliable!r}.')
+        sub_category_slug = row.get('sub_category')
+        category_slug = row.get('category')
+        if category_slug:
+            sub_category_id = self.sub_categories_in_category.get(
+                (category_slug, sub_category_slug)
+            )
+        else:
+            sub_category_id = self.sub_categories.get(sub_category_slug)
+        if sub_category_id is AMBIGUOUS:
+            raise RowError(f'подкатегория {sub_category_slug!r} есть в '
+                           f'нескольких категориях, укажите category.')
+        if sub_category_id is None:
+            raise RowError(f'неизвестная подкатегория {sub_category_slug!r}.')
+        return slug, {
+            'name': name,
+            'price': price,
+            'measurement_unit': measurement_unit,
+            'is_avaliable': bool(is_avaliable),
+            'sub_category_id': sub_category_id,
+        }
+
+    @transaction.atomic
+    def save_batch(self, batch):
+        """
+        Сохраняет пачку строк: один запрос на поиск существующих продуктов,
+        затем bulk_update и bulk_create.
+        """
+        existing = {}
+        for product in Product.objects.filter(
+            slug__in=list(batch)
+        ).order_by('-id').only('id', 'slug', *FIELDS):
+            existing[product.slug] = product
+        to_create = []
+        to_update = []
+        now = timezone.now()
+        for slug, values in batch.items():
+            product = existing.get(slug)
+            if product is None:
+                to_create.append(Product(slug=slug, **values))
+                continue
+            changed = False
+            for field, value in values.items():
+                if getattr(product, field) != value:
+                    setattr(product, field, value)
+                    changed = True
+            if changed:
+                # bulk_update не заполняет поля с auto_now.
+                product.updated_at = now
+                to_update.append(product)
+        Product.objects.bulk_create(to_create)
+        if to_update:
+            Product.objects.bulk_update(to_update, (*FIELDS, 'updated_at'))
+            refresh_product_cart_summaries(
+                *[product.id for product in to_update]
+            )
+        if to_create or to_update:
+            refresh_product_cards(Product.objects.filter(slug__in=[
+                product.slug for product in (*to_create, *to_update)
+            ]))
+        return len(to_create), len(to_update)
+
+    def report_progress(self, saved, started):
+        if self.verbosity < 2:
+            return
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'Сохранено: {saved}, строк в секунду: '
+            f'{saved / (elapsed or 1):.0f}'
+        )
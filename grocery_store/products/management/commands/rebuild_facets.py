@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from products.facets import rebuild_facet_counts
+from products.models import ProductFacetCount
+
+
+class Command(BaseCommand):
+    help = 'Полностью пересчитывает таблицу счетчиков фасетов.'
+
+    def handle(self, *args, **options):
+        rebuild_facet_counts()
+        self.stdout.write(self.style.SUCCESS(
+            f'Ячеек фасетов: {ProductFacetCount.objects.count()}'
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from products.cards import rebuild_product_cards
+from products.models import ProductCard
+
+
+class Command(BaseCommand):
+    help = 'Полностью перестраивает таблицу карточек продуктов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rebuild_product_cards(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Карточек продуктов: {ProductCard.objects.count()}'
+        ))
@@ -0,0 +1,95 @@
+import multiprocessing
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from products.jobs import requeue_stale_jobs, work
+
+# Рабочие процессы наследуют настроенный Django от основного процесса.
+context = multiprocessing.get_context('fork')
+
+# Как часто основной процесс проверяет рабочие процессы и брошенные
+# задачи, в секундах.
+SUPERVISE_INTERVAL = 5
+
+TICK = 0.5
+
+
+def worker_main(stop, burst):
+    # Ctrl+C и SIGTERM от systemd получает вся группа процессов: рабочие
+    # процессы останавливает основной через stop, текущая задача при этом
+    # доделывается.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    try:
+        work(stop, burst)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Запускает рабочие процессы очереди фоновых задач.'
+
+    stopping = False
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=settings.JOB_WORKERS,
+            help='Число рабочих процессов.',
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Выполнить готовые задачи и завершиться.',
+        )
+
+    def handle(self, *args, **options):
+        burst = options['burst']
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, self.request_stop)
+        requeue_stale_jobs()
+        # Соединения основного процесса не должны достаться дочерним.
+        connections.close_all()
+        stop = context.Event()
+        processes = [
+            self.start(stop, burst) for _ in range(options['processes'])
+        ]
+        self.stdout.write(f'Рабочих процессов: {len(processes)}')
+        checked_at = time.monotonic()
+        while not self.stopping:
+            time.sleep(TICK)
+            if burst:
+                if not any(process.is_alive() for process in processes):
+                    break
+                continue
+            if time.monotonic() - checked_at < SUPERVISE_INTERVAL:
+                continue
+            checked_at = time.monotonic()
+            requeue_stale_jobs()
+            connections.close_all()
+            for index, process in enumerate(processes):
+                if not process.is_alive():
+                    self.stderr.write(
+                        f'Процесс {process.pid} завершился с кодом '
+                        f'{process.exitcode}, запускаем новый.'
+                    )
+                    processes[index] = self.start(stop, burst)
+        stop.set()
+        for process in processes:
+            process.join()
+        self.stdout.write(self.style.SUCCESS('Рабочие процессы остановлены.'))
+
+    def request_stop(self, signum, frame):
+        # Только флаг: событие stop нельзя безопасно менять
+        # из обработчика сигнала.
+        self.stopping = True
+
+    def start(self, stop, burst):
+        process = context.Process(target=worker_main, args=(stop, burst))
+        process.start()
+        return process
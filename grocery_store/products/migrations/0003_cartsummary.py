@@ -0,0 +1,28 @@
+# Generated by Django 3.2.3 on 2026-10-18 10:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('products', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CartSummary',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='cart_summary', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('products_count', models.PositiveIntegerField(default=0, verbose_name='Количество продуктов')),
+                ('total_summ', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Сумма')),
+            ],
+            options={
+                'verbose_name': 'Итоги корзины',
+                'verbose_name_plural': 'Итоги корзин',
+            },
+        ),
+    ]
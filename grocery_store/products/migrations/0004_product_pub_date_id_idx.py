@@ -0,0 +1,17 @@
+# Generated by Django 3.2.3 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_cartsummary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['pub_date', 'id'], name='product_pub_date_id_idx'),
+        ),
+    ]
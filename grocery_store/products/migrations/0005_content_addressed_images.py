@@ -0,0 +1,29 @@
+# Generated by Django 3.2.3 on 2026-10-18 10:00
+
+from django.db import migrations, models
+import products.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_product_pub_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='category',
+            name='image',
+            field=models.ImageField(default=None, null=True, storage=products.storage.ContentAddressedStorage(), upload_to='products/images/'),
+        ),
+        migrations.AlterField(
+            model_name='image',
+            name='image',
+            field=models.ImageField(db_index=True, default=None, null=True, storage=products.storage.ContentAddressedStorage(), upload_to='products/images/'),
+        ),
+        migrations.AlterField(
+            model_name='subcategory',
+            name='image',
+            field=models.ImageField(default=None, null=True, storage=products.storage.ContentAddressedStorage(), upload_to='products/images/'),
+        ),
+    ]
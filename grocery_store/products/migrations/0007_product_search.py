@@ -0,0 +1,209 @@
+from django.db import migrations
+
+SQLITE_FORWARDS = [
+    """
+    CREATE VIRTUAL TABLE products_product_fts USING fts5(
+        name, sub_category, category,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER products_product_fts_insert
+    AFTER INSERT ON products_product BEGIN
+        INSERT INTO products_product_fts (rowid, name, sub_category, category)
+        SELECT NEW.id, NEW.name, s.name, c.name
+        FROM products_subcategory s
+        JOIN products_category c ON c.id = s.category_id
+        WHERE s.id = NEW.sub_category_id;
+    END
+    """,
+    """
+    CREATE TRIGGER products_product_fts_update
+    AFTER UPDATE OF name, sub_category_id ON products_product BEGIN
+        DELETE FROM products_product_fts WHERE rowid = OLD.id;
+        INSERT INTO products_product_fts (rowid, name, sub_category, category)
+        SELECT NEW.id, NEW.name, s.name, c.name
+        FROM products_subcategory s
+        JOIN products_category c ON c.id = s.category_id
+        WHERE s.id = NEW.sub_category_id;
+    END
+    """,
+    """
+    CREATE TRIGGER products_product_fts_delete
+    AFTER DELETE ON products_product BEGIN
+        DELETE FROM products_product_fts WHERE rowid = OLD.id;
+    END
+    """,
+    """
+    CREATE TRIGGER products_subcategory_fts_update
+    AFTER UPDATE OF name, category_id ON products_subcategory BEGIN
+        DELETE FROM products_product_fts WHERE rowid IN (
+            SELECT id FROM products_product WHERE sub_category_id = NEW.id
+        );
+        INSERT INTO products_product_fts (rowid, name, sub_category, category)
+        SELECT p.id, p.name, NEW.name, c.name
+        FROM products_product p
+        JOIN products_category c ON c.id = NEW.category_id
+        WHERE p.sub_category_id = NEW.id;
+    END
+    """,
+    """
+    CREATE TRIGGER products_category_fts_update
+    AFTER UPDATE OF name ON products_category BEGIN
+        DELETE FROM products_product_fts WHERE rowid IN (
+            SELECT p.id FROM products_product p
+            JOIN products_subcategory s ON s.id = p.sub_category_id
+            WHERE s.category_id = NEW.id
+        );
+        INSERT INTO products_product_fts (rowid, name, sub_category, category)
+        SELECT p.id, p.name, s.name, NEW.name
+        FROM products_product p
+        JOIN products_subcategory s ON s.id = p.sub_category_id
+        WHERE s.category_id = NEW.id;
+    END
+    """,
+    """
+    INSERT INTO products_product_fts (rowid, name, sub_category, category)
+    SELECT p.id, p.name, s.name, c.name
+    FROM products_product p
+    JOIN products_subcategory s ON s.id = p.sub_category_id
+    JOIN products_category c ON c.id = s.category_id
+    """,
+]
+
+SQLITE_BACKWARDS = [
+    'DROP TRIGGER IF EXISTS products_category_fts_update',
+    'DROP TRIGGER IF EXISTS products_subcategory_fts_update',
+    'DROP TRIGGER IF EXISTS products_product_fts_delete',
+    'DROP TRIGGER IF EXISTS products_product_fts_update',
+    'DROP TRIGGER IF EXISTS products_product_fts_insert',
+    'DROP TABLE IF EXISTS products_product_fts',
+]
+
+POSTGRESQL_FORWARDS = [
+    """
+    CREATE TABLE products_productsearch (
+        product_id bigint PRIMARY KEY
+            REFERENCES products_product (id) ON DELETE CASCADE,
+        document tsvector NOT NULL
+    )
+    """,
+    """
+    CREATE INDEX products_productsearch_document_idx
+    ON products_productsearch USING GIN (document)
+    """,
+    """
+    CREATE FUNCTION products_product_document(
+        product_name text, sub_category_name text, category_name text
+    ) RETURNS tsvector AS $$
+        SELECT setweight(to_tsvector('russian', product_name), 'A')
+            || setweight(to_tsvector('russian', sub_category_name), 'B')
+            || setweight(to_tsvector('russian', category_name), 'C')
+    $$ LANGUAGE sql IMMUTABLE
+    """,
+    """
+    CREATE FUNCTION products_product_search_update() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO products_productsearch (product_id, document)
+        SELECT NEW.id, products_product_document(NEW.name, s.name, c.name)
+        FROM products_subcategory s
+        JOIN products_category c ON c.id = s.category_id
+        WHERE s.id = NEW.sub_category_id
+        ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER products_product_search_update
+    AFTER INSERT OR UPDATE OF name, sub_category_id ON products_product
+    FOR EACH ROW EXECUTE PROCEDURE products_product_search_update()
+    """,
+    """
+    CREATE FUNCTION products_subcategory_search_update() RETURNS trigger AS $$
+    BEGIN
+        UPDATE products_productsearch ps
+        SET document = products_product_document(p.name, NEW.name, c.name)
+        FROM products_product p
+        JOIN products_category c ON c.id = NEW.category_id
+        WHERE p.sub_category_id = NEW.id AND ps.product_id = p.id;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER products_subcategory_search_update
+    AFTER UPDATE OF name, category_id ON products_subcategory
+    FOR EACH ROW EXECUTE PROCEDURE products_subcategory_search_update()
+    """,
+    """
+    CREATE FUNCTION products_category_search_update() RETURNS trigger AS $$
+    BEGIN
+        UPDATE products_productsearch ps
+        SET document = products_product_document(p.name, s.name, NEW.name)
+        FROM products_product p
+        JOIN products_subcategory s ON s.id = p.sub_category_id
+        WHERE s.category_id = NEW.id AND ps.product_id = p.id;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER products_category_search_update
+    AFTER UPDATE OF name ON products_category
+    FOR EACH ROW EXECUTE PROCEDURE products_category_search_update()
+    """,
+    """
+    INSERT INTO products_productsearch (product_id, document)
+    SELECT p.id, products_product_document(p.name, s.name, c.name)
+    FROM products_product p
+    JOIN products_subcategory s ON s.id = p.sub_category_id
+    JOIN products_category c ON c.id = s.category_id
+    """,
+]
+
+POSTGRESQL_BACKWARDS = [
+    'DROP TRIGGER IF EXISTS products_category_search_update '
+    'ON products_category',
+    'DROP TRIGGER IF EXISTS products_subcategory_search_update '
+    'ON products_subcategory',
+    'DROP TRIGGER IF EXISTS products_product_search_update '
+    'ON products_product',
+    'DROP FUNCTION IF EXISTS products_category_search_update()',
+    'DROP FUNCTION IF EXISTS products_subcategory_search_update()',
+    'DROP FUNCTION IF EXISTS products_product_search_update()',
+    'DROP FUNCTION IF EXISTS products_product_document(text, text, text)',
+    'DROP TABLE IF EXISTS products_productsearch',
+]
+
+STATEMENTS = {
+    'sqlite': (SQLITE_FORWARDS, SQLITE_BACKWARDS),
+    'postgresql': (POSTGRESQL_FORWARDS, POSTGRESQL_BACKWARDS),
+}
+
+
+def run_statements(schema_editor, index):
+    statements = STATEMENTS.get(schema_editor.connection.vendor)
+    if statements is None:
+        return
+    for statement in statements[index]:
+        schema_editor.execute(statement)
+
+
+def forwards(apps, schema_editor):
+    run_statements(schema_editor, 0)
+
+
+def backwards(apps, schema_editor):
+    run_statements(schema_editor, 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_catalog_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
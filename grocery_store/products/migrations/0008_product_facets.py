@@ -0,0 +1,73 @@
+# Generated by Django 3.2.3 on 2026-10-18 10:00
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, Count, IntegerField, Value, When
+import django.db.models.deletion
+
+
+def fill_facet_counts(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    ProductFacetCount = apps.get_model('products', 'ProductFacetCount')
+    bounds = settings.PRODUCT_PRICE_BUCKETS
+    bucket = Case(
+        *[
+            When(price__lt=bound, then=Value(index))
+            for index, bound in enumerate(bounds)
+        ],
+        default=Value(len(bounds)),
+        output_field=IntegerField(),
+    )
+    cells = Product.objects.order_by().annotate(
+        facet_bucket=bucket,
+    ).values(
+        'sub_category_id', 'facet_bucket', 'is_avaliable',
+    ).annotate(
+        facet_count=Count('id'),
+    )
+    ProductFacetCount.objects.bulk_create(
+        ProductFacetCount(
+            sub_category_id=cell['sub_category_id'],
+            price_bucket=cell['facet_bucket'],
+            is_avaliable=cell['is_avaliable'],
+            count=cell['facet_count'],
+        )
+        for cell in cells
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_product_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductFacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price_bucket', models.PositiveSmallIntegerField(verbose_name='Ценовой диапазон')),
+                ('is_avaliable', models.BooleanField(verbose_name='В наличии')),
+                ('count', models.IntegerField(default=0, verbose_name='Количество продуктов')),
+            ],
+            options={
+                'verbose_name': 'Количество продуктов в фасете',
+                'verbose_name_plural': 'Количество продуктов в фасетах',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['sub_category', 'is_avaliable', 'price'], name='product_facet_idx'),
+        ),
+        migrations.AddField(
+            model_name='productfacetcount',
+            name='sub_category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facet_counts', to='products.subcategory', verbose_name='Подкатегория'),
+        ),
+        migrations.AddConstraint(
+            model_name='productfacetcount',
+            constraint=models.UniqueConstraint(fields=('sub_category', 'price_bucket', 'is_avaliable'), name='unique-facet-cell'),
+        ),
+        migrations.RunPython(fill_facet_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,106 @@
+# Generated by Django 3.2.3 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+# Триггеры полнотекстового индекса из 0007_product_search. SQLite
+# пересоздает products_product при добавлении поля и не переименует
+# новую таблицу, пока на старую ссылаются триггеры, а триггеры самой
+# таблицы удалит. Поэтому триггеры удаляются перед изменением таблицы
+# и создаются заново после него.
+SQLITE_CREATE_TRIGGERS = [
+    """
+    CREATE TRIGGER products_product_fts_insert
+    AFTER INSERT ON products_product BEGIN
+        INSERT INTO products_product_fts (rowid, name, sub_category, category)
+        SELECT NEW.id, NEW.name, s.name, c.name
+        FROM products_subcategory s
+        JOIN products_category c ON c.id = s.category_id
+        WHERE s.id = NEW.sub_category_id;
+    END
+    """,
+    """
+    CREATE TRIGGER products_product_fts_update
+    AFTER UPDATE OF name, sub_category_id ON products_product BEGIN
+        DELETE FROM products_product_fts WHERE rowid = OLD.id;
+        INSERT INTO products_product_fts (rowid, name, sub_category, category)
+        SELECT NEW.id, NEW.name, s.name, c.name
+        FROM products_subcategory s
+        JOIN products_category c ON c.id = s.category_id
+        WHERE s.id = NEW.sub_category_id;
+    END
+    """,
+    """
+    CREATE TRIGGER products_product_fts_delete
+    AFTER DELETE ON products_product BEGIN
+        DELETE FROM products_product_fts WHERE rowid = OLD.id;
+    END
+    """,
+    """
+    CREATE TRIGGER products_subcategory_fts_update
+    AFTER UPDATE OF name, category_id ON products_subcategory BEGIN
+        DELETE FROM products_product_fts WHERE rowid IN (
+            SELECT id FROM products_product WHERE sub_category_id = NEW.id
+        );
+        INSERT INTO products_product_fts (rowid, name, sub_category, category)
+        SELECT p.id, p.name, NEW.name, c.name
+        FROM products_product p
+        JOIN products_category c ON c.id = NEW.category_id
+        WHERE p.sub_category_id = NEW.id;
+    END
+    """,
+    """
+    CREATE TRIGGER products_category_fts_update
+    AFTER UPDATE OF name ON products_category BEGIN
+        DELETE FROM products_product_fts WHERE rowid IN (
+            SELECT p.id FROM products_product p
+            JOIN products_subcategory s ON s.id = p.sub_category_id
+            WHERE s.category_id = NEW.id
+        );
+        INSERT INTO products_product_fts (rowid, name, sub_category, category)
+        SELECT p.id, p.name, s.name, NEW.name
+        FROM products_product p
+        JOIN products_subcategory s ON s.id = p.sub_category_id
+        WHERE s.category_id = NEW.id;
+    END
+    """,
+]
+
+SQLITE_DROP_TRIGGERS = [
+    'DROP TRIGGER IF EXISTS products_category_fts_update',
+    'DROP TRIGGER IF EXISTS products_subcategory_fts_update',
+    'DROP TRIGGER IF EXISTS products_product_fts_delete',
+    'DROP TRIGGER IF EXISTS products_product_fts_update',
+    'DROP TRIGGER IF EXISTS products_product_fts_insert',
+]
+
+
+def run_sqlite(schema_editor, statements):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_triggers(apps, schema_editor):
+    run_sqlite(schema_editor, SQLITE_DROP_TRIGGERS)
+
+
+def create_triggers(apps, schema_editor):
+    run_sqlite(schema_editor, SQLITE_CREATE_TRIGGERS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_product_facets'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_triggers, create_triggers),
+        migrations.AddField(
+            model_name='product',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Дата изменения'),
+        ),
+        migrations.RunPython(create_triggers, drop_triggers),
+    ]
@@ -0,0 +1,111 @@
+# Generated by Django 3.2.3 on 2026-10-18 10:00
+
+import os
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Расширения производных изображений по форматам, как в
+# products.renditions на момент миграции.
+RENDITION_EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+
+
+def rendition_urls(storage, name):
+    """Ссылки на оригинал и на все производные изображения файла name."""
+    if not name:
+        return None
+    stem, _ = os.path.splitext(name)
+    urls = {'original': storage.url(name)}
+    for size in settings.IMAGE_RENDITIONS:
+        urls[size] = {
+            fmt: storage.url(f'{stem}.{size}.{RENDITION_EXTENSIONS[fmt]}')
+            for fmt in settings.IMAGE_RENDITION_FORMATS
+        }
+    return urls
+
+
+def fill_product_cards(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    Image = apps.get_model('products', 'Image')
+    ProductCard = apps.get_model('products', 'ProductCard')
+    storage = Image._meta.get_field('image').storage
+    images = defaultdict(list)
+    for pk, product_id, name in Image.objects.order_by('id').values_list(
+        'id', 'product_id', 'image'
+    ):
+        images[product_id].append(
+            {'id': pk, 'image': rendition_urls(storage, name)}
+        )
+    cards = []
+    for product in Product.objects.select_related(
+        'sub_category__category'
+    ).order_by('id').iterator():
+        sub_category = product.sub_category
+        category = sub_category.category
+        product_images = images.get(product.id, [])
+        cards.append(ProductCard(
+            id=product.id,
+            name=product.name,
+            slug=product.slug,
+            price=product.price,
+            measurement_unit=product.measurement_unit,
+            is_avaliable=product.is_avaliable,
+            pub_date=product.pub_date,
+            sub_category_id=sub_category.id,
+            sub_category_name=sub_category.name,
+            sub_category_slug=sub_category.slug,
+            category_id=category.id,
+            category_name=category.name,
+            category_slug=category.slug,
+            image=next((
+                image['image']['original'] for image in product_images
+                if image['image'] is not None
+            ), None),
+            images=product_images,
+        ))
+    ProductCard.objects.bulk_create(cards, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_product_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductCard',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='ID продукта')),
+                ('name', models.CharField(max_length=200, verbose_name='Название')),
+                ('slug', models.CharField(max_length=200, null=True, verbose_name='Слаг')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Цена')),
+                ('measurement_unit', models.CharField(max_length=200, verbose_name='Единица измерения')),
+                ('is_avaliable', models.BooleanField(verbose_name='В наличии')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата добавления')),
+                ('sub_category_name', models.CharField(max_length=200, verbose_name='Название подкатегории')),
+                ('sub_category_slug', models.CharField(max_length=200, null=True, verbose_name='Слаг подкатегории')),
+                ('category_name', models.CharField(max_length=200, verbose_name='Название категории')),
+                ('category_slug', models.CharField(max_length=200, null=True, verbose_name='Слаг категории')),
+                ('image', models.TextField(null=True, verbose_name='Ссылка на главное изображение')),
+                ('images', models.JSONField(default=list, verbose_name='Изображения')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.category', verbose_name='Категория')),
+                ('sub_category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.subcategory', verbose_name='Подкатегория')),
+            ],
+            options={
+                'verbose_name': 'Карточка продукта',
+                'verbose_name_plural': 'Карточки продуктов',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='productcard',
+            index=models.Index(fields=['pub_date', 'id'], name='productcard_pub_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productcard',
+            index=models.Index(fields=['sub_category', 'is_avaliable', 'price'], name='productcard_facet_idx'),
+        ),
+        migrations.RunPython(fill_product_cards, migrations.RunPython.noop),
+    ]
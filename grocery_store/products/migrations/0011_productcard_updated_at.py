@@ -0,0 +1,32 @@
+# Generated by Django 3.2.3 on 2026-10-18 10:00
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.utils.timezone
+
+
+def copy_updated_at(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    ProductCard = apps.get_model('products', 'ProductCard')
+    ProductCard.objects.using(schema_editor.connection.alias).update(
+        updated_at=Subquery(
+            Product.objects.filter(pk=OuterRef('pk')).values('updated_at')
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_product_card'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productcard',
+            name='updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата изменения продукта'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_updated_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 3.2.3 on 2026-10-18 10:00
+
+import os
+
+from django.conf import settings
+from django.db import migrations
+
+# Расширения производных изображений по форматам, как в
+# products.renditions на момент миграции.
+RENDITION_EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+
+
+def rendition_urls(storage, name):
+    """Ссылки на оригинал и на все производные изображения файла name."""
+    if not name:
+        return None
+    stem, _ = os.path.splitext(name)
+    urls = {'original': storage.url(name)}
+    for size in settings.IMAGE_RENDITIONS:
+        urls[size] = {
+            fmt: storage.url(f'{stem}.{size}.{RENDITION_EXTENSIONS[fmt]}')
+            for fmt in settings.IMAGE_RENDITION_FORMATS
+        }
+    return urls
+
+
+def refresh_card_images(apps, schema_editor):
+    """Ссылки на изображения в карточках под новый MEDIA_URL."""
+    Image = apps.get_model('products', 'Image')
+    ProductCard = apps.get_model('products', 'ProductCard')
+    storage = Image._meta.get_field('image').storage
+    images = {}
+    for pk, product_id, name in Image.objects.order_by('id').values_list(
+        'id', 'product_id', 'image'
+    ):
+        images.setdefault(product_id, []).append(
+            {'id': pk, 'image': rendition_urls(storage, name)}
+        )
+    cards = []
+    for card in ProductCard.objects.only('id').iterator():
+        product_images = images.get(card.id)
+        if not product_images:
+            continue
+        card.image = next((
+            image['image']['original'] for image in product_images
+            if image['image'] is not None
+        ), None)
+        card.images = product_images
+        cards.append(card)
+    ProductCard.objects.bulk_update(cards, ('image', 'images'), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_productcard_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(refresh_card_images, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 3.2.3 on 2026-10-18 10:00
+
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count, F, Sum
+
+
+def backfill_cart_summaries(apps, schema_editor):
+    database = schema_editor.connection.alias
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    CartSummary = apps.get_model('products', 'CartSummary')
+    ShoppingCart = apps.get_model('products', 'ShoppingCart')
+    totals = {
+        row['user_id']: row
+        for row in ShoppingCart.objects.using(database).order_by().values(
+            'user_id'
+        ).annotate(
+            products_count=Count('id'),
+            total_summ=Sum(F('product__price') * F('amount')),
+        )
+    }
+    user_ids = User.objects.using(database).exclude(
+        pk__in=CartSummary.objects.using(database).values('user_id')
+    ).values_list('pk', flat=True)
+    CartSummary.objects.using(database).bulk_create(
+        (
+            CartSummary(
+                user_id=user_id,
+                products_count=totals.get(user_id, {}).get(
+                    'products_count', 0
+                ),
+                total_summ=totals.get(user_id, {}).get('total_summ') or 0,
+            )
+            for user_id in user_ids.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('products', '0013_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            backfill_cart_summaries, migrations.RunPython.noop
+        ),
+    ]
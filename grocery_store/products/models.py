@@ -2,9 +2,10 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.validators import RegexValidator
 from django.db import models
-from django.db.models import Exists, OuterRef
+from django.utils import timezone
 
 from products.basemodels import BaseModel
+from products.storage import content_addressed_storage
 
 User = get_user_model()
 
@@ -40,14 +41,8 @@ class SubCategory(BaseModel):
 
 class ProductQuerySet(models.QuerySet):
 
-    def add_user_annotations(self, user_id):
-        return self.annotate(
-            is_in_shopping_cart=Exists(
-                ShoppingCart.objects.filter(
-                    user_id=user_id, product__pk=OuterRef('pk')
-                )
-            ),
-        )
+    def with_related(self):
+        return self.prefetch_related('products_image')
 
 
 class Product(models.Model):
@@ -88,12 +83,27 @@ class Product(models.Model):
         verbose_name='Дата добавления',
         auto_now_add=True,
     )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+        db_index=True,
+    )
 
     objects = ProductQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Продукт'
         verbose_name_plural = 'Продукты'
+        indexes = [
+            models.Index(
+                fields=['pub_date', 'id'],
+                name='product_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=['sub_category', 'is_avaliable', 'price'],
+                name='product_facet_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name[:settings.SYMBOLS_QUANTITY]
@@ -110,6 +120,8 @@ class Image(models.Model):
     )
     image = models.ImageField(
         upload_to='products/images/',
+        storage=content_addressed_storage,
+        db_index=True,
         null=True,
         default=None,
     )
@@ -154,3 +166,263 @@ class ShoppingCart(models.Model):
     def __str__(self):
         return (f'{self.user.username[:settings.SYMBOLS_QUANTITY]} добавил в'
                 f'корзину {self.recipe.name[:settings.SYMBOLS_QUANTITY]}')
+
+
+class CartSummary(models.Model):
+    """Модель итогов корзины"""
+
+    user = models.OneToOneField(
+        User,
+        primary_key=True,
+        related_name='cart_summary',
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE
+    )
+    products_count = models.PositiveIntegerField(
+        verbose_name='Количество продуктов',
+        default=0
+    )
+    total_summ = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        verbose_name='Сумма',
+        default=0
+    )
+    version = models.PositiveBigIntegerField(
+        verbose_name='Версия корзины',
+        default=0
+    )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        default=timezone.now
+    )
+
+    class Meta:
+        verbose_name = 'Итоги корзины'
+        verbose_name_plural = 'Итоги корзин'
+
+    def __str__(self):
+        return self.user.username[:settings.SYMBOLS_QUANTITY]
+
+
+class CatalogVersion(models.Model):
+    """Модель версии каталога: растет при каждом изменении каталога"""
+
+    version = models.PositiveBigIntegerField(
+        verbose_name='Версия',
+        default=0
+    )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        default=timezone.now
+    )
+
+    class Meta:
+        verbose_name = 'Версия каталога'
+        verbose_name_plural = 'Версия каталога'
+
+    def __str__(self):
+        return str(self.version)
+
+
+class ProductFacetCount(models.Model):
+    """Модель количества продуктов в ячейке фасетов:
+    подкатегория, ценовой диапазон и наличие"""
+
+    sub_category = models.ForeignKey(
+        SubCategory,
+        related_name='facet_counts',
+        verbose_name='Подкатегория',
+        on_delete=models.CASCADE
+    )
+    price_bucket = models.PositiveSmallIntegerField(
+        verbose_name='Ценовой диапазон'
+    )
+    is_avaliable = models.BooleanField(
+        verbose_name='В наличии'
+    )
+    count = models.IntegerField(
+        verbose_name='Количество продуктов',
+        default=0
+    )
+
+    class Meta:
+        verbose_name = 'Количество продуктов в фасете'
+        verbose_name_plural = 'Количество продуктов в фасетах'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['sub_category', 'price_bucket', 'is_avaliable'],
+                name='unique-facet-cell'
+            ),
+        ]
+
+    def __str__(self):
+        return (f'{self.sub_category_id}/{self.price_bucket}/'
+                f'{self.is_avaliable}: {self.count}')
+
+
+class ProductCard(models.Model):
+    """Модель карточки продукта: денормализованная строка списка продуктов,
+    id совпадает с id продукта"""
+
+    id = models.BigIntegerField(
+        primary_key=True,
+        verbose_name='ID продукта',
+    )
+    name = models.CharField(
+        max_length=settings.MAX_LEN_NAME,
+        verbose_name='Название',
+    )
+    slug = models.CharField(
+        max_length=settings.MAX_LEN_SLUG,
+        null=True,
+        verbose_name='Слаг',
+    )
+    price = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        verbose_name='Цена'
+    )
+    measurement_unit = models.CharField(
+        max_length=settings.MAX_LEN_NAME,
+        verbose_name='Единица измерения',
+    )
+    is_avaliable = models.BooleanField(
+        verbose_name='В наличии',
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата добавления',
+    )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения продукта',
+    )
+    sub_category = models.ForeignKey(
+        SubCategory,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Подкатегория',
+    )
+    sub_category_name = models.CharField(
+        max_length=settings.MAX_LEN_NAME,
+        verbose_name='Название подкатегории',
+    )
+    sub_category_slug = models.CharField(
+        max_length=settings.MAX_LEN_SLUG,
+        null=True,
+        verbose_name='Слаг подкатегории',
+    )
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Категория',
+    )
+    category_name = models.CharField(
+        max_length=settings.MAX_LEN_NAME,
+        verbose_name='Название категории',
+    )
+    category_slug = models.CharField(
+        max_length=settings.MAX_LEN_SLUG,
+        null=True,
+        verbose_name='Слаг категории',
+    )
+    image = models.TextField(
+        null=True,
+        verbose_name='Ссылка на главное изображение',
+    )
+    images = models.JSONField(
+        default=list,
+        verbose_name='Изображения',
+    )
+
+    class Meta:
+        verbose_name = 'Карточка продукта'
+        verbose_name_plural = 'Карточки продуктов'
+        indexes = [
+            models.Index(
+                fields=['pub_date', 'id'],
+                name='productcard_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=['sub_category', 'is_avaliable', 'price'],
+                name='productcard_facet_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return self.name[:settings.SYMBOLS_QUANTITY]
+
+
+class Job(models.Model):
+    """Модель задачи фоновой очереди (products/jobs.py)"""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField(
+        max_length=255,
+        verbose_name='Задача'
+    )
+    payload = models.JSONField(
+        verbose_name='Аргументы',
+        default=dict
+    )
+    priority = models.SmallIntegerField(
+        verbose_name='Приоритет',
+        default=0
+    )
+    status = models.CharField(
+        max_length=16,
+        choices=STATUSES,
+        verbose_name='Статус',
+        default=QUEUED
+    )
+    attempts = models.PositiveSmallIntegerField(
+        verbose_name='Попыток',
+        default=0
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        verbose_name='Максимум попыток'
+    )
+    run_at = models.DateTimeField(
+        verbose_name='Запустить после',
+        default=timezone.now
+    )
+    locked_by = models.CharField(
+        max_length=255,
+        null=True,
+        blank=True,
+        verbose_name='Рабочий процесс'
+    )
+    locked_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Начало выполнения'
+    )
+    last_error = models.TextField(
+        blank=True,
+        verbose_name='Последняя ошибка'
+    )
+    created_at = models.DateTimeField(
+        verbose_name='Дата создания',
+        default=timezone.now
+    )
+
+    class Meta:
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+        indexes = [
+            models.Index(
+                fields=['status', '-priority', 'run_at', 'id'],
+                name='job_ready_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk}'
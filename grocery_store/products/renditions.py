@@ -0,0 +1,149 @@
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils.encoding import filepath_to_uri
+from PIL import Image as PillowImage
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 85, 'optimize': True,
+                             'progressive': True}),
+}
+
+_lock = threading.Lock()
+_executor = None
+
+
+def rendition_name(name, size, fmt):
+    """Имя производного файла: рядом с оригиналом, с размером в имени."""
+    stem, _ = os.path.splitext(name)
+    return f'{stem}.{size}.{FORMATS[fmt][1]}'
+
+
+def rendition_urls(storage, name):
+    """Возвращает ссылки на оригинал и на все производные изображения."""
+    if not name:
+        return None
+    urls = {'original': storage.url(name)}
+    for size in settings.IMAGE_RENDITIONS:
+        urls[size] = {
+            fmt: storage.url(rendition_name(name, size, fmt))
+            for fmt in settings.IMAGE_RENDITION_FORMATS
+        }
+    return urls
+
+
+def url_builder(storage):
+    """
+    storage.url для FileSystemStorage без urljoin.
+
+    Для относительного пути без сегментов . и .. urljoin сводится
+    к приписыванию пути к base_url, остальные случаи идут в storage.url.
+    """
+    base_url = getattr(storage, 'base_url', None)
+    if (not isinstance(storage, FileSystemStorage)
+            or type(storage).url is not FileSystemStorage.url
+            or not base_url or not base_url.endswith('/')):
+        return storage.url
+
+    def url(name):
+        uri = filepath_to_uri(name).lstrip('/')
+        if '/.' in f'/{uri}':
+            return storage.url(name)
+        return base_url + uri
+
+    return url
+
+
+def renditions_builder(storage):
+    """
+    rendition_urls для одного хранилища: настройки и построение ссылок
+    подготавливаются один раз, для списков изображений.
+    """
+    url = url_builder(storage)
+    sizes = tuple(settings.IMAGE_RENDITIONS)
+    formats = tuple(settings.IMAGE_RENDITION_FORMATS)
+
+    def renditions(name):
+        if not name:
+            return None
+        urls = {'original': url(name)}
+        for size in sizes:
+            urls[size] = {
+                fmt: url(rendition_name(name, size, fmt)) for fmt in formats
+            }
+        return urls
+
+    return renditions
+
+
+def build_renditions(path, sizes, formats, force=False):
+    """
+    Строит производные изображения для файла path.
+
+    Выполняется в отдельном процессе, поэтому работает только с путями
+    и не обращается к Django. Уже построенные файлы, которые новее
+    оригинала, пропускаются, если не передан force.
+    """
+    source_mtime = os.path.getmtime(path)
+    written = []
+    with PillowImage.open(path) as source:
+        source = source.convert('RGB')
+        for size, dimensions in sizes.items():
+            targets = []
+            for fmt in formats:
+                target = rendition_name(path, size, fmt)
+                if (force or not os.path.exists(target)
+                        or os.path.getmtime(target) < source_mtime):
+                    targets.append((fmt, target))
+            if not targets:
+                continue
+            image = source.copy()
+            image.thumbnail(tuple(dimensions), PillowImage.LANCZOS)
+            for fmt, target in targets:
+                pillow_format, _, options = FORMATS[fmt]
+                descriptor, temporary = tempfile.mkstemp(
+                    dir=os.path.dirname(target), suffix='.tmp'
+                )
+                with os.fdopen(descriptor, 'wb') as file:
+                    image.save(file, format=pillow_format, **options)
+                os.replace(temporary, target)
+                written.append(target)
+    return written
+
+
+def get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_RENDITION_WORKERS
+            )
+        return _executor
+
+
+def _report(future):
+    error = future.exception()
+    if error is not None:
+        logger.error('Не удалось построить производные изображения: %s',
+                     error)
+
+
+def schedule_renditions(field_file, force=False):
+    """Отправляет построение производных изображений в пул процессов."""
+    future = get_executor().submit(
+        build_renditions,
+        field_file.path,
+        dict(settings.IMAGE_RENDITIONS),
+        tuple(settings.IMAGE_RENDITION_FORMATS),
+        force,
+    )
+    future.add_done_callback(_report)
+    return future
@@ -0,0 +1,89 @@
+import re
+
+from django.db import connections
+from django.db.models import Q
+
+WORD = re.compile(r'\w+')
+
+# Окончания, которые отбрасываются перед поиском по префиксу в SQLite:
+# в FTS5 нет русского стеммера, поэтому "бананы" ищется как "банан*".
+ENDINGS = sorted(
+    (
+        'иями', 'ями', 'ами', 'его', 'ого', 'ему', 'ому', 'ыми', 'ими',
+        'ией', 'ей', 'ой', 'ий', 'ый', 'ая', 'яя', 'ое', 'ее', 'ие', 'ые',
+        'ах', 'ях', 'ов', 'ев', 'ом', 'ем', 'ам', 'ям', 'ую', 'юю',
+        'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь', 'й',
+    ),
+    key=len,
+    reverse=True,
+)
+MIN_STEM_LENGTH = 3
+
+
+def stem(word):
+    """Грубо отсекает русское окончание слова."""
+    for ending in ENDINGS:
+        if (word.endswith(ending)
+                and len(word) - len(ending) >= MIN_STEM_LENGTH):
+            return word[:-len(ending)]
+    return word
+
+
+def fts5_query(text):
+    """Строит запрос FTS5: все слова, каждое как префикс основы."""
+    words = WORD.findall(text.lower())
+    return ' '.join(f'"{stem(word)}"*' for word in words)
+
+
+def search_products(queryset, text):
+    """
+    Фильтрует продукты по полнотекстовому индексу и сортирует
+    по релевантности.
+
+    В SQLite используется таблица FTS5 products_product_fts, в PostgreSQL -
+    GIN-индекс по tsvector в таблице products_productsearch с русской
+    конфигурацией. Обе таблицы поддерживаются триггерами базы данных.
+    """
+    vendor = connections[queryset.db].vendor
+    # Выборка может состоять из продуктов или из их карточек:
+    # id карточки совпадает с id продукта.
+    opts = queryset.model._meta
+    product_id = f'{opts.db_table}.{opts.pk.column}'
+    if vendor == 'sqlite':
+        query = fts5_query(text)
+        if not query:
+            return queryset.none()
+        return queryset.extra(
+            tables=['products_product_fts'],
+            where=[
+                'products_product_fts MATCH %s',
+                f'products_product_fts.rowid = {product_id}',
+            ],
+            params=[query],
+            select={
+                'search_rank': 'bm25(products_product_fts, 10.0, 3.0, 1.0)',
+            },
+        ).order_by('search_rank', 'id')
+    if vendor == 'postgresql':
+        return queryset.extra(
+            tables=['products_productsearch'],
+            where=[
+                "products_productsearch.document @@ "
+                "websearch_to_tsquery('russian', %s)",
+                f'products_productsearch.product_id = {product_id}',
+            ],
+            params=[text],
+            select={
+                'search_rank': "ts_rank(products_productsearch.document, "
+                               "websearch_to_tsquery('russian', %s))",
+            },
+            select_params=[text],
+        ).order_by('-search_rank', 'id')
+    condition = Q()
+    for word in WORD.findall(text):
+        condition &= (
+            Q(name__icontains=word)
+            | Q(sub_category__name__icontains=word)
+            | Q(sub_category__category__name__icontains=word)
+        )
+    return queryset.filter(condition)
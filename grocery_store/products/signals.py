@@ -0,0 +1,191 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from products.cards import refresh_product_cards, refresh_taxonomy_cards
+from products.cart import refresh_cart_summary, refresh_product_cart_summaries
+from products.facets import change_facet_count, facet_key
+from products.jobs import enqueue
+from products.models import (Category, Image, Product, ProductCard,
+                             ShoppingCart, SubCategory)
+from products.tasks import build_image_renditions, release_image_file
+from products.taxonomy import bump_taxonomy_version
+from products.versions import bump_catalog_version, catalog_replaced
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Image)
+@receiver(post_delete, sender=Image)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=SubCategory)
+@receiver(post_delete, sender=SubCategory)
+def catalog_changed(sender, **kwargs):
+    """Увеличиваем версию каталога в той же транзакции."""
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=SubCategory)
+@receiver(post_delete, sender=SubCategory)
+@receiver(catalog_replaced)
+def taxonomy_changed(sender, **kwargs):
+    """Сдвигаем версию дерева категорий после фиксации транзакции."""
+    bump_taxonomy_version()
+
+
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def shopping_cart_changed(sender, instance, **kwargs):
+    """Пересчитываем итоги корзины в той же транзакции."""
+    refresh_cart_summary(instance.user_id)
+
+
+@receiver(pre_save, sender=Product)
+def product_price_before_save(sender, instance, update_fields, **kwargs):
+    """Запоминаем прежнюю цену продукта."""
+    instance._previous_price = None
+    if instance.pk is None or (
+        update_fields is not None and 'price' not in update_fields
+    ):
+        return
+    instance._previous_price = sender.objects.filter(
+        pk=instance.pk
+    ).values_list('price', flat=True).first()
+
+
+@receiver(post_save, sender=Product)
+def product_changed(sender, instance, created, **kwargs):
+    """Цена продукта изменилась - пересчитываем итоги корзин."""
+    previous = getattr(instance, '_previous_price', None)
+    if created or previous is None:
+        return
+    price = sender._meta.get_field('price').to_python(instance.price)
+    if price != previous:
+        refresh_product_cart_summaries(instance.id)
+
+
+@receiver(pre_save, sender=Image)
+@receiver(pre_save, sender=Category)
+@receiver(pre_save, sender=SubCategory)
+def image_before_save(sender, instance, **kwargs):
+    """
+    Запоминаем прежний файл, чтобы освободить его после сохранения,
+    и содержимое нового, которое сохраняется вместе с объектом.
+    """
+    instance._uploaded_image = None
+    if instance.image and not instance.image._committed:
+        instance._uploaded_image = instance.image.file
+    instance._previous_image = None
+    if instance.pk is None:
+        return
+    instance._previous_image = sender.objects.filter(
+        pk=instance.pk
+    ).values_list('image', flat=True).first()
+
+
+@receiver(post_save, sender=Image)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=SubCategory)
+def image_saved(sender, instance, **kwargs):
+    """
+    Ставим в очередь построение производных изображений и освобождение
+    замененного файла. Задачи видны рабочим процессам после фиксации
+    транзакции.
+
+    Если загруженное содержимое уже лежало в хранилище, файл мог быть
+    удален как неиспользуемый до фиксации ссылки на него: после фиксации
+    он записывается заново.
+    """
+    uploaded = getattr(instance, '_uploaded_image', None)
+    if uploaded is not None:
+        name, storage = instance.image.name, instance.image.storage
+        transaction.on_commit(lambda: storage.restore(name, uploaded))
+    if instance.image:
+        enqueue(build_image_renditions, instance.image.name)
+    previous = getattr(instance, '_previous_image', None)
+    if previous and previous != instance.image.name:
+        enqueue(release_image_file, previous)
+
+
+@receiver(post_delete, sender=Image)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=SubCategory)
+def image_deleted(sender, instance, **kwargs):
+    """Удаляем файл, когда на него не остается ссылок."""
+    if instance.image.name:
+        enqueue(release_image_file, instance.image.name)
+
+
+@receiver(pre_save, sender=Product)
+def product_facet_before_save(sender, instance, **kwargs):
+    """Запоминаем ячейку фасетов, в которой продукт был до сохранения."""
+    instance._previous_facet_key = None
+    if instance.pk is None:
+        return
+    previous = sender.objects.filter(pk=instance.pk).values_list(
+        'sub_category_id', 'price', 'is_avaliable'
+    ).first()
+    if previous is not None:
+        instance._previous_facet_key = facet_key(
+            Product(
+                sub_category_id=previous[0],
+                price=previous[1],
+                is_avaliable=previous[2],
+            )
+        )
+
+
+@receiver(post_save, sender=Product)
+def product_facet_saved(sender, instance, **kwargs):
+    """Переносим продукт между ячейками фасетов в той же транзакции."""
+    previous = getattr(instance, '_previous_facet_key', None)
+    current = facet_key(instance)
+    if previous == current:
+        return
+    if previous is not None:
+        change_facet_count(previous, -1)
+    change_facet_count(current, 1)
+
+
+@receiver(post_delete, sender=Product)
+def product_facet_deleted(sender, instance, **kwargs):
+    change_facet_count(facet_key(instance), -1)
+
+
+@receiver(post_save, sender=Product)
+def product_card_saved(sender, instance, **kwargs):
+    """Обновляем карточку продукта в той же транзакции."""
+    refresh_product_cards(Product.objects.filter(pk=instance.pk))
+
+
+@receiver(post_delete, sender=Product)
+def product_card_deleted(sender, instance, **kwargs):
+    ProductCard.objects.filter(pk=instance.pk).delete()
+
+
+@receiver(post_save, sender=Image)
+@receiver(post_delete, sender=Image)
+def image_card_changed(sender, instance, **kwargs):
+    """
+    Изображения продукта изменились - сдвигаем дату изменения продукта,
+    она служит версией его представления, и обновляем карточку.
+    """
+    products = Product.objects.filter(pk=instance.product_id)
+    products.update(updated_at=timezone.now())
+    refresh_product_cards(products)
+
+
+@receiver(post_save, sender=SubCategory)
+def sub_category_card_changed(sender, instance, created, **kwargs):
+    if not created:
+        refresh_taxonomy_cards(sub_category=instance)
+
+
+@receiver(post_save, sender=Category)
+def category_card_changed(sender, instance, created, **kwargs):
+    if not created:
+        refresh_taxonomy_cards(category=instance)
@@ -0,0 +1,77 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранилище, которое называет файлы по хэшу их содержимого.
+
+    Файл products/images/bananas.bmp сохраняется как
+    products/images/ab/cd/abcd...ef.bmp. Если такой файл уже есть,
+    повторная запись не выполняется, поэтому после фиксации ссылки
+    на файл загрузка проверяет его через restore.
+    """
+
+    hash_algorithm = 'sha256'
+
+    def hashed_name(self, name, content):
+        digest = hashlib.new(self.hash_algorithm)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        directory, filename = posixpath.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        return posixpath.join(
+            directory, digest[:2], digest[2:4], f'{digest}{extension}'
+        )
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            return name
+        return self._save(name, content)
+
+    def restore(self, name, content):
+        """
+        Записывает content под уже вычисленным именем name, если файла
+        нет: его мог удалить release_file, пока ссылка на него еще
+        не была зафиксирована. Возвращает True, если файл записан.
+        """
+        if self.exists(name):
+            return False
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        self._save(name, content)
+        return True
+
+    def _save(self, name, content):
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                for chunk in content.chunks():
+                    file.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temporary, self.file_permissions_mode)
+            os.replace(temporary, full_path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        return name
+
+
+content_addressed_storage = ContentAddressedStorage()
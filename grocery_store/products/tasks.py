@@ -0,0 +1,23 @@
+from django.conf import settings
+
+from products.files import release_file
+from products.jobs import task
+from products.renditions import build_renditions
+from products.storage import content_addressed_storage
+
+
+@task(priority=10)
+def build_image_renditions(name, force=False):
+    """Строит производные изображения загруженного файла."""
+    build_renditions(
+        content_addressed_storage.path(name),
+        dict(settings.IMAGE_RENDITIONS),
+        tuple(settings.IMAGE_RENDITION_FORMATS),
+        force,
+    )
+
+
+@task
+def release_image_file(name):
+    """Удаляет файл, на который больше не ссылаются, с производными."""
+    release_file(name)
@@ -0,0 +1,188 @@
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+
+from products.models import Category, SubCategory
+from products.renditions import rendition_urls
+
+TAXONOMY_VERSION_KEY = 'taxonomy-version'
+
+_lock = threading.Lock()
+_snapshot = None
+
+
+class TaxonomySnapshot:
+    """
+    Неизменяемый снимок дерева категорий и подкатегорий для одной версии
+    дерева.
+
+    Хранит готовые представления объектов, наружу отдает их копии.
+    Категории и подкатегории упорядочены по названию и id.
+    """
+
+    __slots__ = ('_categories', '_sub_categories', '_children', 'version',
+                 'checked_at')
+
+    def __init__(self, categories, sub_categories, children, version=None):
+        self._categories = categories
+        self._sub_categories = sub_categories
+        self._children = children
+        self.version = version
+        self.checked_at = time.monotonic()
+
+    @classmethod
+    def build(cls, version=None):
+        """Собирает снимок одним запросом к базе данных."""
+        category_storage = Category._meta.get_field('image').storage
+        sub_category_storage = SubCategory._meta.get_field('image').storage
+        categories = {}
+        sub_categories = {}
+        children = {}
+        rows = Category.objects.values_list(
+            'id',
+            'name',
+            'slug',
+            'image',
+            'category__id',
+            'category__name',
+            'category__slug',
+            'category__image',
+        )
+        for row in rows:
+            category_id = row[0]
+            if category_id not in categories:
+                categories[category_id] = {
+                    'id': category_id,
+                    'name': row[1],
+                    'slug': row[2],
+                    'image': rendition_urls(category_storage, row[3]),
+                }
+                children[category_id] = []
+            if row[4] is None:
+                continue
+            sub_categories[row[4]] = (category_id, {
+                'id': row[4],
+                'name': row[5],
+                'slug': row[6],
+                'image': rendition_urls(sub_category_storage, row[7]),
+            })
+            children[category_id].append(row[4])
+
+        def by_name(data):
+            return data['name'], data['id']
+
+        return cls(
+            {
+                data['id']: data
+                for data in sorted(categories.values(), key=by_name)
+            },
+            sub_categories,
+            {
+                category_id: tuple(sorted(
+                    ids, key=lambda pk: by_name(sub_categories[pk][1])
+                ))
+                for category_id, ids in children.items()
+            },
+            version,
+        )
+
+    def category(self, category_id, with_sub_categories=False):
+        data = self._categories.get(category_id)
+        if data is None:
+            return None
+        data = dict(data)
+        if with_sub_categories:
+            data['sub_categories'] = self.sub_categories(category_id)
+        return data
+
+    def categories(self, with_sub_categories=True):
+        return [
+            self.category(category_id, with_sub_categories)
+            for category_id in self._categories
+        ]
+
+    def sub_category(self, sub_category_id):
+        node = self._sub_categories.get(sub_category_id)
+        if node is None:
+            return None
+        return dict(node[1])
+
+    def sub_categories(self, category_id):
+        return [
+            dict(self._sub_categories[sub_category_id][1])
+            for sub_category_id in self._children.get(category_id, ())
+        ]
+
+    def category_of(self, sub_category_id):
+        node = self._sub_categories.get(sub_category_id)
+        if node is None:
+            return None
+        return self.category(node[0])
+
+
+def get_taxonomy_version():
+    """Текущая версия дерева из общего кэша."""
+    cache = caches[settings.TAXONOMY_VERSION_ALIAS]
+    version = cache.get(TAXONOMY_VERSION_KEY)
+    if version is None:
+        # Версию вытеснили или кэш пуст: новая метка не совпадет
+        # ни с одним снимком.
+        cache.add(TAXONOMY_VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(TAXONOMY_VERSION_KEY)
+    return version
+
+
+def publish_taxonomy_version():
+    global _snapshot
+    caches[settings.TAXONOMY_VERSION_ALIAS].set(
+        TAXONOMY_VERSION_KEY, uuid.uuid4().hex, None
+    )
+    _snapshot = None
+
+
+def bump_taxonomy_version():
+    """
+    Сдвигает версию дерева после фиксации транзакции: раньше другие
+    процессы пересобрали бы снимок по незафиксированным данным.
+    """
+    transaction.on_commit(publish_taxonomy_version)
+
+
+def changed_in_transaction():
+    """Текущая транзакция изменила дерево, но еще не зафиксирована."""
+    return any(
+        callback[1] is publish_taxonomy_version
+        for callback in connection.run_on_commit
+    )
+
+
+def get_taxonomy():
+    """
+    Возвращает снимок дерева для текущей версии дерева. Версию сдвигают
+    только изменения категорий и подкатегорий, а процесс перепроверяет
+    ее в общем кэше не чаще раза в TAXONOMY_VERSION_TTL секунд.
+    """
+    global _snapshot
+    if connection.in_atomic_block and changed_in_transaction():
+        # Транзакция видит свои изменения дерева, а другие еще нет:
+        # такой снимок не должен достаться другим.
+        return TaxonomySnapshot.build()
+    snapshot = _snapshot
+    now = time.monotonic()
+    if (snapshot is not None
+            and now - snapshot.checked_at < settings.TAXONOMY_VERSION_TTL):
+        return snapshot
+    version = get_taxonomy_version()
+    if snapshot is not None and snapshot.version == version:
+        snapshot.checked_at = now
+        return snapshot
+    with _lock:
+        snapshot = _snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        _snapshot = snapshot = TaxonomySnapshot.build(version)
+    return snapshot
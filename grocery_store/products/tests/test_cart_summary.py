@@ -0,0 +1,56 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from products.cart import get_cart_summary
+from products.models import (CartSummary, Category, Product, ShoppingCart,
+                             SubCategory)
+
+User = get_user_model()
+
+
+class CartSummaryTests(TestCase):
+    """
+    Итоги корзины создаются сразу с верными значениями и пересчитываются
+    при изменении продукта, только если изменилась его цена.
+    """
+
+    def setUp(self):
+        category = Category.objects.create(name='Ягоды', slug='berries')
+        sub_category = SubCategory.objects.create(
+            name='Садовые ягоды', slug='garden-berries', category=category
+        )
+        self.product = Product.objects.create(
+            name='Клубника',
+            slug='strawberry',
+            price=Decimal('2.50'),
+            measurement_unit='кг',
+            is_avaliable=True,
+            sub_category=sub_category,
+        )
+        self.user = User.objects.create_user(
+            username='buyer',
+            email='buyer@example.com',
+            password='buyer-password',
+        )
+        ShoppingCart.objects.create(
+            user=self.user, product=self.product, amount=2
+        )
+
+    def test_summary_created_with_totals(self):
+        self.assertFalse(CartSummary.objects.filter(user=self.user).exists())
+        summary = get_cart_summary(self.user)
+        self.assertEqual(summary.products_count, 1)
+        self.assertEqual(summary.total_summ, Decimal('5.00'))
+
+    def test_price_change_refreshes_summary(self):
+        version = get_cart_summary(self.user).version
+        self.product.name = 'Садовая клубника'
+        self.product.save()
+        self.assertEqual(get_cart_summary(self.user).version, version)
+        self.product.price = Decimal('3.00')
+        self.product.save()
+        summary = get_cart_summary(self.user)
+        self.assertEqual(summary.version, version + 1)
+        self.assertEqual(summary.total_summ, Decimal('6.00'))
@@ -0,0 +1,67 @@
+import io
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image as PillowImage
+from rest_framework.test import APIClient
+
+from api.fragments import fragment_cache
+from products.models import (Category, Image, Product, ProductCard,
+                             SubCategory)
+from products.storage import content_addressed_storage as storage
+
+
+class DedupeMediaTests(TestCase):
+    """После dedupe_media ответы API ссылаются на новые имена файлов."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        fragment_cache.clear()
+        buffer = io.BytesIO()
+        PillowImage.new('RGB', (4, 4), 'red').save(buffer, 'PNG')
+        path = os.path.join(media_root, 'products/images/potato.png')
+        os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as file:
+            file.write(buffer.getvalue())
+        category = Category.objects.create(name='Овощи', slug='vegetables')
+        self.product = Product.objects.create(
+            name='Картофель',
+            slug='potato',
+            price=Decimal('1.00'),
+            measurement_unit='кг',
+            is_avaliable=True,
+            sub_category=SubCategory.objects.create(
+                name='Клубни', slug='tubers', category=category
+            ),
+        )
+        Image.objects.create(
+            product=self.product, image='products/images/potato.png'
+        )
+
+    def test_cards_and_responses_use_new_names(self):
+        client = APIClient()
+        before = client.get('/api/products/').json()['results'][0]
+        self.assertTrue(
+            before['images'][0]['image']['original'].endswith('potato.png')
+        )
+        version = ProductCard.objects.get(pk=self.product.pk).updated_at
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('dedupe_media', stdout=io.StringIO())
+        new_name = Image.objects.get().image.name
+        self.assertNotEqual(new_name, 'products/images/potato.png')
+        self.assertFalse(storage.exists('products/images/potato.png'))
+        card = ProductCard.objects.get(pk=self.product.pk)
+        self.assertGreater(card.updated_at, version)
+        self.assertTrue(card.image.endswith(new_name))
+        after = client.get('/api/products/').json()['results'][0]
+        url = after['images'][0]['image']['original']
+        self.assertTrue(url.endswith(new_name))
+        self.assertEqual(client.get(url).status_code, 200)
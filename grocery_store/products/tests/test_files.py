@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from products import files
+from products.models import Category, Image, Product, SubCategory
+from products.renditions import rendition_name
+from products.storage import content_addressed_storage as storage
+
+CONTENT = b'image bytes'
+
+
+class ReleaseFileRaceTests(TestCase):
+    """
+    Загрузка того же содержимого, что и освобождаемый файл, не остается
+    со ссылкой на удаленный файл.
+    """
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.name = storage.save(
+            'products/images/photo.png', ContentFile(CONTENT)
+        )
+        self.rendition = rendition_name(
+            self.name,
+            next(iter(settings.IMAGE_RENDITIONS)),
+            settings.IMAGE_RENDITION_FORMATS[0],
+        )
+        storage._save(self.rendition, ContentFile(b'rendition'))
+
+    def set_aside_files(self):
+        directory = os.path.dirname(storage.path(self.name))
+        return [name for name in os.listdir(directory) if name[0] == '.']
+
+    def test_reference_added_during_release_keeps_file(self):
+        with mock.patch.object(files, 'reference_count', side_effect=[0, 1]):
+            self.assertFalse(files.release_file(self.name))
+        self.assertTrue(storage.exists(self.name))
+        self.assertTrue(storage.exists(self.rendition))
+        self.assertEqual(self.set_aside_files(), [])
+
+    def test_unreferenced_file_is_deleted(self):
+        self.assertTrue(files.release_file(self.name))
+        self.assertFalse(storage.exists(self.name))
+        self.assertFalse(storage.exists(self.rendition))
+        self.assertEqual(self.set_aside_files(), [])
+
+    def test_upload_restores_file_released_before_commit(self):
+        category = Category.objects.create(name='Фрукты', slug='fruits')
+        product = Product.objects.create(
+            name='Яблоко',
+            slug='apple',
+            price=Decimal('3.00'),
+            measurement_unit='кг',
+            is_avaliable=True,
+            sub_category=SubCategory.objects.create(
+                name='Семечковые', slug='pome', category=category
+            ),
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            image = Image.objects.create(
+                product=product,
+                image=SimpleUploadedFile('apple.png', CONTENT),
+            )
+            self.assertEqual(image.image.name, self.name)
+            # Другой процесс удалил файл, пока ссылка не зафиксирована.
+            os.remove(storage.path(self.name))
+        with storage.open(self.name) as file:
+            self.assertEqual(file.read(), CONTENT)
@@ -0,0 +1,67 @@
+from decimal import Decimal
+
+from django.core.cache import caches
+from django.db import transaction
+from django.test import TransactionTestCase, override_settings
+
+from products import taxonomy
+from products.models import Category, Product, SubCategory
+
+
+@override_settings(TAXONOMY_VERSION_TTL=0)
+class TaxonomySnapshotTests(TransactionTestCase):
+    """
+    Снимок дерева пересобирается только после изменения категорий
+    и подкатегорий, а изменения продуктов его не трогают.
+    """
+
+    def setUp(self):
+        caches['default'].clear()
+        self.category = Category.objects.create(name='Овощи', slug='veg')
+        self.sub_category = SubCategory.objects.create(
+            name='Корнеплоды', slug='roots', category=self.category
+        )
+        self.product = Product.objects.create(
+            name='Морковь',
+            slug='carrot',
+            price=Decimal('1.20'),
+            measurement_unit='кг',
+            is_avaliable=True,
+            sub_category=self.sub_category,
+        )
+        taxonomy._snapshot = None
+
+    def test_product_change_keeps_snapshot(self):
+        snapshot = taxonomy.get_taxonomy()
+        self.product.price = Decimal('1.50')
+        self.product.save()
+        with self.assertNumQueries(0):
+            self.assertIs(taxonomy.get_taxonomy(), snapshot)
+
+    def test_category_change_rebuilds_snapshot(self):
+        snapshot = taxonomy.get_taxonomy()
+        self.sub_category.name = 'Морковь и свекла'
+        with transaction.atomic():
+            self.sub_category.save()
+            # Своя транзакция видит изменение до фиксации, а общий
+            # снимок остается прежним.
+            self.assertEqual(
+                taxonomy.get_taxonomy().sub_category(
+                    self.sub_category.id
+                )['name'],
+                'Морковь и свекла',
+            )
+            self.assertIs(taxonomy._snapshot, snapshot)
+        fresh = taxonomy.get_taxonomy()
+        self.assertIsNot(fresh, snapshot)
+        self.assertEqual(
+            fresh.sub_category(self.sub_category.id)['name'],
+            'Морковь и свекла',
+        )
+
+    @override_settings(TAXONOMY_VERSION_TTL=60)
+    def test_version_checked_once_per_ttl(self):
+        snapshot = taxonomy.get_taxonomy()
+        caches['default'].set(taxonomy.TAXONOMY_VERSION_KEY, 'other', None)
+        with self.assertNumQueries(0):
+            self.assertIs(taxonomy.get_taxonomy(), snapshot)
@@ -0,0 +1,60 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models import F
+from django.db.models.functions import Now
+from django.dispatch import Signal
+
+from products.models import CatalogVersion
+
+CATALOG_VERSION_ID = 1
+
+# Каталог изменен массово в обход сигналов моделей (импорт, генерация
+# данных): производные от него кэши нужно сбросить целиком.
+catalog_replaced = Signal()
+
+_scope = ContextVar('catalog_version_scope', default=None)
+
+
+@contextmanager
+def catalog_version_scope():
+    """
+    Внутри блока версия каталога читается из базы один раз: ETag ответа
+    и тело ответа строятся по одной и той же версии.
+    """
+    token = _scope.set({})
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def bump_catalog_version():
+    """Увеличивает версию каталога в текущей транзакции."""
+    scope = _scope.get()
+    if scope is not None:
+        scope.clear()
+    updated = CatalogVersion.objects.filter(pk=CATALOG_VERSION_ID).update(
+        version=F('version') + 1,
+        updated_at=Now(),
+    )
+    if not updated:
+        CatalogVersion.objects.get_or_create(pk=CATALOG_VERSION_ID)
+
+
+def get_catalog_version():
+    """Возвращает версию каталога и дату его последнего изменения."""
+    scope = _scope.get()
+    if scope:
+        return scope['version']
+    # Обычное чтение можно выполнить на реплике, get_or_create - только
+    # на основной базе.
+    catalog = CatalogVersion.objects.filter(pk=CATALOG_VERSION_ID).first()
+    if catalog is None:
+        catalog, _ = CatalogVersion.objects.get_or_create(
+            pk=CATALOG_VERSION_ID
+        )
+    version = catalog.version, catalog.updated_at
+    if scope is not None:
+        scope['version'] = version
+    return version
@@ -0,0 +1,16 @@
+# Generated by Django 3.2.3 on 2026-10-18 10:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_credentialsversion'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='CredentialsVersion',
+        ),
+    ]